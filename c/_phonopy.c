@@ -54,16 +54,28 @@ static PyObject *
 py_perm_trans_symmetrize_compact_fc(PyObject *self, PyObject *args);
 static PyObject * py_transpose_compact_fc(PyObject *self, PyObject *args);
 static PyObject * py_get_dynamical_matrix(PyObject *self, PyObject *args);
+static PyObject * py_get_dynamical_matrices(PyObject *self, PyObject *args);
+static PyObject *
+py_get_sparse_dynamical_matrices(PyObject *self, PyObject *args);
 static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args);
+static PyObject * py_get_nac_dynamical_matrices(PyObject *self, PyObject *args);
 static PyObject * py_get_recip_dipole_dipole(PyObject *self, PyObject *args);
+static PyObject * py_get_recip_dipole_dipoles(PyObject *self, PyObject *args);
 static PyObject * py_get_recip_dipole_dipole_q0(PyObject *self, PyObject *args);
 static PyObject * py_get_derivative_dynmat(PyObject *self, PyObject *args);
+static PyObject * py_get_derivative_dynmats(PyObject *self, PyObject *args);
 static PyObject * py_get_thermal_properties(PyObject *self, PyObject *args);
+static PyObject *
+py_get_projected_thermal_properties(PyObject *self, PyObject *args);
 static PyObject * py_distribute_fc2(PyObject *self, PyObject *args);
+static PyObject *
+py_space_group_symmetrize_fc(PyObject *self, PyObject *args);
 static PyObject * py_compute_permutation(PyObject *self, PyObject *args);
 static PyObject * py_gsv_copy_smallest_vectors(PyObject *self, PyObject *args);
 static PyObject * py_gsv_set_smallest_vectors(PyObject *self, PyObject *args);
 static PyObject *
+py_gsv_set_smallest_vectors_dense(PyObject *self, PyObject *args);
+static PyObject *
 py_thm_neighboring_grid_points(PyObject *self, PyObject *args);
 static PyObject *
 py_thm_relative_grid_address(PyObject *self, PyObject *args);
@@ -75,6 +87,8 @@ static PyObject *
 py_thm_integration_weight_at_omegas(PyObject *self, PyObject *args);
 static PyObject * py_get_tetrahedra_frequenies(PyObject *self, PyObject *args);
 static PyObject * py_tetrahedron_method_dos(PyObject *self, PyObject *args);
+static PyObject *
+py_tetrahedron_method_integration_weights(PyObject *self, PyObject *args);
 
 static void distribute_fc2(double (*fc2)[3][3],
                            const int * atom_list,
@@ -85,6 +99,17 @@ static void distribute_fc2(double (*fc2)[3][3],
                            const int * map_syms,
                            const int num_rot,
                            const int num_pos);
+static void space_group_symmetrize_fc(double (*fc_sym)[3][3],
+                                      PHPYCONST double (*fc)[3][3],
+                                      PHPYCONST double (*r_carts)[3][3],
+                                      const int * permutations,
+                                      const int * p2s,
+                                      const int * s2pp,
+                                      const int * nsym_list,
+                                      const int * trans_perms,
+                                      const int num_rot,
+                                      const int n_patom,
+                                      const int n_satom);
 static int compute_permutation(int * rot_atom,
                                   PHPYCONST double lat[3][3],
                                   PHPYCONST double (*pos)[3],
@@ -108,12 +133,45 @@ static void gsv_set_smallest_vectors(double (*smallest_vectors)[27][3],
                                      PHPYCONST double reduced_basis[3][3],
                                      PHPYCONST int trans_mat[3][3],
                                      const double symprec);
-static double get_free_energy(const double temperature,
-                                    const double f);
-static double get_entropy(const double temperature,
-                                const double f);
-static double get_heat_capacity(const double temperature,
-                                      const double f);
+static void
+gsv_set_smallest_vectors_dense(double (*smallest_vectors)[3],
+                               int (*multiplicity)[2],
+                               PHPYCONST double (*pos_to)[3],
+                               const int num_pos_to,
+                               PHPYCONST double (*pos_from)[3],
+                               const int num_pos_from,
+                               PHPYCONST int (*lattice_points)[3],
+                               const int num_lattice_points,
+                               PHPYCONST double reduced_basis[3][3],
+                               PHPYCONST int trans_mat[3][3],
+                               const int initialize,
+                               const double symprec);
+static int get_dense_svecs(double (**svecs)[3],
+                           int (**multi)[2],
+                           PyArrayObject* py_svecs,
+                           PyArrayObject* py_multi);
+static void get_thermal_properties(double *thermal_props,
+                                   double *mode_thermal_props,
+                                   const double *temperatures,
+                                   const double *freqs,
+                                   const int *weights,
+                                   const int num_temp,
+                                   const int num_qpoints,
+                                   const int num_bands,
+                                   const double cutoff_frequency);
+static void get_projected_thermal_properties(double *thermal_props,
+                                             const double *temperatures,
+                                             const double *freqs,
+                                             const double *eigvecs,
+                                             const int *weights,
+                                             const int num_temp,
+                                             const int num_qpoints,
+                                             const int num_elems,
+                                             const int num_bands,
+                                             const double cutoff_frequency);
+static void get_thermal_properties_of_mode(double tp[3],
+                                           const double temperature,
+                                           const double f);
 static void set_index_permutation_symmetry_fc(double * fc,
                                               const int natom);
 static void set_translational_symmetry_fc(double * fc,
@@ -166,25 +224,41 @@ static PyMethodDef _phonopy_methods[] = {
    "Transpose compact force constants"},
   {"dynamical_matrix", py_get_dynamical_matrix, METH_VARARGS,
    "Dynamical matrix"},
+  {"dynamical_matrices", py_get_dynamical_matrices, METH_VARARGS,
+   "Dynamical matrices at q-points"},
+  {"sparse_dynamical_matrices", py_get_sparse_dynamical_matrices,
+   METH_VARARGS, "Dynamical matrices at q-points from sparse force constants"},
   {"nac_dynamical_matrix", py_get_nac_dynamical_matrix, METH_VARARGS,
    "NAC dynamical matrix"},
+  {"nac_dynamical_matrices", py_get_nac_dynamical_matrices, METH_VARARGS,
+   "NAC dynamical matrices by Wang et al. at q-points"},
   {"recip_dipole_dipole", py_get_recip_dipole_dipole, METH_VARARGS,
    "Reciprocal part of dipole-dipole interaction"},
+  {"recip_dipole_dipoles", py_get_recip_dipole_dipoles, METH_VARARGS,
+   "Reciprocal part of dipole-dipole interaction at q-points"},
   {"recip_dipole_dipole_q0", py_get_recip_dipole_dipole_q0, METH_VARARGS,
    "q=0 terms of reciprocal part of dipole-dipole interaction"},
   {"derivative_dynmat", py_get_derivative_dynmat, METH_VARARGS,
    "Q derivative of dynamical matrix"},
+  {"derivative_dynmats", py_get_derivative_dynmats, METH_VARARGS,
+   "Q derivatives of dynamical matrices at q-points"},
   {"thermal_properties", py_get_thermal_properties, METH_VARARGS,
    "Thermal properties"},
+  {"projected_thermal_properties", py_get_projected_thermal_properties,
+   METH_VARARGS, "Thermal properties projected on eigenvector elements"},
   {"distribute_fc2", py_distribute_fc2,
    METH_VARARGS,
    "Distribute force constants for all atoms in atom_list using precomputed symmetry mappings."},
+  {"space_group_symmetrize_fc", py_space_group_symmetrize_fc, METH_VARARGS,
+   "Average force constants over space group operations"},
   {"compute_permutation", py_compute_permutation, METH_VARARGS,
    "Compute indices of original points in a set of rotated points."},
   {"gsv_copy_smallest_vectors", py_gsv_copy_smallest_vectors, METH_VARARGS,
    "Implementation detail of get_smallest_vectors."},
   {"gsv_set_smallest_vectors", py_gsv_set_smallest_vectors, METH_VARARGS,
    "Set candidate vectors."},
+  {"gsv_set_smallest_vectors_dense", py_gsv_set_smallest_vectors_dense,
+   METH_VARARGS, "Set shortest vectors in the dense layout."},
   {"neighboring_grid_points", py_thm_neighboring_grid_points,
    METH_VARARGS, "Neighboring grid points by relative grid addresses"},
   {"tetrahedra_relative_grid_address", py_thm_relative_grid_address,
@@ -201,6 +275,9 @@ static PyMethodDef _phonopy_methods[] = {
    METH_VARARGS, "Run tetrahedron method"},
   {"tetrahedron_method_dos", py_tetrahedron_method_dos,
    METH_VARARGS, "Run tetrahedron method"},
+  {"tetrahedron_method_integration_weights",
+   py_tetrahedron_method_integration_weights, METH_VARARGS,
+   "Integration weights of tetrahedron method at grid points and bands"},
   {NULL, NULL, 0, NULL}
 };
 
@@ -275,13 +352,14 @@ static PyObject * py_transform_dynmat_to_fc(PyObject *self, PyObject *args)
   double* fc;
   double* dm;
   double (*comm_points)[3];
-  double (*shortest_vectors)[27][3];
+  double (*shortest_vectors)[3];
   double* masses;
-  int* multiplicities;
+  int (*multiplicities)[2];
   int* s2pp_map;
   int* fc_index_map;
   int num_patom;
   int num_satom;
+  int is_sparse_svecs;
 
   if (!PyArg_ParseTuple(args, "OOOOOOOO",
                         &py_force_constants,
@@ -298,9 +376,11 @@ static PyObject * py_transform_dynmat_to_fc(PyObject *self, PyObject *args)
   fc = (double*)PyArray_DATA(py_force_constants);
   dm = (double*)PyArray_DATA(py_dynamical_matrices);
   comm_points = (double(*)[3])PyArray_DATA(py_commensurate_points);
-  shortest_vectors = (double(*)[27][3])PyArray_DATA(py_shortest_vectors);
+  is_sparse_svecs = get_dense_svecs(&shortest_vectors,
+                                    &multiplicities,
+                                    py_shortest_vectors,
+                                    py_multiplicities);
   masses = (double*)PyArray_DATA(py_masses);
-  multiplicities = (int*)PyArray_DATA(py_multiplicities);
   s2pp_map = (int*)PyArray_DATA(py_s2pp_map);
   fc_index_map = (int*)PyArray_DATA(py_fc_index_map);
   num_patom = PyArray_DIMS(py_multiplicities)[1];
@@ -317,6 +397,11 @@ static PyObject * py_transform_dynmat_to_fc(PyObject *self, PyObject *args)
                              num_patom,
                              num_satom);
 
+  if (is_sparse_svecs) {
+    free(shortest_vectors);
+    free(multiplicities);
+  }
+
   Py_RETURN_NONE;
 }
 
@@ -463,6 +548,68 @@ static PyObject * py_gsv_set_smallest_vectors(PyObject *self, PyObject *args)
   Py_RETURN_NONE;
 }
 
+static PyObject *
+py_gsv_set_smallest_vectors_dense(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_smallest_vectors;
+  PyArrayObject* py_multiplicity;
+  PyArrayObject* py_pos_to;
+  PyArrayObject* py_pos_from;
+  PyArrayObject* py_lattice_points;
+  PyArrayObject* py_reduced_basis;
+  PyArrayObject* py_trans_mat;
+  int initialize;
+  double symprec;
+
+  double (*smallest_vectors)[3];
+  int (*multiplicity)[2];
+  double (*pos_to)[3];
+  double (*pos_from)[3];
+  int (*lattice_points)[3];
+  double (*reduced_basis)[3];
+  int (*trans_mat)[3];
+  int num_pos_to, num_pos_from, num_lattice_points;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOid",
+                        &py_smallest_vectors,
+                        &py_multiplicity,
+                        &py_pos_to,
+                        &py_pos_from,
+                        &py_lattice_points,
+                        &py_reduced_basis,
+                        &py_trans_mat,
+                        &initialize,
+                        &symprec)) {
+    return NULL;
+  }
+
+  smallest_vectors = (double(*)[3])PyArray_DATA(py_smallest_vectors);
+  multiplicity = (int(*)[2])PyArray_DATA(py_multiplicity);
+  pos_to = (double(*)[3])PyArray_DATA(py_pos_to);
+  pos_from = (double(*)[3])PyArray_DATA(py_pos_from);
+  num_pos_to = PyArray_DIMS(py_pos_to)[0];
+  num_pos_from = PyArray_DIMS(py_pos_from)[0];
+  lattice_points = (int(*)[3])PyArray_DATA(py_lattice_points);
+  num_lattice_points = PyArray_DIMS(py_lattice_points)[0];
+  reduced_basis = (double(*)[3])PyArray_DATA(py_reduced_basis);
+  trans_mat = (int(*)[3])PyArray_DATA(py_trans_mat);
+
+  gsv_set_smallest_vectors_dense(smallest_vectors,
+                                 multiplicity,
+                                 pos_to,
+                                 num_pos_to,
+                                 pos_from,
+                                 num_pos_from,
+                                 lattice_points,
+                                 num_lattice_points,
+                                 reduced_basis,
+                                 trans_mat,
+                                 initialize,
+                                 symprec);
+
+  Py_RETURN_NONE;
+}
+
 static PyObject * py_perm_trans_symmetrize_fc(PyObject *self, PyObject *args)
 {
   PyArrayObject* force_constants;
@@ -470,7 +617,8 @@ static PyObject * py_perm_trans_symmetrize_fc(PyObject *self, PyObject *args)
   int level;
 
   int n_satom, i, j, k, l, iter;
-  double sum;
+  double sum, drift;
+  double *drifts;
 
   if (!PyArg_ParseTuple(args, "Oi", &force_constants, &level)) {
     return NULL;
@@ -479,15 +627,24 @@ static PyObject * py_perm_trans_symmetrize_fc(PyObject *self, PyObject *args)
   fc = (double*)PyArray_DATA(force_constants);
   n_satom = PyArray_DIMS(force_constants)[0];
 
+  /* Maximum absolute sums along column and row subtracted at each atom */
+  drifts = (double*)malloc(sizeof(double) * n_satom);
+  drift = 0;
+
   for (iter=0; iter < level; iter++) {
     /* Subtract drift along column */
+#pragma omp parallel for private(i, k, l, sum)
     for (j = 0; j < n_satom; j++) {
+      drifts[j] = 0;
       for (k = 0; k < 3; k++) {
         for (l = 0; l < 3; l++) {
           sum = 0;
           for (i = 0; i < n_satom; i++) {
             sum += fc[i * n_satom * 9 + j * 9 + k * 3 + l];
           }
+          if (fabs(sum) > drifts[j]) {
+            drifts[j] = fabs(sum);
+          }
           sum /= n_satom;
           for (i = 0; i < n_satom; i++) {
             fc[i * n_satom * 9 + j * 9 + k * 3 + l] -= sum;
@@ -496,6 +653,7 @@ static PyObject * py_perm_trans_symmetrize_fc(PyObject *self, PyObject *args)
       }
     }
     /* Subtract drift along row */
+#pragma omp parallel for private(j, k, l, sum)
     for (i = 0; i < n_satom; i++) {
       for (k = 0; k < 3; k++) {
         for (l = 0; l < 3; l++) {
@@ -503,6 +661,9 @@ static PyObject * py_perm_trans_symmetrize_fc(PyObject *self, PyObject *args)
           for (j = 0; j < n_satom; j++) {
             sum += fc[i * n_satom * 9 + j * 9 + k * 3 + l];
           }
+          if (fabs(sum) > drifts[i]) {
+            drifts[i] = fabs(sum);
+          }
           sum /= n_satom;
           for (j = 0; j < n_satom; j++) {
             fc[i * n_satom * 9 + j * 9 + k * 3 + l] -= sum;
@@ -512,11 +673,21 @@ static PyObject * py_perm_trans_symmetrize_fc(PyObject *self, PyObject *args)
     }
 
     set_index_permutation_symmetry_fc(fc, n_satom);
+
+    drift = 0;
+    for (i = 0; i < n_satom; i++) {
+      if (drifts[i] > drift) {
+        drift = drifts[i];
+      }
+    }
   }
 
   set_translational_symmetry_fc(fc, n_satom);
 
-  Py_RETURN_NONE;
+  free(drifts);
+  drifts = NULL;
+
+  return PyFloat_FromDouble(drift);
 }
 
 static PyObject *
@@ -535,7 +706,8 @@ py_perm_trans_symmetrize_compact_fc(PyObject *self, PyObject *args)
   int *nsym_list;
 
   int n_patom, n_satom, i, j, k, l, n, iter;
-  double sum;
+  double sum, drift;
+  double *drifts;
 
   if (!PyArg_ParseTuple(args, "OOOOOi",
                         &py_fc,
@@ -555,7 +727,15 @@ py_perm_trans_symmetrize_compact_fc(PyObject *self, PyObject *args)
   n_patom = PyArray_DIMS(py_fc)[0];
   n_satom = PyArray_DIMS(py_fc)[1];
 
+  /* Maximum absolute sums along column (n=0) and row (n=1) subtracted */
+  /* at each primitive atom */
+  drifts = (double*)malloc(sizeof(double) * n_patom);
+  drift = 0;
+
   for (iter=0; iter < level; iter++) {
+    for (i = 0; i < n_patom; i++) {
+      drifts[i] = 0;
+    }
 
     for (n = 0; n < 2; n++) {
       /* transpose only */
@@ -567,6 +747,7 @@ py_perm_trans_symmetrize_compact_fc(PyObject *self, PyObject *args)
                                                 n_satom,
                                                 n_patom,
                                                 1);
+#pragma omp parallel for private(j, k, l, sum)
       for (i = 0; i < n_patom; i++) {
         for (k = 0; k < 3; k++) {
           for (l = 0; l < 3; l++) {
@@ -574,6 +755,9 @@ py_perm_trans_symmetrize_compact_fc(PyObject *self, PyObject *args)
             for (j = 0; j < n_satom; j++) {
               sum += fc[i * n_satom * 9 + j * 9 + k * 3 + l];
             }
+            if (fabs(sum) > drifts[i]) {
+              drifts[i] = fabs(sum);
+            }
             sum /= n_satom;
             for (j = 0; j < n_satom; j++) {
               fc[i * n_satom * 9 + j * 9 + k * 3 + l] -= sum;
@@ -591,11 +775,21 @@ py_perm_trans_symmetrize_compact_fc(PyObject *self, PyObject *args)
                                               n_satom,
                                               n_patom,
                                               0);
+
+    drift = 0;
+    for (i = 0; i < n_patom; i++) {
+      if (drifts[i] > drift) {
+        drift = drifts[i];
+      }
+    }
   }
 
   set_translational_symmetry_compact_fc(fc, p2s, n_satom, n_patom);
 
-  Py_RETURN_NONE;
+  free(drifts);
+  drifts = NULL;
+
+  return PyFloat_FromDouble(drift);
 }
 
 static PyObject * py_transpose_compact_fc(PyObject *self, PyObject *args)
@@ -655,13 +849,14 @@ static PyObject * py_get_dynamical_matrix(PyObject *self, PyObject *args)
   double* dm;
   double* fc;
   double* q;
-  double (*svecs)[27][3];
+  double (*svecs)[3];
   double* m;
-  int* multi;
+  int (*multi)[2];
   int* s2p_map;
   int* p2s_map;
   int num_patom;
   int num_satom;
+  int is_sparse_svecs;
 
   if (!PyArg_ParseTuple(args, "OOOOOOOO",
                         &py_dynamical_matrix,
@@ -678,9 +873,11 @@ static PyObject * py_get_dynamical_matrix(PyObject *self, PyObject *args)
   dm = (double*)PyArray_DATA(py_dynamical_matrix);
   fc = (double*)PyArray_DATA(py_force_constants);
   q = (double*)PyArray_DATA(py_q);
-  svecs = (double(*)[27][3])PyArray_DATA(py_shortest_vectors);
+  is_sparse_svecs = get_dense_svecs(&svecs,
+                                    &multi,
+                                    py_shortest_vectors,
+                                    py_multiplicities);
   m = (double*)PyArray_DATA(py_masses);
-  multi = (int*)PyArray_DATA(py_multiplicities);
   s2p_map = (int*)PyArray_DATA(py_s2p_map);
   p2s_map = (int*)PyArray_DATA(py_p2s_map);
   num_patom = PyArray_DIMS(py_p2s_map)[0];
@@ -699,9 +896,146 @@ static PyObject * py_get_dynamical_matrix(PyObject *self, PyObject *args)
                                 NULL,
                                 1);
 
+  if (is_sparse_svecs) {
+    free(svecs);
+    free(multi);
+  }
+
+  Py_RETURN_NONE;
+}
+
+static PyObject * py_get_dynamical_matrices(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_dynamical_matrices;
+  PyArrayObject* py_force_constants;
+  PyArrayObject* py_shortest_vectors;
+  PyArrayObject* py_qpoints;
+  PyArrayObject* py_multiplicities;
+  PyArrayObject* py_masses;
+  PyArrayObject* py_s2p_map;
+  PyArrayObject* py_p2s_map;
+
+  double* dm;
+  double* fc;
+  double (*qpoints)[3];
+  double (*svecs)[3];
+  double* m;
+  int (*multi)[2];
+  int* s2p_map;
+  int* p2s_map;
+  int num_qpoints;
+  int num_patom;
+  int num_satom;
+  int is_sparse_svecs;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOO",
+                        &py_dynamical_matrices,
+                        &py_force_constants,
+                        &py_qpoints,
+                        &py_shortest_vectors,
+                        &py_multiplicities,
+                        &py_masses,
+                        &py_s2p_map,
+                        &py_p2s_map)) {
+    return NULL;
+  }
+
+  dm = (double*)PyArray_DATA(py_dynamical_matrices);
+  fc = (double*)PyArray_DATA(py_force_constants);
+  qpoints = (double(*)[3])PyArray_DATA(py_qpoints);
+  num_qpoints = PyArray_DIMS(py_qpoints)[0];
+  is_sparse_svecs = get_dense_svecs(&svecs,
+                                    &multi,
+                                    py_shortest_vectors,
+                                    py_multiplicities);
+  m = (double*)PyArray_DATA(py_masses);
+  s2p_map = (int*)PyArray_DATA(py_s2p_map);
+  p2s_map = (int*)PyArray_DATA(py_p2s_map);
+  num_patom = PyArray_DIMS(py_p2s_map)[0];
+  num_satom = PyArray_DIMS(py_s2p_map)[0];
+
+  dym_get_dynamical_matrices_at_qpoints(dm,
+                                        num_qpoints,
+                                        num_patom,
+                                        num_satom,
+                                        fc,
+                                        qpoints,
+                                        svecs,
+                                        multi,
+                                        m,
+                                        s2p_map,
+                                        p2s_map);
+
+  if (is_sparse_svecs) {
+    free(svecs);
+    free(multi);
+  }
+
   Py_RETURN_NONE;
 }
 
+static PyObject *
+py_get_sparse_dynamical_matrices(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_dynamical_matrices;
+  PyArrayObject* py_atom_pairs;
+  PyArrayObject* py_force_constants;
+  PyArrayObject* py_qpoints;
+  PyArrayObject* py_shortest_vectors;
+  PyArrayObject* py_multiplicities;
+  PyArrayObject* py_masses;
+  PyArrayObject* py_s2pp_map;
+
+  double* dm;
+  int (*atom_pairs)[2];
+  double (*fc)[3][3];
+  double (*qpoints)[3];
+  double (*svecs)[3];
+  double* m;
+  int (*multi)[2];
+  int* s2pp_map;
+  int num_qpoints;
+  int num_patom;
+  int num_pair;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOO",
+                        &py_dynamical_matrices,
+                        &py_atom_pairs,
+                        &py_force_constants,
+                        &py_qpoints,
+                        &py_shortest_vectors,
+                        &py_multiplicities,
+                        &py_masses,
+                        &py_s2pp_map)) {
+    return NULL;
+  }
+
+  dm = (double*)PyArray_DATA(py_dynamical_matrices);
+  atom_pairs = (int(*)[2])PyArray_DATA(py_atom_pairs);
+  num_pair = PyArray_DIMS(py_atom_pairs)[0];
+  fc = (double(*)[3][3])PyArray_DATA(py_force_constants);
+  qpoints = (double(*)[3])PyArray_DATA(py_qpoints);
+  num_qpoints = PyArray_DIMS(py_qpoints)[0];
+  svecs = (double(*)[3])PyArray_DATA(py_shortest_vectors);
+  multi = (int(*)[2])PyArray_DATA(py_multiplicities);
+  m = (double*)PyArray_DATA(py_masses);
+  num_patom = PyArray_DIMS(py_masses)[0];
+  s2pp_map = (int*)PyArray_DATA(py_s2pp_map);
+
+  dym_get_sparse_dynamical_matrices_at_qpoints(dm,
+                                               num_qpoints,
+                                               num_patom,
+                                               num_pair,
+                                               atom_pairs,
+                                               fc,
+                                               qpoints,
+                                               svecs,
+                                               multi,
+                                               m,
+                                               s2pp_map);
+
+  Py_RETURN_NONE;
+}
 
 static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
 {
@@ -721,14 +1055,15 @@ static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
   double* fc;
   double* q_cart;
   double* q;
-  double (*svecs)[27][3];
+  double (*svecs)[3];
   double* m;
   double (*born)[3][3];
-  int* multi;
+  int (*multi)[2];
   int* s2p_map;
   int* p2s_map;
   int num_patom;
   int num_satom;
+  int is_sparse_svecs;
 
   int n;
   double (*charge_sum)[3][3];
@@ -751,10 +1086,12 @@ static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
   fc = (double*)PyArray_DATA(py_force_constants);
   q_cart = (double*)PyArray_DATA(py_q_cart);
   q = (double*)PyArray_DATA(py_q);
-  svecs = (double(*)[27][3])PyArray_DATA(py_shortest_vectors);
+  is_sparse_svecs = get_dense_svecs(&svecs,
+                                    &multi,
+                                    py_shortest_vectors,
+                                    py_multiplicities);
   m = (double*)PyArray_DATA(py_masses);
   born = (double(*)[3][3])PyArray_DATA(py_born);
-  multi = (int*)PyArray_DATA(py_multiplicities);
   s2p_map = (int*)PyArray_DATA(py_s2p_map);
   p2s_map = (int*)PyArray_DATA(py_p2s_map);
   num_patom = PyArray_DIMS(py_p2s_map)[0];
@@ -780,6 +1117,98 @@ static PyObject * py_get_nac_dynamical_matrix(PyObject *self, PyObject *args)
 
   free(charge_sum);
 
+  if (is_sparse_svecs) {
+    free(svecs);
+    free(multi);
+  }
+
+  Py_RETURN_NONE;
+}
+
+static PyObject * py_get_nac_dynamical_matrices(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_dynamical_matrices;
+  PyArrayObject* py_force_constants;
+  PyArrayObject* py_shortest_vectors;
+  PyArrayObject* py_q_cart;
+  PyArrayObject* py_qpoints;
+  PyArrayObject* py_multiplicities;
+  PyArrayObject* py_masses;
+  PyArrayObject* py_s2p_map;
+  PyArrayObject* py_p2s_map;
+  PyArrayObject* py_born;
+  PyArrayObject* py_dielectric;
+  double factor;
+
+  double* dm;
+  double* fc;
+  double (*q_cart)[3];
+  double (*qpoints)[3];
+  double (*svecs)[3];
+  double* m;
+  double (*born)[3][3];
+  double (*dielectric)[3];
+  int (*multi)[2];
+  int* s2p_map;
+  int* p2s_map;
+  int num_qpoints;
+  int num_patom;
+  int num_satom;
+  int is_sparse_svecs;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOOOOOd",
+                        &py_dynamical_matrices,
+                        &py_force_constants,
+                        &py_qpoints,
+                        &py_shortest_vectors,
+                        &py_multiplicities,
+                        &py_masses,
+                        &py_s2p_map,
+                        &py_p2s_map,
+                        &py_q_cart,
+                        &py_born,
+                        &py_dielectric,
+                        &factor))
+    return NULL;
+
+  dm = (double*)PyArray_DATA(py_dynamical_matrices);
+  fc = (double*)PyArray_DATA(py_force_constants);
+  q_cart = (double(*)[3])PyArray_DATA(py_q_cart);
+  qpoints = (double(*)[3])PyArray_DATA(py_qpoints);
+  num_qpoints = PyArray_DIMS(py_qpoints)[0];
+  is_sparse_svecs = get_dense_svecs(&svecs,
+                                    &multi,
+                                    py_shortest_vectors,
+                                    py_multiplicities);
+  m = (double*)PyArray_DATA(py_masses);
+  born = (double(*)[3][3])PyArray_DATA(py_born);
+  dielectric = (double(*)[3])PyArray_DATA(py_dielectric);
+  s2p_map = (int*)PyArray_DATA(py_s2p_map);
+  p2s_map = (int*)PyArray_DATA(py_p2s_map);
+  num_patom = PyArray_DIMS(py_p2s_map)[0];
+  num_satom = PyArray_DIMS(py_s2p_map)[0];
+
+  dym_get_nac_dynamical_matrices_at_qpoints(dm,
+                                            num_qpoints,
+                                            num_patom,
+                                            num_satom,
+                                            fc,
+                                            qpoints,
+                                            svecs,
+                                            multi,
+                                            m,
+                                            s2p_map,
+                                            p2s_map,
+                                            q_cart,
+                                            born,
+                                            dielectric,
+                                            factor / (num_satom / num_patom));
+
+  if (is_sparse_svecs) {
+    free(svecs);
+    free(multi);
+  }
+
   Py_RETURN_NONE;
 }
 
@@ -854,6 +1283,79 @@ static PyObject * py_get_recip_dipole_dipole(PyObject *self, PyObject *args)
   Py_RETURN_NONE;
 }
 
+static PyObject * py_get_recip_dipole_dipoles(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_dd;
+  PyArrayObject* py_dd_q0;
+  PyArrayObject* py_G_list;
+  PyArrayObject* py_G_phases;
+  PyArrayObject* py_qpoints_cart;
+  PyArrayObject* py_q_direction;
+  PyArrayObject* py_born;
+  PyArrayObject* py_dielectric;
+  double factor;
+  double lambda;
+  double tolerance;
+
+  double* dd;
+  double* dd_q0;
+  double (*G_list)[3];
+  double* G_phases;
+  double (*qpoints_cart)[3];
+  double* q_direction;
+  double (*born)[3][3];
+  double (*dielectric)[3];
+  int num_patom, num_G, num_q;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOOddd",
+                        &py_dd,
+                        &py_dd_q0,
+                        &py_G_list,
+                        &py_G_phases,
+                        &py_qpoints_cart,
+                        &py_q_direction,
+                        &py_born,
+                        &py_dielectric,
+                        &factor,
+                        &lambda,
+                        &tolerance))
+    return NULL;
+
+
+  dd = (double*)PyArray_DATA(py_dd);
+  dd_q0 = (double*)PyArray_DATA(py_dd_q0);
+  G_list = (double(*)[3])PyArray_DATA(py_G_list);
+  G_phases = (double*)PyArray_DATA(py_G_phases);
+  if ((PyObject*)py_q_direction == Py_None) {
+    q_direction = NULL;
+  } else {
+    q_direction = (double*)PyArray_DATA(py_q_direction);
+  }
+  qpoints_cart = (double(*)[3])PyArray_DATA(py_qpoints_cart);
+  born = (double(*)[3][3])PyArray_DATA(py_born);
+  dielectric = (double(*)[3])PyArray_DATA(py_dielectric);
+  num_G = PyArray_DIMS(py_G_list)[0];
+  num_patom = PyArray_DIMS(py_born)[0];
+  num_q = PyArray_DIMS(py_qpoints_cart)[0];
+
+  dym_get_recip_dipole_dipoles(dd, /* [nq, natom, 3, natom, 3, (real, imag)] */
+                               dd_q0, /* [natom, 3, 3, (real, imag)] */
+                               G_list, /* [num_kvec, 3] */
+                               G_phases, /* [num_kvec, natom, (real, imag)] */
+                               num_G,
+                               num_patom,
+                               qpoints_cart,
+                               num_q,
+                               q_direction,
+                               born,
+                               dielectric,
+                               factor, /* 4pi/V*unit-conv */
+                               lambda, /* 4 * Lambda^2 */
+                               tolerance);
+
+  Py_RETURN_NONE;
+}
+
 static PyObject * py_get_recip_dipole_dipole_q0(PyObject *self, PyObject *args)
 {
   PyArrayObject* py_dd_q0;
@@ -923,13 +1425,14 @@ static PyObject * py_get_derivative_dynmat(PyObject *self, PyObject *args)
   double* fc;
   double* q;
   double* lat;
-  double* r;
+  double (*svecs)[3];
   double* m;
-  int* multi;
+  int (*multi)[2];
   int* s2p_map;
   int* p2s_map;
   int num_patom;
   int num_satom;
+  int is_sparse_svecs;
 
   double *z;
   double *epsilon;
@@ -956,9 +1459,11 @@ static PyObject * py_get_derivative_dynmat(PyObject *self, PyObject *args)
   fc = (double*)PyArray_DATA(py_force_constants);
   q = (double*)PyArray_DATA(q_vector);
   lat = (double*)PyArray_DATA(lattice);
-  r = (double*)PyArray_DATA(r_vector);
   m = (double*)PyArray_DATA(py_masses);
-  multi = (int*)PyArray_DATA(py_multiplicities);
+  is_sparse_svecs = get_dense_svecs(&svecs,
+                                    &multi,
+                                    r_vector,
+                                    py_multiplicities);
   s2p_map = (int*)PyArray_DATA(py_s2p_map);
   p2s_map = (int*)PyArray_DATA(py_p2s_map);
   num_patom = PyArray_DIMS(py_p2s_map)[0];
@@ -986,8 +1491,8 @@ static PyObject * py_get_derivative_dynmat(PyObject *self, PyObject *args)
                              fc,
                              q,
                              lat,
-                             r,
-                             multi,
+                             (double*)svecs,
+                             (int*)multi,
                              m,
                              s2p_map,
                              p2s_map,
@@ -996,37 +1501,150 @@ static PyObject * py_get_derivative_dynmat(PyObject *self, PyObject *args)
                              epsilon,
                              q_dir);
 
+  if (is_sparse_svecs) {
+    free(svecs);
+    free(multi);
+  }
+
   Py_RETURN_NONE;
 }
 
-/* Thermal properties */
-static PyObject * py_get_thermal_properties(PyObject *self, PyObject *args)
+static PyObject * py_get_derivative_dynmats(PyObject *self, PyObject *args)
 {
-  PyArrayObject* py_thermal_props;
-  PyArrayObject* py_temperatures;
-  PyArrayObject* py_frequencies;
-  PyArrayObject* py_weights;
-
-  double cutoff_frequency;
-
-  double *temperatures;
+  PyArrayObject* derivative_dynmats;
+  PyArrayObject* py_force_constants;
+  PyArrayObject* r_vector;
+  PyArrayObject* lattice;
+  PyArrayObject* py_qpoints;
+  PyArrayObject* py_multiplicities;
+  PyArrayObject* py_masses;
+  PyArrayObject* py_s2p_map;
+  PyArrayObject* py_p2s_map;
+  PyArrayObject* py_born;
+  PyArrayObject* dielectric;
+  PyArrayObject* q_direction;
+  double nac_factor;
+
+  double* ddms;
+  double* fc;
+  double* qpoints;
+  double* lat;
+  double (*svecs)[3];
+  double* m;
+  int (*multi)[2];
+  int* s2p_map;
+  int* p2s_map;
+  int num_qpoints;
+  int num_patom;
+  int num_satom;
+  int is_sparse_svecs;
+
+  double *z;
+  double *epsilon;
+  double *q_dir;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOOOdOOO",
+                        &derivative_dynmats,
+                        &py_force_constants,
+                        &py_qpoints,
+                        &lattice, /* column vectors */
+                        &r_vector,
+                        &py_multiplicities,
+                        &py_masses,
+                        &py_s2p_map,
+                        &py_p2s_map,
+                        &nac_factor,
+                        &py_born,
+                        &dielectric,
+                        &q_direction)) {
+    return NULL;
+  }
+
+  ddms = (double*)PyArray_DATA(derivative_dynmats);
+  fc = (double*)PyArray_DATA(py_force_constants);
+  qpoints = (double*)PyArray_DATA(py_qpoints);
+  lat = (double*)PyArray_DATA(lattice);
+  m = (double*)PyArray_DATA(py_masses);
+  is_sparse_svecs = get_dense_svecs(&svecs,
+                                    &multi,
+                                    r_vector,
+                                    py_multiplicities);
+  s2p_map = (int*)PyArray_DATA(py_s2p_map);
+  p2s_map = (int*)PyArray_DATA(py_p2s_map);
+  num_qpoints = PyArray_DIMS(py_qpoints)[0];
+  num_patom = PyArray_DIMS(py_p2s_map)[0];
+  num_satom = PyArray_DIMS(py_s2p_map)[0];
+
+  if ((PyObject*)py_born == Py_None) {
+    z = NULL;
+  } else {
+    z = (double*)PyArray_DATA(py_born);
+  }
+  if ((PyObject*)dielectric == Py_None) {
+    epsilon = NULL;
+  } else {
+    epsilon = (double*)PyArray_DATA(dielectric);
+  }
+  if ((PyObject*)q_direction == Py_None) {
+    q_dir = NULL;
+  } else {
+    q_dir = (double*)PyArray_DATA(q_direction);
+  }
+
+  get_derivative_dynmat_at_qpoints(ddms,
+                                   num_qpoints,
+                                   num_patom,
+                                   num_satom,
+                                   fc,
+                                   qpoints,
+                                   lat,
+                                   (double*)svecs,
+                                   (int*)multi,
+                                   m,
+                                   s2p_map,
+                                   p2s_map,
+                                   nac_factor,
+                                   z,
+                                   epsilon,
+                                   q_dir);
+
+  if (is_sparse_svecs) {
+    free(svecs);
+    free(multi);
+  }
+
+  Py_RETURN_NONE;
+}
+
+/* Thermal properties */
+static PyObject * py_get_thermal_properties(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_thermal_props;
+  PyArrayObject* py_temperatures;
+  PyArrayObject* py_frequencies;
+  PyArrayObject* py_weights;
+  PyObject* py_mode_thermal_props;
+
+  double cutoff_frequency;
+
+  double *temperatures;
   double* freqs;
   double *thermal_props;
+  double *mode_thermal_props;
   int* w;
   int num_qpoints;
   int num_bands;
   int num_temp;
 
-  int i, j, k;
-  double f;
-  double *tp;
+  py_mode_thermal_props = NULL;
 
-  if (!PyArg_ParseTuple(args, "OOOOd",
+  if (!PyArg_ParseTuple(args, "OOOOd|O",
                         &py_thermal_props,
                         &py_temperatures,
                         &py_frequencies,
                         &py_weights,
-                        &cutoff_frequency)) {
+                        &cutoff_frequency,
+                        &py_mode_thermal_props)) {
     return NULL;
   }
 
@@ -1038,36 +1656,80 @@ static PyObject * py_get_thermal_properties(PyObject *self, PyObject *args)
   w = (int*)PyArray_DATA(py_weights);
   num_bands = PyArray_DIMS(py_frequencies)[1];
 
-  tp = (double*)malloc(sizeof(double) * num_qpoints * num_temp * 3);
-  for (i = 0; i < num_qpoints * num_temp * 3; i++) {
-    tp[i] = 0;
+  /* mode_thermal_props[num_temp][num_qpoints][num_bands][3] */
+  if (py_mode_thermal_props == NULL || py_mode_thermal_props == Py_None) {
+    mode_thermal_props = NULL;
+  } else {
+    mode_thermal_props =
+      (double*)PyArray_DATA((PyArrayObject*)py_mode_thermal_props);
   }
 
-#pragma omp parallel for private(j, k, f)
-  for (i = 0; i < num_qpoints; i++){
-    for (j = 0; j < num_temp; j++) {
-      for (k = 0; k < num_bands; k++){
-        f = freqs[i * num_bands + k];
-        if (temperatures[j] > 0 && f > cutoff_frequency) {
-          tp[i * num_temp * 3 + j * 3] +=
-            get_free_energy(temperatures[j], f) * w[i];
-          tp[i * num_temp * 3 + j * 3 + 1] +=
-            get_entropy(temperatures[j], f) * w[i];
-          tp[i * num_temp * 3 + j * 3 + 2] +=
-            get_heat_capacity(temperatures[j], f) * w[i];
-        }
-      }
-    }
-  }
+  get_thermal_properties(thermal_props,
+                         mode_thermal_props,
+                         temperatures,
+                         freqs,
+                         w,
+                         num_temp,
+                         num_qpoints,
+                         num_bands,
+                         cutoff_frequency);
 
-  for (i = 0; i < num_qpoints; i++) {
-    for (j = 0; j < num_temp * 3; j++) {
-      thermal_props[j] += tp[i * num_temp * 3 + j];
-    }
+  Py_RETURN_NONE;
+}
+
+static PyObject *
+py_get_projected_thermal_properties(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_thermal_props;
+  PyArrayObject* py_temperatures;
+  PyArrayObject* py_frequencies;
+  PyArrayObject* py_eigenvectors;
+  PyArrayObject* py_weights;
+
+  double cutoff_frequency;
+
+  double *temperatures;
+  double* freqs;
+  double* eigvecs;
+  double *thermal_props;
+  int* w;
+  int num_qpoints;
+  int num_elems;
+  int num_bands;
+  int num_temp;
+
+  if (!PyArg_ParseTuple(args, "OOOOOd",
+                        &py_thermal_props,
+                        &py_temperatures,
+                        &py_frequencies,
+                        &py_eigenvectors,
+                        &py_weights,
+                        &cutoff_frequency)) {
+    return NULL;
   }
 
-  free(tp);
-  tp = NULL;
+  /* thermal_props[num_temp][num_elems][3] */
+  thermal_props = (double*)PyArray_DATA(py_thermal_props);
+  temperatures = (double*)PyArray_DATA(py_temperatures);
+  num_temp = PyArray_DIMS(py_temperatures)[0];
+  freqs = (double*)PyArray_DATA(py_frequencies);
+  num_qpoints = PyArray_DIMS(py_frequencies)[0];
+  num_bands = PyArray_DIMS(py_frequencies)[1];
+  /* eigvecs[num_qpoints][num_elems][num_bands] (complex) */
+  eigvecs = (double*)PyArray_DATA(py_eigenvectors);
+  num_elems = PyArray_DIMS(py_eigenvectors)[1];
+  w = (int*)PyArray_DATA(py_weights);
+
+  get_projected_thermal_properties(thermal_props,
+                                   temperatures,
+                                   freqs,
+                                   eigvecs,
+                                   w,
+                                   num_temp,
+                                   num_qpoints,
+                                   num_elems,
+                                   num_bands,
+                                   cutoff_frequency);
 
   Py_RETURN_NONE;
 }
@@ -1139,6 +1801,80 @@ static PyObject * py_distribute_fc2(PyObject *self, PyObject *args)
   Py_RETURN_NONE;
 }
 
+static PyObject *
+py_space_group_symmetrize_fc(PyObject *self, PyObject *args)
+{
+  PyArrayObject* py_fc_sym;
+  PyArrayObject* py_fc;
+  PyArrayObject* py_rotations_cart;
+  PyArrayObject* py_permutations;
+  PyArrayObject* py_p2s_map;
+  PyArrayObject* py_s2pp_map;
+  PyArrayObject* py_nsym_list;
+  PyArrayObject* py_trans_perms;
+
+  double (*fc_sym)[3][3];
+  double (*fc)[3][3];
+  double (*r_carts)[3][3];
+  int *permutations;
+  int *p2s;
+  int *s2pp;
+  int *nsym_list;
+  int *trans_perms;
+  int num_rot, n_patom, n_satom;
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOO",
+                        &py_fc_sym,
+                        &py_fc,
+                        &py_rotations_cart,
+                        &py_permutations,
+                        &py_p2s_map,
+                        &py_s2pp_map,
+                        &py_nsym_list,
+                        &py_trans_perms)) {
+    return NULL;
+  }
+
+  fc_sym = (double(*)[3][3])PyArray_DATA(py_fc_sym);
+  fc = (double(*)[3][3])PyArray_DATA(py_fc);
+  r_carts = (double(*)[3][3])PyArray_DATA(py_rotations_cart);
+  permutations = (int*)PyArray_DATA(py_permutations);
+  p2s = (int*)PyArray_DATA(py_p2s_map);
+  s2pp = (int*)PyArray_DATA(py_s2pp_map);
+  nsym_list = (int*)PyArray_DATA(py_nsym_list);
+  trans_perms = (int*)PyArray_DATA(py_trans_perms);
+  num_rot = PyArray_DIMS(py_permutations)[0];
+  n_patom = PyArray_DIMS(py_fc)[0];
+  n_satom = PyArray_DIMS(py_fc)[1];
+
+  if (PyArray_DIMS(py_rotations_cart)[0] != num_rot)
+  {
+    PyErr_SetString(PyExc_ValueError, "permutations and rotations are different length");
+    return NULL;
+  }
+
+  if (PyArray_DIMS(py_permutations)[1] != n_satom ||
+      PyArray_DIMS(py_p2s_map)[0] != n_patom)
+  {
+    PyErr_SetString(PyExc_ValueError, "wrong shape for force constants");
+    return NULL;
+  }
+
+  space_group_symmetrize_fc(fc_sym,
+                            fc,
+                            r_carts,
+                            permutations,
+                            p2s,
+                            s2pp,
+                            nsym_list,
+                            trans_perms,
+                            num_rot,
+                            n_patom,
+                            n_satom);
+
+  Py_RETURN_NONE;
+}
+
 static PyObject *py_thm_neighboring_grid_points(PyObject *self, PyObject *args)
 {
   PyArrayObject* py_relative_grid_points;
@@ -1477,34 +2213,242 @@ static PyObject * py_tetrahedron_method_dos(PyObject *self, PyObject *args)
   Py_RETURN_NONE;
 }
 
-static double get_free_energy(const double temperature, const double f)
+/* Integration weights at grid_points for all bands and frequency points */
+/* are computed in one call. Loop over pairs of grid point and band is */
+/* parallelized. */
+static PyObject *
+py_tetrahedron_method_integration_weights(PyObject *self, PyObject *args)
 {
-  /* temperature is defined by T (K) */
-  /* 'f' must be given in eV. */
-  return KB * temperature * log(1 - exp(- f / (KB * temperature)));
+  PyArrayObject* py_iw;
+  PyArrayObject* py_freq_points;
+  PyArrayObject* py_grid_points;
+  PyArrayObject* py_mesh;
+  PyArrayObject* py_grid_address;
+  PyArrayObject* py_gp_ir_index;
+  PyArrayObject* py_relative_grid_address;
+  PyArrayObject* py_frequencies;
+  char* function;
+
+  double *iw;
+  double *freq_points;
+  size_t *grid_points;
+  int *mesh;
+  int (*grid_address)[3];
+  size_t *gp_ir_index;
+  int (*relative_grid_address)[4][3];
+  double *frequencies;
+  size_t num_gp_in, num_band, num_freq_points;
+
+  int is_shift[3] = {0, 0, 0};
+  size_t i, j, k, l, q, r, gp;
+  int g_addr[3];
+  int address_double[3];
+  double tetrahedra[24][4];
+
+  if (!PyArg_ParseTuple(args, "OOOOOOOOs",
+                        &py_iw,
+                        &py_freq_points,
+                        &py_grid_points,
+                        &py_mesh,
+                        &py_grid_address,
+                        &py_gp_ir_index,
+                        &py_relative_grid_address,
+                        &py_frequencies,
+                        &function)) {
+    return NULL;
+  }
+
+  /* iw[num_gp_in][num_freq_points][num_band] */
+  iw = (double*)PyArray_DATA(py_iw);
+  freq_points = (double*)PyArray_DATA(py_freq_points);
+  num_freq_points = (size_t)PyArray_DIMS(py_freq_points)[0];
+  grid_points = (size_t*)PyArray_DATA(py_grid_points);
+  num_gp_in = (size_t)PyArray_DIMS(py_grid_points)[0];
+  mesh = (int*)PyArray_DATA(py_mesh);
+  grid_address = (int(*)[3])PyArray_DATA(py_grid_address);
+  gp_ir_index = (size_t*)PyArray_DATA(py_gp_ir_index);
+  relative_grid_address = (int(*)[4][3])PyArray_DATA(py_relative_grid_address);
+  frequencies = (double*)PyArray_DATA(py_frequencies);
+  num_band = (size_t)PyArray_DIMS(py_frequencies)[1];
+
+#pragma omp parallel for private(i, j, k, l, q, r, gp, g_addr, address_double, tetrahedra)
+  for (i = 0; i < num_gp_in * num_band; i++) {
+    gp = grid_points[i / num_band];
+    k = i % num_band;
+    for (l = 0; l < 24; l++) {
+      for (q = 0; q < 4; q++) {
+        for (r = 0; r < 3; r++) {
+          g_addr[r] = grid_address[gp][r] + relative_grid_address[l][q][r];
+        }
+        kgd_get_grid_address_double_mesh(address_double,
+                                         g_addr,
+                                         mesh,
+                                         is_shift);
+        tetrahedra[l][q] = frequencies[
+          gp_ir_index[kgd_get_dense_grid_point_double_mesh(address_double,
+                                                           mesh)]
+          * num_band + k];
+      }
+    }
+    for (j = 0; j < num_freq_points; j++) {
+      iw[(i / num_band) * num_freq_points * num_band + j * num_band + k] =
+        thm_get_integration_weight(freq_points[j], tetrahedra, function[0]);
+    }
+  }
+
+  Py_RETURN_NONE;
 }
 
-static double get_entropy(const double temperature, const double f)
+/* Contributions of q-points are summed up in per-thread accumulators of */
+/* size num_temp * 3 and then added to thermal_props. */
+static void get_thermal_properties(double *thermal_props,
+                                   double *mode_thermal_props,
+                                   const double *temperatures,
+                                   const double *freqs,
+                                   const int *weights,
+                                   const int num_temp,
+                                   const int num_qpoints,
+                                   const int num_bands,
+                                   const double cutoff_frequency)
 {
-  /* temperature is defined by T (K) */
-  /* 'f' must be given in eV. */
-  double val;
+  int i, j, k, l;
+  size_t adrs;
+  double f;
+  double tp[3];
+  double *tp_thread;
 
-  val = f / (2 * KB * temperature);
-  return 1 / (2 * temperature) * f * cosh(val) / sinh(val) - KB * log(2 * sinh(val));
+#pragma omp parallel private(i, j, k, l, adrs, f, tp, tp_thread)
+  {
+    tp_thread = (double*)malloc(sizeof(double) * num_temp * 3);
+    for (j = 0; j < num_temp * 3; j++) {
+      tp_thread[j] = 0;
+    }
+
+#pragma omp for
+    for (i = 0; i < num_qpoints; i++) {
+      for (j = 0; j < num_temp; j++) {
+        for (k = 0; k < num_bands; k++) {
+          f = freqs[i * num_bands + k];
+          if (temperatures[j] > 0 && f > cutoff_frequency) {
+            get_thermal_properties_of_mode(tp, temperatures[j], f);
+          } else {
+            for (l = 0; l < 3; l++) {
+              tp[l] = 0;
+            }
+          }
+          for (l = 0; l < 3; l++) {
+            tp_thread[j * 3 + l] += tp[l] * weights[i];
+          }
+          if (mode_thermal_props != NULL) {
+            adrs = (((size_t)j * num_qpoints + i) * num_bands + k) * 3;
+            for (l = 0; l < 3; l++) {
+              mode_thermal_props[adrs + l] = tp[l];
+            }
+          }
+        }
+      }
+    }
+
+#pragma omp critical
+    {
+      for (j = 0; j < num_temp * 3; j++) {
+        thermal_props[j] += tp_thread[j];
+      }
+    }
+
+    free(tp_thread);
+    tp_thread = NULL;
+  }
 }
 
-static double get_heat_capacity(const double temperature, const double f)
+/* Thermal properties projected on elements of eigenvectors, i.e., */
+/* atoms and Cartesian directions, are accumulated. Squared eigenvector */
+/* elements are computed on the fly. Free energy includes zero point */
+/* energy. */
+static void get_projected_thermal_properties(double *thermal_props,
+                                             const double *temperatures,
+                                             const double *freqs,
+                                             const double *eigvecs,
+                                             const int *weights,
+                                             const int num_temp,
+                                             const int num_qpoints,
+                                             const int num_elems,
+                                             const int num_bands,
+                                             const double cutoff_frequency)
 {
-  /* temperature is defined by T (K) */
-  /* 'f' must be given in eV. */
-  /* If val is close to 1. Then expansion is used. */
-  double val, val1, val2;
-
-  val = f / (KB * temperature);
-  val1 = exp(val);
-  val2 = (val) / (val1 - 1);
-  return KB * val1 * val2 * val2;
+  int i, j, k, l, m;
+  size_t adrs;
+  double f, e2;
+  double *tp_mode, *tp_thread;
+
+#pragma omp parallel private(i, j, k, l, m, adrs, f, e2, tp_mode, tp_thread)
+  {
+    tp_mode = (double*)malloc(sizeof(double) * num_temp * 3);
+    tp_thread = (double*)malloc(sizeof(double) * num_temp * num_elems * 3);
+    for (j = 0; j < num_temp * num_elems * 3; j++) {
+      tp_thread[j] = 0;
+    }
+
+#pragma omp for
+    for (i = 0; i < num_qpoints; i++) {
+      for (k = 0; k < num_bands; k++) {
+        f = freqs[i * num_bands + k];
+        if (!(f > cutoff_frequency)) {
+          continue;
+        }
+        for (j = 0; j < num_temp; j++) {
+          if (temperatures[j] > 0) {
+            get_thermal_properties_of_mode(tp_mode + j * 3, temperatures[j], f);
+          } else {
+            for (m = 0; m < 3; m++) {
+              tp_mode[j * 3 + m] = 0;
+            }
+          }
+          tp_mode[j * 3] += f / 2;
+        }
+        for (l = 0; l < num_elems; l++) {
+          adrs = ((size_t)i * num_elems + l) * num_bands + k;
+          e2 = (eigvecs[adrs * 2] * eigvecs[adrs * 2] +
+                eigvecs[adrs * 2 + 1] * eigvecs[adrs * 2 + 1]) * weights[i];
+          for (j = 0; j < num_temp; j++) {
+            for (m = 0; m < 3; m++) {
+              tp_thread[(j * num_elems + l) * 3 + m] += e2 * tp_mode[j * 3 + m];
+            }
+          }
+        }
+      }
+    }
+
+#pragma omp critical
+    {
+      for (j = 0; j < num_temp * num_elems * 3; j++) {
+        thermal_props[j] += tp_thread[j];
+      }
+    }
+
+    free(tp_mode);
+    tp_mode = NULL;
+    free(tp_thread);
+    tp_thread = NULL;
+  }
+}
+
+/* Free energy without zero point energy, entropy, and heat capacity */
+/* are computed sharing exp(-f / kT). */
+/* temperature is defined by T (K) */
+/* 'f' must be given in eV. */
+static void get_thermal_properties_of_mode(double tp[3],
+                                           const double temperature,
+                                           const double f)
+{
+  double x, exp_x, log_1m_exp_x;
+
+  x = f / (KB * temperature);
+  exp_x = exp(-x);
+  log_1m_exp_x = log1p(-exp_x);
+  tp[0] = KB * temperature * log_1m_exp_x;
+  tp[1] = KB * (x * exp_x / (1 - exp_x) - log_1m_exp_x);
+  tp[2] = KB * x * x * exp_x / ((1 - exp_x) * (1 - exp_x));
 }
 
 /* static double get_energy(double temperature, double f){ */
@@ -1688,6 +2632,130 @@ static void gsv_set_smallest_vectors(double (*smallest_vectors)[27][3],
   vec = NULL;
 }
 
+/* Shortest vectors are written in the dense layout, i.e., a flat list of */
+/* vectors with [multiplicity, address] for each pair. With initialize=1, */
+/* only multiplicity[i][0] is set. Addresses multiplicity[i][1] have to be */
+/* set from these counts before calling with initialize=0. */
+static void
+gsv_set_smallest_vectors_dense(double (*smallest_vectors)[3],
+                               int (*multiplicity)[2],
+                               PHPYCONST double (*pos_to)[3],
+                               const int num_pos_to,
+                               PHPYCONST double (*pos_from)[3],
+                               const int num_pos_from,
+                               PHPYCONST int (*lattice_points)[3],
+                               const int num_lattice_points,
+                               PHPYCONST double reduced_basis[3][3],
+                               PHPYCONST int trans_mat[3][3],
+                               const int initialize,
+                               const double symprec)
+{
+  int i, j, k, l, count, adrs;
+  double length_tmp, minimum, vec_xyz;
+  double *length;
+  double (*vec)[3];
+
+#pragma omp parallel private(j, k, l, count, adrs, length_tmp, minimum, vec_xyz, length, vec)
+  {
+    length = (double*)malloc(sizeof(double) * num_lattice_points);
+    vec = (double(*)[3])malloc(sizeof(double[3]) * num_lattice_points);
+
+#pragma omp for
+    for (i = 0; i < num_pos_to; i++) {
+      for (j = 0; j < num_pos_from; j++) {
+        for (k = 0; k < num_lattice_points; k++) {
+          length[k] = 0;
+          for (l = 0; l < 3; l++) {
+            vec[k][l] = pos_to[i][l] - pos_from[j][l] + lattice_points[k][l];
+          }
+          for (l = 0; l < 3; l++) {
+            length_tmp = (reduced_basis[l][0] * vec[k][0] +
+                          reduced_basis[l][1] * vec[k][1] +
+                          reduced_basis[l][2] * vec[k][2]);
+            length[k] += length_tmp * length_tmp;
+          }
+          length[k] = sqrt(length[k]);
+        }
+
+        minimum = DBL_MAX;
+        for (k = 0; k < num_lattice_points; k++) {
+          if (length[k] < minimum) {
+            minimum = length[k];
+          }
+        }
+
+        count = 0;
+        adrs = multiplicity[i * num_pos_from + j][1];
+        for (k = 0; k < num_lattice_points; k++) {
+          if (length[k] - minimum < symprec) {
+            if (!initialize) {
+              for (l = 0; l < 3; l++) {
+                /* Transform to supercell coordinates */
+                vec_xyz = (trans_mat[l][0] * vec[k][0] +
+                           trans_mat[l][1] * vec[k][1] +
+                           trans_mat[l][2] * vec[k][2]);
+                smallest_vectors[adrs + count][l] = vec_xyz;
+              }
+            }
+            count++;
+          }
+        }
+        if (initialize) {
+          multiplicity[i * num_pos_from + j][0] = count;
+        }
+      }
+    }
+
+    free(length);
+    length = NULL;
+    free(vec);
+    vec = NULL;
+  }
+}
+
+/* Shortest vectors given in the sparse layout of [num_satom, num_patom, */
+/* 27, 3] with multiplicities of [num_satom, num_patom] are converted to */
+/* the dense layout. Returns 1 when the arrays are newly allocated, which */
+/* have to be freed by the caller, otherwise the data are used as is. */
+static int get_dense_svecs(double (**svecs)[3],
+                           int (**multi)[2],
+                           PyArrayObject* py_svecs,
+                           PyArrayObject* py_multi)
+{
+  int i, j, num_pair, num_svecs;
+  int *sparse_multi;
+  double (*sparse_svecs)[27][3];
+
+  if (PyArray_NDIM(py_svecs) != 4) {
+    *svecs = (double(*)[3])PyArray_DATA(py_svecs);
+    *multi = (int(*)[2])PyArray_DATA(py_multi);
+    return 0;
+  }
+
+  sparse_svecs = (double(*)[27][3])PyArray_DATA(py_svecs);
+  sparse_multi = (int*)PyArray_DATA(py_multi);
+  num_pair = PyArray_DIMS(py_multi)[0] * PyArray_DIMS(py_multi)[1];
+
+  *multi = (int(*)[2])malloc(sizeof(int[2]) * num_pair);
+  num_svecs = 0;
+  for (i = 0; i < num_pair; i++) {
+    (*multi)[i][0] = sparse_multi[i];
+    (*multi)[i][1] = num_svecs;
+    num_svecs += sparse_multi[i];
+  }
+
+  *svecs = (double(*)[3])malloc(sizeof(double[3]) * num_svecs);
+  for (i = 0; i < num_pair; i++) {
+    for (j = 0; j < sparse_multi[i]; j++) {
+      (*svecs)[(*multi)[i][1] + j][0] = sparse_svecs[i][j][0];
+      (*svecs)[(*multi)[i][1] + j][1] = sparse_svecs[i][j][1];
+      (*svecs)[(*multi)[i][1] + j][2] = sparse_svecs[i][j][2];
+    }
+  }
+
+  return 1;
+}
+
 static void distribute_fc2(double (*fc2)[3][3], /* shape[n_pos][n_pos] */
                            const int * atom_list,
                            const int len_atom_list,
@@ -1698,10 +2766,11 @@ static void distribute_fc2(double (*fc2)[3][3], /* shape[n_pos][n_pos] */
                            const int num_rot,
                            const int num_pos)
 {
-  int i, j, k, l, m;
+  int i, j, k, l;
   int atom_todo, atom_done, atom_other;
   int sym_index;
   int *atom_list_reverse;
+  double tmp[3][3];
   double (*fc2_done)[3];
   double (*fc2_todo)[3];
   double (*r_cart)[3];
@@ -1717,6 +2786,9 @@ static void distribute_fc2(double (*fc2)[3][3], /* shape[n_pos][n_pos] */
     }
   }
 
+  /* Each row i is written only here and rows of atoms in the done */
+  /* list are only read, so rows can be distributed in parallel. */
+#pragma omp parallel for private(j, k, l, atom_todo, atom_done, atom_other, sym_index, tmp, fc2_done, fc2_todo, r_cart, permutation)
   for (i = 0; i < len_atom_list; i++) {
     /* look up how this atom maps into the done list. */
     atom_todo = atom_list[i];
@@ -1737,13 +2809,19 @@ static void distribute_fc2(double (*fc2)[3][3], /* shape[n_pos][n_pos] */
     for (atom_other = 0; atom_other < num_pos; atom_other++) {
       fc2_done = fc2[atom_list_reverse[atom_done] * num_pos + permutation[atom_other]];
       fc2_todo = fc2[i * num_pos + atom_other];
+      /* P' = R^-1 P R */
       for (j = 0; j < 3; j++) {
         for (k = 0; k < 3; k++) {
+          tmp[j][k] = 0;
           for (l = 0; l < 3; l++) {
-            for (m = 0; m < 3; m++) {
-              /* P' = R^-1 P R */
-              fc2_todo[j][k] += r_cart[l][j] * r_cart[m][k] * fc2_done[l][m];
-            }
+            tmp[j][k] += r_cart[l][j] * fc2_done[l][k];
+          }
+        }
+      }
+      for (j = 0; j < 3; j++) {
+        for (k = 0; k < 3; k++) {
+          for (l = 0; l < 3; l++) {
+            fc2_todo[j][k] += tmp[j][l] * r_cart[l][k];
           }
         }
       }
@@ -1754,11 +2832,77 @@ static void distribute_fc2(double (*fc2)[3][3], /* shape[n_pos][n_pos] */
   atom_list_reverse = NULL;
 }
 
+/* fc_sym[i, j] = 1/N sum_r R_r^T fc[r(i), r(j)] R_r */
+/* fc[a, b] is looked up as fc[s2pp[a], t(b)] where t = */
+/* trans_perms[nsym_list[a]] translates a into primitive cell. */
+/* For full force constants, identity mappings are given. */
+static void space_group_symmetrize_fc(double (*fc_sym)[3][3],
+                                      PHPYCONST double (*fc)[3][3],
+                                      PHPYCONST double (*r_carts)[3][3],
+                                      const int * permutations,
+                                      const int * p2s,
+                                      const int * s2pp,
+                                      const int * nsym_list,
+                                      const int * trans_perms,
+                                      const int num_rot,
+                                      const int n_patom,
+                                      const int n_satom)
+{
+  int ij, i, j, k, l, m, r, i_rot, j_rot;
+  double sum[3][3], tmp[3][3];
+  double (*r_cart)[3];
+  const double (*fc_rot)[3];
+  const int * permutation;
+
+#pragma omp parallel for private(i, j, k, l, m, r, i_rot, j_rot, sum, tmp, r_cart, fc_rot, permutation)
+  for (ij = 0; ij < n_patom * n_satom; ij++) {
+    i = p2s[ij / n_satom];
+    j = ij % n_satom;
+    for (k = 0; k < 3; k++) {
+      for (l = 0; l < 3; l++) {
+        sum[k][l] = 0;
+      }
+    }
+    for (r = 0; r < num_rot; r++) {
+      permutation = permutations + r * n_satom;
+      r_cart = r_carts[r];
+      i_rot = permutation[i];
+      j_rot = permutation[j];
+      fc_rot = (const double (*)[3])
+        fc[s2pp[i_rot] * n_satom +
+           trans_perms[nsym_list[i_rot] * n_satom + j_rot]];
+      /* P' = R^T P R */
+      for (k = 0; k < 3; k++) {
+        for (l = 0; l < 3; l++) {
+          tmp[k][l] = 0;
+          for (m = 0; m < 3; m++) {
+            tmp[k][l] += r_cart[m][k] * fc_rot[m][l];
+          }
+        }
+      }
+      for (k = 0; k < 3; k++) {
+        for (l = 0; l < 3; l++) {
+          for (m = 0; m < 3; m++) {
+            sum[k][l] += tmp[k][m] * r_cart[m][l];
+          }
+        }
+      }
+    }
+    for (k = 0; k < 3; k++) {
+      for (l = 0; l < 3; l++) {
+        fc_sym[ij][k][l] = sum[k][l] / num_rot;
+      }
+    }
+  }
+}
+
 static void set_index_permutation_symmetry_fc(double * fc,
                                               const int natom)
 {
   int i, j, k, l, m, n;
 
+  /* Pair (i, j) and (j, i) is processed only at row min(i, j). */
+#pragma omp parallel for private(j, k, l, m, n)
   for (i = 0; i < natom; i++) {
     /* non diagonal part */
     for (j = i + 1; j < natom; j++) {
@@ -1792,6 +2936,7 @@ static void set_translational_symmetry_fc(double * fc,
   int i, j, k, l, m;
   double sums[3][3];
 
+#pragma omp parallel for private(j, k, l, m, sums)
   for (i = 0; i < natom; i++) {
     for (k = 0; k < 3; k++) {
       for (l = 0; l < 3; l++) {
@@ -1822,67 +2967,48 @@ static void set_index_permutation_symmetry_compact_fc(double * fc,
                                                       const int n_patom,
                                                       const int is_transpose)
 {
-  int i, j, k, l, m, n, i_p, j_p, i_trans;
+  int i, j, k, l, m, n, i_p, j_p, i_trans, ij, ji;
   double fc_elem;
-  char *done;
 
-  done = NULL;
-  done = (char*)malloc(sizeof(char) * n_satom * n_patom);
-  for (i = 0; i < n_satom * n_patom; i++) {
-    done[i] = 0;
-  }
-
-  for (j = 0; j < n_satom; j++) {
+#pragma omp parallel for private(i, j, k, l, m, n, i_p, j_p, i_trans, ji, fc_elem)
+  for (ij = 0; ij < n_patom * n_satom; ij++) {
+    i_p = ij / n_satom;
+    j = ij % n_satom;
+    i = p2s[i_p];
     j_p = s2pp[j];
-    for (i_p = 0; i_p < n_patom; i_p++) {
-      i = p2s[i_p];
-      if (i == j) { /* diagnoal part */
-        for (k = 0; k < 3; k++) {
-          for (l = 0; l < 3; l++) {
-            if (l > k) {
-              m = i_p * n_satom * 9 + i * 9 + k * 3 + l;
-              n = i_p * n_satom * 9 + i * 9 + l * 3 + k;
-              if (is_transpose) {
-                fc_elem = fc[m];
-                fc[m] = fc[n];
-                fc[n] = fc_elem;
-              } else {
-                fc[m] = (fc[m] + fc[n]) / 2;
-                fc[n] = fc[m];
-              }
-            }
-          }
+    /* (j, i) -- nsym_list[j] --> (j', i') */
+    /* nsym_list[j] translates j to j' where j' is in */
+    /* primitive cell. The same translation sends i to i' */
+    /* where i' is not necessarily to be in primitive cell. */
+    /* Thus, i' = perms[nsym_list[j] * n_satom + i] */
+    i_trans = perms[nsym_list[j] * n_satom + i];
+    ji = j_p * n_satom + i_trans;
+
+    /* Each pair of elements is processed once at the smaller index. */
+    if (ij > ji) {
+      continue;
+    }
+
+    for (k = 0; k < 3; k++) {
+      for (l = 0; l < 3; l++) {
+        /* Diagonal part and elements paired with themselves, which */
+        /* happens e.g. for j = i + a/2 */
+        if (ij == ji && l <= k) {
+          continue;
         }
-      }
-      if (!done[i_p * n_satom + j]) {
-        /* (j, i) -- nsym_list[j] --> (j', i') */
-        /* nsym_list[j] translates j to j' where j' is in */
-        /* primitive cell. The same translation sends i to i' */
-        /* where i' is not necessarily to be in primitive cell. */
-        /* Thus, i' = perms[nsym_list[j] * n_satom + i] */
-        i_trans = perms[nsym_list[j] * n_satom + i];
-        done[i_p * n_satom + j] = 1;
-        done[j_p * n_satom + i_trans] = 1;
-        for (k = 0; k < 3; k++) {
-          for (l = 0; l < 3; l++) {
-            m = i_p * n_satom * 9 + j * 9 + k * 3 + l;
-            n = j_p * n_satom * 9 + i_trans * 9 + l * 3 + k;
-            if (is_transpose) {
-              fc_elem = fc[m];
-              fc[m] = fc[n];
-              fc[n] = fc_elem;
-            } else {
-              fc[m] = (fc[n] + fc[m]) / 2;
-              fc[n] = fc[m];
-            }
-          }
+        m = ij * 9 + k * 3 + l;
+        n = ji * 9 + l * 3 + k;
+        if (is_transpose) {
+          fc_elem = fc[m];
+          fc[m] = fc[n];
+          fc[n] = fc_elem;
+        } else {
+          fc[m] = (fc[n] + fc[m]) / 2;
+          fc[n] = fc[m];
         }
       }
     }
   }
-
-  free(done);
-  done = NULL;
 }
 
 static void set_translational_symmetry_compact_fc(double * fc,
@@ -1893,6 +3019,7 @@ static void set_translational_symmetry_compact_fc(double * fc,
   int j, k, l, m, i_p;
   double sums[3][3];
 
+#pragma omp parallel for private(j, k, l, m, sums)
   for (i_p = 0; i_p < n_patom; i_p++) {
     for (k = 0; k < 3; k++) {
       for (l = 0; l < 3; l++) {
@@ -37,13 +37,23 @@
 #include <dynmat.h>
 #define PI 3.14159265358979323846
 
+static void get_sparse_dynamical_matrix_at_q(double *dynamical_matrix,
+                                             const int num_patom,
+                                             const int num_pair,
+                                             PHPYCONST int (*atom_pairs)[2],
+                                             PHPYCONST double (*fc)[3][3],
+                                             const double q[3],
+                                             PHPYCONST double (*svecs)[3],
+                                             PHPYCONST int (*multi)[2],
+                                             const double *mass,
+                                             const int *s2pp_map);
 static void get_dynmat_ij(double *dynamical_matrix,
                           const int num_patom,
                           const int num_satom,
                           const double *fc,
                           const double q[3],
-                          PHPYCONST double (*svecs)[27][3],
-                          const int *multi,
+                          PHPYCONST double (*svecs)[3],
+                          PHPYCONST int (*multi)[2],
                           const double *mass,
                           const int *s2p_map,
                           const int *p2s_map,
@@ -56,8 +66,8 @@ static void get_dm(double dm_real[3][3],
                    const int num_satom,
                    const double *fc,
                    const double q[3],
-                   PHPYCONST double (*svecs)[27][3],
-                   const int *multi,
+                   PHPYCONST double (*svecs)[3],
+                   PHPYCONST int (*multi)[2],
                    const int *p2s_map,
                    PHPYCONST double (*charge_sum)[3][3],
                    const int i,
@@ -75,6 +85,34 @@ static void get_KK(double *dd_part, /* [natom, 3, natom, 3, (real,imag)] */
                    PHPYCONST double (*pos)[3], /* [num_patom, 3] */
                    const double lambda,
                    const double tolerance);
+static void get_recip_dipole_dipole_with_tables(double *dd, /* [natom, 3, natom, 3, (real,imag)] */
+                                                const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
+                                                PHPYCONST double (*G_list)[3], /* [num_G, 3] */
+                                                const double *G_phases, /* [num_G, natom, (real,imag)] */
+                                                const int num_G,
+                                                const int num_patom,
+                                                const double q_cart[3],
+                                                const double *q_direction_cart,
+                                                PHPYCONST double (*born)[3][3],
+                                                PHPYCONST double dielectric[3][3],
+                                                const double factor,
+                                                const double lambda,
+                                                const double tolerance);
+static void get_nac_dynamical_matrix_at_q(double *dynamical_matrix,
+                                          const int num_patom,
+                                          const int num_satom,
+                                          const double *fc,
+                                          const double q[3],
+                                          PHPYCONST double (*svecs)[3],
+                                          PHPYCONST int (*multi)[2],
+                                          const double *mass,
+                                          const int *s2p_map,
+                                          const int *p2s_map,
+                                          const double q_cart[3],
+                                          PHPYCONST double (*born)[3][3],
+                                          PHPYCONST double dielectric[3][3],
+                                          const double factor,
+                                          const int with_openmp);
 static void make_Hermitian(double *mat, const int num_band);
 static void multiply_borns(double *dd,
                            const double *dd_in,
@@ -86,8 +124,8 @@ int dym_get_dynamical_matrix_at_q(double *dynamical_matrix,
                                   const int num_satom,
                                   const double *fc,
                                   const double q[3],
-                                  PHPYCONST double (*svecs)[27][3],
-                                  const int *multi,
+                                  PHPYCONST double (*svecs)[3],
+                                  PHPYCONST int (*multi)[2],
                                   const double *mass,
                                   const int *s2p_map,
                                   const int *p2s_map,
@@ -138,6 +176,159 @@ int dym_get_dynamical_matrix_at_q(double *dynamical_matrix,
   return 0;
 }
 
+/* dynamical_matrices[num_qpoints, num_patom * 3, num_patom * 3, (real,imag)] */
+void dym_get_dynamical_matrices_at_qpoints(double *dynamical_matrices,
+                                           const int num_qpoints,
+                                           const int num_patom,
+                                           const int num_satom,
+                                           const double *fc,
+                                           PHPYCONST double (*qpoints)[3],
+                                           PHPYCONST double (*svecs)[3],
+                                           PHPYCONST int (*multi)[2],
+                                           const double *mass,
+                                           const int *s2p_map,
+                                           const int *p2s_map)
+{
+  int i;
+  size_t adrs_shift;
+
+  adrs_shift = (size_t)num_patom * num_patom * 18;
+
+  /* With single q-point, parallelization over atom pairs is more efficient. */
+  if (num_qpoints == 1) {
+    dym_get_dynamical_matrix_at_q(dynamical_matrices,
+                                  num_patom,
+                                  num_satom,
+                                  fc,
+                                  qpoints[0],
+                                  svecs,
+                                  multi,
+                                  mass,
+                                  s2p_map,
+                                  p2s_map,
+                                  NULL,
+                                  1);
+    return;
+  }
+
+#pragma omp parallel for
+  for (i = 0; i < num_qpoints; i++) {
+    dym_get_dynamical_matrix_at_q(dynamical_matrices + adrs_shift * i,
+                                  num_patom,
+                                  num_satom,
+                                  fc,
+                                  qpoints[i],
+                                  svecs,
+                                  multi,
+                                  mass,
+                                  s2p_map,
+                                  p2s_map,
+                                  NULL,
+                                  0);
+  }
+}
+
+/* Dynamical matrices with NAC by Wang et al. */
+/* q_cart[num_qpoints, 3]: q-vectors or q-directions in Cartesian */
+/* factor: 4pi/V*unit-conv divided by number of primitive cells */
+/* dynamical_matrices[num_qpoints, num_patom * 3, num_patom * 3, (real,imag)] */
+void dym_get_nac_dynamical_matrices_at_qpoints(double *dynamical_matrices,
+                                               const int num_qpoints,
+                                               const int num_patom,
+                                               const int num_satom,
+                                               const double *fc,
+                                               PHPYCONST double (*qpoints)[3],
+                                               PHPYCONST double (*svecs)[3],
+                                               PHPYCONST int (*multi)[2],
+                                               const double *mass,
+                                               const int *s2p_map,
+                                               const int *p2s_map,
+                                               PHPYCONST double (*q_cart)[3],
+                                               PHPYCONST double (*born)[3][3],
+                                               PHPYCONST double dielectric[3][3],
+                                               const double factor)
+{
+  int i;
+  size_t adrs_shift;
+
+  adrs_shift = (size_t)num_patom * num_patom * 18;
+
+  /* With single q-point, parallelization over atom pairs is more efficient. */
+  if (num_qpoints == 1) {
+    get_nac_dynamical_matrix_at_q(dynamical_matrices,
+                                  num_patom,
+                                  num_satom,
+                                  fc,
+                                  qpoints[0],
+                                  svecs,
+                                  multi,
+                                  mass,
+                                  s2p_map,
+                                  p2s_map,
+                                  q_cart[0],
+                                  born,
+                                  dielectric,
+                                  factor,
+                                  1);
+    return;
+  }
+
+#pragma omp parallel for
+  for (i = 0; i < num_qpoints; i++) {
+    get_nac_dynamical_matrix_at_q(dynamical_matrices + adrs_shift * i,
+                                  num_patom,
+                                  num_satom,
+                                  fc,
+                                  qpoints[i],
+                                  svecs,
+                                  multi,
+                                  mass,
+                                  s2p_map,
+                                  p2s_map,
+                                  q_cart[i],
+                                  born,
+                                  dielectric,
+                                  factor,
+                                  0);
+  }
+}
+
+/* Force constants are given for atom pairs (primitive atom index, */
+/* supercell atom index). */
+/* svecs[num_svecs, 3], multi[num_pair, (count, address in svecs)] */
+/* dynamical_matrices[num_qpoints, num_patom * 3, num_patom * 3, (real,imag)] */
+void dym_get_sparse_dynamical_matrices_at_qpoints(double *dynamical_matrices,
+                                                  const int num_qpoints,
+                                                  const int num_patom,
+                                                  const int num_pair,
+                                                  PHPYCONST int (*atom_pairs)[2],
+                                                  PHPYCONST double (*fc)[3][3],
+                                                  PHPYCONST double (*qpoints)[3],
+                                                  PHPYCONST double (*svecs)[3],
+                                                  PHPYCONST int (*multi)[2],
+                                                  const double *mass,
+                                                  const int *s2pp_map)
+{
+  int i;
+  size_t adrs_shift;
+
+  adrs_shift = (size_t)num_patom * num_patom * 18;
+
+#pragma omp parallel for
+  for (i = 0; i < num_qpoints; i++) {
+    get_sparse_dynamical_matrix_at_q(dynamical_matrices + adrs_shift * i,
+                                     num_patom,
+                                     num_pair,
+                                     atom_pairs,
+                                     fc,
+                                     qpoints[i],
+                                     svecs,
+                                     multi,
+                                     mass,
+                                     s2pp_map);
+  }
+}
+
 void dym_get_recip_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (real,imag)] */
                                  const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
                                  PHPYCONST double (*G_list)[3], /* [num_G, 3] */
@@ -198,6 +389,44 @@ void dym_get_recip_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (real,imag)
   dd_tmp = NULL;
 }
 
+/* Reciprocal dipole-dipole terms at many q-points */
+/* G_phases: exp(2pi i G.r) of atoms in primitive cell for G in G_list */
+/* Loop over q-points is parallelized by OpenMP. */
+void dym_get_recip_dipole_dipoles(double *dd, /* [num_q, natom, 3, natom, 3, (real,imag)] */
+                                  const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
+                                  PHPYCONST double (*G_list)[3], /* [num_G, 3] */
+                                  const double *G_phases, /* [num_G, natom, (real,imag)] */
+                                  const int num_G,
+                                  const int num_patom,
+                                  PHPYCONST double (*qpoints_cart)[3], /* [num_q, 3] */
+                                  const int num_q,
+                                  const double *q_direction_cart, /* must be pointer */
+                                  PHPYCONST double (*born)[3][3],
+                                  PHPYCONST double dielectric[3][3],
+                                  const double factor, /* 4pi/V*unit-conv */
+                                  const double lambda,
+                                  const double tolerance)
+{
+  int i;
+
+#pragma omp parallel for
+  for (i = 0; i < num_q; i++) {
+    get_recip_dipole_dipole_with_tables(dd + i * num_patom * num_patom * 18,
+                                        dd_q0,
+                                        G_list,
+                                        G_phases,
+                                        num_G,
+                                        num_patom,
+                                        qpoints_cart[i],
+                                        q_direction_cart,
+                                        born,
+                                        dielectric,
+                                        factor,
+                                        lambda,
+                                        tolerance);
+  }
+}
+
 void dym_get_recip_dipole_dipole_q0(double *dd_q0, /* [natom, 3, 3, (real,imag)] */
                                     PHPYCONST double (*G_list)[3], /* [num_G, 3] */
                                     const int num_G,
@@ -332,21 +561,21 @@ void dym_get_charge_sum(double (*charge_sum)[3][3],
 
 /* fc[num_patom, num_satom, 3, 3] */
 /* dm[num_comm_points, num_patom * 3, num_patom *3] */
-/* comm_points[num_satom, num_patom, 27, 3] */
-/* shortest_vectors[num_satom, num_patom, 27, 3] */
-/* multiplicities[num_satom, num_patom] */
+/* comm_points[num_comm_points, 3] */
+/* shortest_vectors[num_svecs, 3] */
+/* multiplicities[num_satom, num_patom, 2] */
 void dym_transform_dynmat_to_fc(double *fc,
                                 const double *dm,
                                 PHPYCONST double (*comm_points)[3],
-                                PHPYCONST double (*shortest_vectors)[27][3],
-                                const int *multiplicities,
+                                PHPYCONST double (*shortest_vectors)[3],
+                                PHPYCONST int (*multiplicities)[2],
                                 const double *masses,
                                 const int *s2pp_map,
                                 const int *fc_index_map,
                                 const int num_patom,
                                 const int num_satom)
 {
-  int i, j, k, l, m, N, adrs, multi;
+  int i, j, k, l, m, N, adrs, multi, svecs_adrs;
   double coef, phase, cos_phase, sin_phase;
 
   N = num_satom / num_patom;
@@ -360,12 +589,12 @@ void dym_transform_dynmat_to_fc(double *fc,
       for (k = 0; k < N; k++) {
         cos_phase = 0;
         sin_phase = 0;
-        multi = multiplicities[j * num_patom + i];
+        multi = multiplicities[j * num_patom + i][0];
+        svecs_adrs = multiplicities[j * num_patom + i][1];
         for (l = 0; l < multi; l++) {
           phase = 0;
           for (m = 0; m < 3; m++) {
-            phase -= comm_points[k][m] *
-              shortest_vectors[j * num_patom + i][l][m];
+            phase -= comm_points[k][m] * shortest_vectors[svecs_adrs + l][m];
           }
           cos_phase += cos(phase * 2 * PI);
           sin_phase += sin(phase * 2 * PI);
@@ -391,8 +620,8 @@ static void get_dynmat_ij(double *dynamical_matrix,
                           const int num_satom,
                           const double *fc,
                           const double q[3],
-                          PHPYCONST double (*svecs)[27][3],
-                          const int *multi,
+                          PHPYCONST double (*svecs)[3],
+                          PHPYCONST int (*multi)[2],
                           const double *mass,
                           const int *s2p_map,
                           const int *p2s_map,
@@ -447,27 +676,30 @@ static void get_dm(double dm_real[3][3],
                    const int num_satom,
                    const double *fc,
                    const double q[3],
-                   PHPYCONST double (*svecs)[27][3],
-                   const int *multi,
+                   PHPYCONST double (*svecs)[3],
+                   PHPYCONST int (*multi)[2],
                    const int *p2s_map,
                    PHPYCONST double (*charge_sum)[3][3],
                    const int i,
                    const int j,
                    const int k)
 {
-  int l, m;
+  int l, m, m_pair, svecs_adrs;
   double phase, cos_phase, sin_phase, fc_elem;
 
   cos_phase = 0;
   sin_phase = 0;
 
-  for (l = 0; l < multi[k * num_patom + i]; l++) {
+  m_pair = multi[k * num_patom + i][0];
+  svecs_adrs = multi[k * num_patom + i][1];
+
+  for (l = 0; l < m_pair; l++) {
     phase = 0;
     for (m = 0; m < 3; m++) {
-      phase += q[m] * svecs[k * num_patom + i][l][m];
+      phase += q[m] * svecs[svecs_adrs + l][m];
     }
-    cos_phase += cos(phase * 2 * PI) / multi[k * num_patom + i];
-    sin_phase += sin(phase * 2 * PI) / multi[k * num_patom + i];
+    cos_phase += cos(phase * 2 * PI) / m_pair;
+    sin_phase += sin(phase * 2 * PI) / m_pair;
   }
 
   for (l = 0; l < 3; l++) {
@@ -580,6 +812,195 @@ static void get_KK(double *dd_part, /* [natom, 3, natom, 3, (real,imag)] */
   }
 }
 
+static void get_sparse_dynamical_matrix_at_q(double *dynamical_matrix,
+                                             const int num_patom,
+                                             const int num_pair,
+                                             PHPYCONST int (*atom_pairs)[2],
+                                             PHPYCONST double (*fc)[3][3],
+                                             const double q[3],
+                                             PHPYCONST double (*svecs)[3],
+                                             PHPYCONST int (*multi)[2],
+                                             const double *mass,
+                                             const int *s2pp_map)
+{
+  int i, j, k, l, m, adrs;
+  double phase, cos_phase, sin_phase, inv_mass_sqrt;
+  const double *vec;
+
+  for (i = 0; i < num_patom * num_patom * 18; i++) {
+    dynamical_matrix[i] = 0;
+  }
+
+  for (k = 0; k < num_pair; k++) {
+    i = atom_pairs[k][0];
+    j = s2pp_map[atom_pairs[k][1]];
+    cos_phase = 0;
+    sin_phase = 0;
+    for (l = 0; l < multi[k][0]; l++) {
+      vec = svecs[multi[k][1] + l];
+      phase = (q[0] * vec[0] + q[1] * vec[1] + q[2] * vec[2]) * 2 * PI;
+      cos_phase += cos(phase);
+      sin_phase += sin(phase);
+    }
+    inv_mass_sqrt = 1.0 / sqrt(mass[i] * mass[j]) / multi[k][0];
+    cos_phase *= inv_mass_sqrt;
+    sin_phase *= inv_mass_sqrt;
+    for (l = 0; l < 3; l++) {
+      for (m = 0; m < 3; m++) {
+        adrs = (i * 3 + l) * num_patom * 3 + j * 3 + m;
+        dynamical_matrix[adrs * 2] += fc[k][l][m] * cos_phase;
+        dynamical_matrix[adrs * 2 + 1] += fc[k][l][m] * sin_phase;
+      }
+    }
+  }
+
+  make_Hermitian(dynamical_matrix, num_patom * 3);
+}
+
+/* Same as dym_get_recip_dipole_dipole but Born effective charges are */
+/* contracted with K = G + q before summation over atom pairs and */
+/* phase factors are taken from the table of exp(2pi i G.r). */
+static void get_recip_dipole_dipole_with_tables(double *dd, /* [natom, 3, natom, 3, (real,imag)] */
+                                                const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
+                                                PHPYCONST double (*G_list)[3], /* [num_G, 3] */
+                                                const double *G_phases, /* [num_G, natom, (real,imag)] */
+                                                const int num_G,
+                                                const int num_patom,
+                                                const double q_cart[3],
+                                                const double *q_direction_cart,
+                                                PHPYCONST double (*born)[3][3],
+                                                PHPYCONST double dielectric[3][3],
+                                                const double factor,
+                                                const double lambda,
+                                                const double tolerance)
+{
+  int i, j, k, l, m, g, adrs, adrs_sum;
+  double q_K[3];
+  double norm, dielectric_part, weight, L2, re_phase, im_phase, zz;
+  const double *K, *phase_i, *phase_j;
+  double *ZK;
+
+  ZK = NULL;
+  ZK = (double*) malloc(sizeof(double) * num_patom * 3);
+
+  for (i = 0; i < num_patom * num_patom * 18; i++) {
+    dd[i] = 0;
+  }
+
+  L2 = 4 * lambda * lambda;
+
+  for (g = 0; g < num_G; g++) {
+    norm = 0;
+    for (i = 0; i < 3; i++) {
+      q_K[i] = G_list[g][i] + q_cart[i];
+      norm += q_K[i] * q_K[i];
+    }
+
+    if (sqrt(norm) < tolerance) {
+      if (!q_direction_cart) {
+        continue;
+      } else {
+        K = q_direction_cart;
+        weight = 1.0 / get_dielectric_part(q_direction_cart, dielectric);
+      }
+    } else {
+      K = q_K;
+      dielectric_part = get_dielectric_part(q_K, dielectric);
+      weight = exp(-dielectric_part / L2) / dielectric_part;
+    }
+
+    /* ZK[i][k] = sum_m K[m] Z_i[m][k] */
+    for (i = 0; i < num_patom; i++) {
+      for (k = 0; k < 3; k++) {
+        ZK[i * 3 + k] = 0;
+        for (m = 0; m < 3; m++) {
+          ZK[i * 3 + k] += K[m] * born[i][m][k];
+        }
+      }
+    }
+
+    for (i = 0; i < num_patom; i++) {
+      phase_i = G_phases + (g * num_patom + i) * 2;
+      for (j = 0; j < num_patom; j++) {
+        /* exp(2pi i G.(r_i - r_j)) */
+        phase_j = G_phases + (g * num_patom + j) * 2;
+        re_phase = (phase_i[0] * phase_j[0] + phase_i[1] * phase_j[1]) * weight;
+        im_phase = (phase_i[1] * phase_j[0] - phase_i[0] * phase_j[1]) * weight;
+        for (k = 0; k < 3; k++) {
+          for (l = 0; l < 3; l++) {
+            adrs = i * num_patom * 9 + k * num_patom * 3 + j * 3 + l;
+            zz = ZK[i * 3 + k] * ZK[j * 3 + l];
+            dd[adrs * 2] += zz * re_phase;
+            dd[adrs * 2 + 1] += zz * im_phase;
+          }
+        }
+      }
+    }
+  }
+
+  for (i = 0; i < num_patom; i++) {
+    for (k = 0; k < 3; k++) {   /* alpha */
+      for (l = 0; l < 3; l++) { /* beta */
+        adrs = i * num_patom * 9 + k * num_patom * 3 + i * 3 + l;
+        adrs_sum = i * 9 + k * 3 + l;
+        dd[adrs * 2] -= dd_q0[adrs_sum * 2];
+        dd[adrs * 2 + 1] -= dd_q0[adrs_sum * 2 + 1];
+      }
+    }
+  }
+
+  for (i = 0; i < num_patom * num_patom * 18; i++) {
+    dd[i] *= factor;
+  }
+
+  free(ZK);
+  ZK = NULL;
+}
+
+static void get_nac_dynamical_matrix_at_q(double *dynamical_matrix,
+                                          const int num_patom,
+                                          const int num_satom,
+                                          const double *fc,
+                                          const double q[3],
+                                          PHPYCONST double (*svecs)[3],
+                                          PHPYCONST int (*multi)[2],
+                                          const double *mass,
+                                          const int *s2p_map,
+                                          const int *p2s_map,
+                                          const double q_cart[3],
+                                          PHPYCONST double (*born)[3][3],
+                                          PHPYCONST double dielectric[3][3],
+                                          const double factor,
+                                          const int with_openmp)
+{
+  double (*charge_sum)[3][3];
+
+  charge_sum = NULL;
+  charge_sum = (double(*)[3][3])
+    malloc(sizeof(double[3][3]) * num_patom * num_patom);
+
+  dym_get_charge_sum(charge_sum,
+                     num_patom,
+                     factor / get_dielectric_part(q_cart, dielectric),
+                     q_cart,
+                     born);
+  dym_get_dynamical_matrix_at_q(dynamical_matrix,
+                                num_patom,
+                                num_satom,
+                                fc,
+                                q,
+                                svecs,
+                                multi,
+                                mass,
+                                s2p_map,
+                                p2s_map,
+                                charge_sum,
+                                with_openmp);
+
+  free(charge_sum);
+  charge_sum = NULL;
+}
+
 static void make_Hermitian(double *mat, const int num_band)
 {
   int i, j, adrs, adrsT;
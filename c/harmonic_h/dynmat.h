@@ -37,18 +37,58 @@
 
 #define PHPYCONST
 
+/* Shortest vectors are stored in the dense layout: */
+/* svecs[num_svecs, 3] and multi[num_satom, num_patom, 2], where the last */
+/* two are the multiplicity and the address of the first vector in svecs. */
 int dym_get_dynamical_matrix_at_q(double *dynamical_matrix,
                                   const int num_patom,
                                   const int num_satom,
                                   const double *fc,
                                   const double q[3],
-                                  PHPYCONST double (*svecs)[27][3],
-                                  const int *multi,
+                                  PHPYCONST double (*svecs)[3],
+                                  PHPYCONST int (*multi)[2],
                                   const double *mass,
                                   const int *s2p_map,
                                   const int *p2s_map,
                                   PHPYCONST double (*charge_sum)[3][3],
                                   const int with_openmp);
+void dym_get_dynamical_matrices_at_qpoints(double *dynamical_matrices,
+                                           const int num_qpoints,
+                                           const int num_patom,
+                                           const int num_satom,
+                                           const double *fc,
+                                           PHPYCONST double (*qpoints)[3],
+                                           PHPYCONST double (*svecs)[3],
+                                           PHPYCONST int (*multi)[2],
+                                           const double *mass,
+                                           const int *s2p_map,
+                                           const int *p2s_map);
+void dym_get_nac_dynamical_matrices_at_qpoints(double *dynamical_matrices,
+                                               const int num_qpoints,
+                                               const int num_patom,
+                                               const int num_satom,
+                                               const double *fc,
+                                               PHPYCONST double (*qpoints)[3],
+                                               PHPYCONST double (*svecs)[3],
+                                               PHPYCONST int (*multi)[2],
+                                               const double *mass,
+                                               const int *s2p_map,
+                                               const int *p2s_map,
+                                               PHPYCONST double (*q_cart)[3],
+                                               PHPYCONST double (*born)[3][3],
+                                               PHPYCONST double dielectric[3][3],
+                                               const double factor);
+void dym_get_sparse_dynamical_matrices_at_qpoints(double *dynamical_matrices,
+                                                  const int num_qpoints,
+                                                  const int num_patom,
+                                                  const int num_pair,
+                                                  PHPYCONST int (*atom_pairs)[2],
+                                                  PHPYCONST double (*fc)[3][3],
+                                                  PHPYCONST double (*qpoints)[3],
+                                                  PHPYCONST double (*svecs)[3],
+                                                  PHPYCONST int (*multi)[2],
+                                                  const double *mass,
+                                                  const int *s2pp_map);
 void dym_get_recip_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (real,imag)] */
                                  const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
                                  PHPYCONST double (*G_list)[3], /* [num_G, 3] */
@@ -62,6 +102,20 @@ void dym_get_recip_dipole_dipole(double *dd, /* [natom, 3, natom, 3, (real,imag)
                                  const double factor, /* 4pi/V*unit-conv */
                                  const double lambda,
                                  const double tolerance);
+void dym_get_recip_dipole_dipoles(double *dd, /* [num_q, natom, 3, natom, 3, (real,imag)] */
+                                  const double *dd_q0, /* [natom, 3, 3, (real,imag)] */
+                                  PHPYCONST double (*G_list)[3], /* [num_G, 3] */
+                                  const double *G_phases, /* [num_G, natom, (real,imag)] */
+                                  const int num_G,
+                                  const int num_patom,
+                                  PHPYCONST double (*qpoints_cart)[3], /* [num_q, 3] */
+                                  const int num_q,
+                                  const double *q_direction_cart, /* must be pointer */
+                                  PHPYCONST double (*born)[3][3],
+                                  PHPYCONST double dielectric[3][3],
+                                  const double factor, /* 4pi/V*unit-conv */
+                                  const double lambda,
+                                  const double tolerance);
 void dym_get_recip_dipole_dipole_q0(double *dd_q0, /* [natom, 3, 3, (real,imag)] */
                                     PHPYCONST double (*G_list)[3], /* [num_G, 3] */
                                     const int num_G,
@@ -78,14 +132,14 @@ void dym_get_charge_sum(double (*charge_sum)[3][3],
                         PHPYCONST double (*born)[3][3]);
 /* fc[num_patom, num_satom, 3, 3] */
 /* dm[num_comm_points, num_patom * 3, num_patom *3] */
-/* comm_points[num_satom, num_patom, 27, 3] */
-/* shortest_vectors[num_satom, num_patom, 27, 3] */
-/* multiplicities[num_satom, num_patom] */
+/* comm_points[num_comm_points, 3] */
+/* shortest_vectors[num_svecs, 3] */
+/* multiplicities[num_satom, num_patom, 2] */
 void dym_transform_dynmat_to_fc(double *fc,
                                 const double *dm,
                                 PHPYCONST double (*comm_points)[3],
-                                PHPYCONST double (*shortest_vectors)[27][3],
-                                const int *multiplicities,
+                                PHPYCONST double (*shortest_vectors)[3],
+                                PHPYCONST int (*multiplicities)[2],
                                 const double *masses,
                                 const int *s2pp_map,
                                 const int *fc_index_map,
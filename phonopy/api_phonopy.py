@@ -56,11 +56,12 @@ from phonopy.harmonic.force_constants import (
 from phonopy.harmonic.force_constants import get_fc2 as get_phonopy_fc2
 from phonopy.interface.calculator import get_default_physical_units
 from phonopy.interface.fc_calculator import get_fc2
+from phonopy.file_IO import get_force_constants_hdf5_memmap
 from phonopy.harmonic.dynamical_matrix import get_dynamical_matrix
 from phonopy.phonon.band_structure import (
     BandStructure, get_band_qpoints_by_seekpath)
 from phonopy.phonon.thermal_properties import ThermalProperties
-from phonopy.phonon.mesh import Mesh, IterMesh
+from phonopy.phonon.mesh import Mesh, IterMesh, ChunkedMesh
 from phonopy.units import VaspToTHz
 from phonopy.phonon.dos import TotalDos, PartialDos
 from phonopy.phonon.thermal_displacement import (
@@ -95,6 +96,7 @@ class Phonopy(object):
                  is_symmetry=True,
                  calculator=None,
                  use_lapack_solver=False,
+                 store_dense_svecs=False,
                  log_level=0):
         self._symprec = symprec
         self._factor = factor
@@ -102,6 +104,7 @@ class Phonopy(object):
         self._is_symmetry = is_symmetry
         self._calculator = calculator
         self._use_lapack_solver = use_lapack_solver
+        self._store_dense_svecs = store_dense_svecs
         self._log_level = log_level
 
         # Create supercell and primitive cell
@@ -802,7 +805,8 @@ class Phonopy(object):
                                 calculate_full_force_constants=True,
                                 fc_calculator=None,
                                 fc_calculator_options=None,
-                                show_drift=True):
+                                show_drift=True,
+                                hdf5_filename=None):
         """Compute supercell force constants from forces-displacements dataset.
 
         Supercell force constants are computed from forces and displacements.
@@ -826,6 +830,15 @@ class Phonopy(object):
             phonopy.interface.fc_calculator.get_fc2. Default is None.
         show_drift : Bool, optional
             With setting
+        hdf5_filename : str, optional
+            Force constants are written directly into this HDF5 file while
+            they are computed, and Phonopy.force_constants becomes an array
+            memory-mapped on the file. This avoids holding full force
+            constants of large supercells in memory. The memory saving
+            applies only to the built-in calculator. With fc_calculator,
+            force constants are computed in memory by the external
+            calculator and copied into the file afterwards, so both
+            exist at peak. Default is None.
 
         """
 
@@ -844,14 +857,16 @@ class Phonopy(object):
             self._run_force_constants_from_forces(
                 fc_calculator=fc_calculator,
                 fc_calculator_options=fc_calculator_options,
-                decimals=self._force_constants_decimals)
+                decimals=self._force_constants_decimals,
+                hdf5_filename=hdf5_filename)
         else:
             p2s_map = self._primitive.get_primitive_to_supercell_map()
             self._run_force_constants_from_forces(
                 distributed_atom_list=p2s_map,
                 fc_calculator=fc_calculator,
                 fc_calculator_options=fc_calculator_options,
-                decimals=self._force_constants_decimals)
+                decimals=self._force_constants_decimals,
+                hdf5_filename=hdf5_filename)
 
         if show_drift and self._log_level:
             show_drift_force_constants(self._force_constants,
@@ -860,13 +875,49 @@ class Phonopy(object):
         if self._primitive.get_masses() is not None:
             self._set_dynamical_matrix()
 
-    def symmetrize_force_constants(self, level=1, show_drift=True):
+    def symmetrize_force_constants(self,
+                                   level=1,
+                                   show_drift=True,
+                                   tolerance=None,
+                                   max_iterations=100):
+        """Symmetrize force constants by translation and index permutation
+
+        Parameters
+        ----------
+        level : int, optional
+            Number of times the symmetrization steps are repeated. This is
+            not used when tolerance is given. Default is 1.
+        show_drift : bool, optional
+            Show maximum drift after symmetrization. With tolerance, the
+            drift is shown after every repetition. Default is True.
+        tolerance : float, optional
+            The steps are repeated until the maximum drift becomes smaller
+            than this value. Default is None.
+        max_iterations : int, optional
+            Maximum number of repetitions with tolerance. Default is 100.
+
+        """
+
+        if show_drift and self._log_level and tolerance is not None:
+            def drift_callback(iteration, drift):
+                print("Max drift after iteration %d: %.5e"
+                      % (iteration, drift))
+        else:
+            drift_callback = None
+
         if self._force_constants.shape[0] == self._force_constants.shape[1]:
-            symmetrize_force_constants(self._force_constants, level=level)
+            symmetrize_force_constants(self._force_constants,
+                                       level=level,
+                                       tolerance=tolerance,
+                                       max_iterations=max_iterations,
+                                       drift_callback=drift_callback)
         else:
             symmetrize_compact_force_constants(self._force_constants,
                                                self._primitive,
-                                               level=level)
+                                               level=level,
+                                               tolerance=tolerance,
+                                               max_iterations=max_iterations,
+                                               drift_callback=drift_callback)
         if show_drift and self._log_level:
             sys.stdout.write("Max drift after symmetrization by translation: ")
             show_drift_force_constants(self._force_constants,
@@ -880,7 +931,8 @@ class Phonopy(object):
         set_tensor_symmetry_PJ(self._force_constants,
                                self._supercell.cell.T,
                                self._supercell.scaled_positions,
-                               self._symmetry)
+                               self._symmetry,
+                               primitive=self._primitive)
 
         if show_drift and self._log_level:
             sys.stdout.write("Max drift after symmetrization by space group: ")
@@ -1006,7 +1058,8 @@ class Phonopy(object):
                            is_band_connection=False,
                            path_connections=None,
                            labels=None,
-                           is_legacy_plot=False):
+                           is_legacy_plot=False,
+                           band_connection_method='greedy'):
         """Run phonon band structure calculation.
 
         Parameters
@@ -1035,6 +1088,10 @@ class Phonopy(object):
             to (2 - np.array(path_connections)).sum().
         is_legacy_plot: bool, optional
             This makes the old style band structure plot. Default is False.
+        band_connection_method : str, optional
+            'greedy' or 'assignment'. With 'assignment', bands are matched
+            by solving a linear assignment problem of eigenvector overlaps,
+            which requires scipy. Default is 'greedy'.
 
         """
 
@@ -1058,7 +1115,8 @@ class Phonopy(object):
             path_connections=path_connections,
             labels=labels,
             is_legacy_plot=is_legacy_plot,
-            factor=self._factor)
+            factor=self._factor,
+            band_connection_method=band_connection_method)
 
     def set_band_structure(self,
                            bands,
@@ -1282,7 +1340,11 @@ class Phonopy(object):
                   with_eigenvectors=False,
                   with_group_velocities=False,
                   is_gamma_center=False,
-                  use_iter_mesh=False):
+                  use_iter_mesh=False,
+                  memory_budget=None,
+                  hdf5_filename=None,
+                  compression=None,
+                  is_single_precision=False):
         """Initialize mesh sampling phonon calculation without starting to run.
 
         Phonon calculation starts explicitly with calling Mesh.run() or
@@ -1326,6 +1388,28 @@ class Phonopy(object):
             in its instance to save memory consumption. This is used with
             ThermalDisplacements and ThermalDisplacementMatrices.
             Default is False.
+        memory_budget: float, optional
+            Use ChunkedMesh instead of Mesh class when this is given.
+            Eigenvectors are not stored but computed for a block of
+            q-points whose dynamical matrices and eigenvectors fit in this
+            memory size in MB. Frequencies and group velocities are stored.
+            Default is None.
+        hdf5_filename: str, optional
+            Frequencies and eigenvectors are written into this HDF5 file
+            block by block of q-points while they are computed by Mesh
+            class, and eigenvectors are read lazily from the file. An
+            interrupted calculation is restarted using this file. This
+            can not be used with memory_budget. Default is None.
+        compression: str or int, optional
+            Compression filter of h5py for eigenvectors written into
+            hdf5_filename, e.g., 'gzip'. This can not be used with
+            memory_budget. Default is None.
+        is_single_precision: bool, optional
+            Dynamical matrices are diagonalized in single precision. This
+            is intended for frequencies used for DOS and thermal properties.
+            Results are stored in double precision arrays but have single
+            precision accuracy. This is ignored with use_iter_mesh=True.
+            Default is False.
 
         """
 
@@ -1333,6 +1417,12 @@ class Phonopy(object):
             msg = "Dynamical matrix has not yet built."
             raise RuntimeError(msg)
 
+        if memory_budget is not None and (hdf5_filename is not None or
+                                          compression is not None):
+            msg = ("memory_budget can not be used with hdf5_filename or "
+                   "compression.")
+            raise RuntimeError(msg)
+
         _mesh = np.array(mesh)
         mesh_nums = None
         if _mesh.shape:
@@ -1359,6 +1449,9 @@ class Phonopy(object):
         else:
             group_velocity = None
 
+        if isinstance(self._mesh, Mesh):
+            self._mesh.close()
+
         if use_iter_mesh:
             self._mesh = IterMesh(
                 self._dynamical_matrix,
@@ -1370,6 +1463,20 @@ class Phonopy(object):
                 is_gamma_center=is_gamma_center,
                 rotations=self._primitive_symmetry.get_pointgroup_operations(),
                 factor=self._factor)
+        elif memory_budget is not None:
+            self._mesh = ChunkedMesh(
+                self._dynamical_matrix,
+                mesh_nums,
+                shift=shift,
+                is_time_reversal=is_time_reversal,
+                is_mesh_symmetry=is_mesh_symmetry,
+                with_eigenvectors=with_eigenvectors,
+                is_gamma_center=_is_gamma_center,
+                group_velocity=group_velocity,
+                rotations=self._primitive_symmetry.get_pointgroup_operations(),
+                factor=self._factor,
+                memory_budget=memory_budget,
+                is_single_precision=is_single_precision)
         else:
             self._mesh = Mesh(
                 self._dynamical_matrix,
@@ -1382,7 +1489,10 @@ class Phonopy(object):
                 group_velocity=group_velocity,
                 rotations=self._primitive_symmetry.get_pointgroup_operations(),
                 factor=self._factor,
-                use_lapack_solver=self._use_lapack_solver)
+                use_lapack_solver=self._use_lapack_solver,
+                hdf5_filename=hdf5_filename,
+                compression=compression,
+                is_single_precision=is_single_precision)
 
     def run_mesh(self,
                  mesh=100.0,
@@ -1391,7 +1501,11 @@ class Phonopy(object):
                  is_mesh_symmetry=True,
                  with_eigenvectors=False,
                  with_group_velocities=False,
-                 is_gamma_center=False):
+                 is_gamma_center=False,
+                 memory_budget=None,
+                 hdf5_filename=None,
+                 compression=None,
+                 is_single_precision=False):
         """Run mesh sampling phonon calculation.
 
         See the parameter details in Phonopy.init_mesh.
@@ -1404,7 +1518,11 @@ class Phonopy(object):
                        is_mesh_symmetry=is_mesh_symmetry,
                        with_eigenvectors=with_eigenvectors,
                        with_group_velocities=with_group_velocities,
-                       is_gamma_center=is_gamma_center)
+                       is_gamma_center=is_gamma_center,
+                       memory_budget=memory_budget,
+                       hdf5_filename=hdf5_filename,
+                       compression=compression,
+                       is_single_precision=is_single_precision)
         self._mesh.run()
 
     def set_mesh(self,
@@ -1655,7 +1773,8 @@ class Phonopy(object):
                     with_eigenvectors=False,
                     with_group_velocities=False,
                     with_dynamical_matrices=False,
-                    nac_q_direction=None):
+                    nac_q_direction=None,
+                    is_qpoints_symmetry=False):
         """Phonon calculations on q-points.
 
         Parameters
@@ -1674,6 +1793,12 @@ class Phonopy(object):
             q=(0,0,0) is replaced by q=epsilon * nac_q_direction where epsilon
             is infinitsimal for non-analytical term correction. This is used,
             e.g., to observe LO-TO splitting.
+        is_qpoints_symmetry : bool, optional
+            With True, phonons are solved only at symmetrically irreducible
+            q-points, and those at the other q-points are obtained by
+            symmetry operations. Eigenvectors of degenerate bands can be
+            different linear combinations from those by direct solution.
+            Default is False.
 
         """
 
@@ -1695,7 +1820,9 @@ class Phonopy(object):
             with_eigenvectors=with_eigenvectors,
             group_velocity=group_velocity,
             with_dynamical_matrices=with_dynamical_matrices,
-            factor=self._factor)
+            factor=self._factor,
+            symmetry=(self._primitive_symmetry if is_qpoints_symmetry
+                      else None))
 
     def set_qpoints_phonon(self,
                            q_points,
@@ -1769,7 +1896,8 @@ class Phonopy(object):
                       freq_min=None,
                       freq_max=None,
                       freq_pitch=None,
-                      use_tetrahedron_method=True):
+                      use_tetrahedron_method=True,
+                      use_fft=False):
         """Calculate total DOS from phonons on sampling mesh.
 
         Parameters
@@ -1783,6 +1911,11 @@ class Phonopy(object):
         use_tetrahedron_method : float, optional
             Use tetrahedron method when this is True. When sigma is set,
             smearing method is used.
+        use_fft : bool, optional
+            With smearing method, frequencies are accumulated on a fine
+            frequency grid and the histogram is convolved with smearing
+            function by FFT. This is much faster than the direct sum for
+            dense sampling mesh. Default is False.
 
         """
         if self._mesh is None:
@@ -1791,7 +1924,8 @@ class Phonopy(object):
 
         total_dos = TotalDos(self._mesh,
                              sigma=sigma,
-                             use_tetrahedron_method=use_tetrahedron_method)
+                             use_tetrahedron_method=use_tetrahedron_method,
+                             use_fft=use_fft)
         total_dos.set_draw_area(freq_min, freq_max, freq_pitch)
         total_dos.run()
         self._total_dos = total_dos
@@ -1913,7 +2047,8 @@ class Phonopy(object):
                           freq_pitch=None,
                           use_tetrahedron_method=True,
                           direction=None,
-                          xyz_projection=False):
+                          xyz_projection=False,
+                          use_fft=False):
         """Calculate projected DOS from phonons on sampling mesh.
 
         Parameters
@@ -1934,6 +2069,10 @@ class Phonopy(object):
         xyz_projection : bool, optional
             This determines whether projected along Cartesian directions or
             not. Default is False, i.e., no projection.
+        use_fft : bool, optional
+            With smearing method, frequencies are accumulated on a fine
+            frequency grid and the histogram is convolved with smearing
+            function by FFT. Default is False.
 
         """
 
@@ -1959,7 +2098,8 @@ class Phonopy(object):
                                 sigma=sigma,
                                 use_tetrahedron_method=use_tetrahedron_method,
                                 direction=direction_cart,
-                                xyz_projection=xyz_projection)
+                                xyz_projection=xyz_projection,
+                                use_fft=use_fft)
         self._pdos.set_draw_area(freq_min, freq_max, freq_pitch)
         self._pdos.run()
 
@@ -2133,7 +2273,8 @@ class Phonopy(object):
                                is_projection=False,
                                band_indices=None,
                                cutoff_frequency=None,
-                               pretend_real=False):
+                               pretend_real=False,
+                               with_mode_thermal_properties=False):
         """Calculate thermal properties at constant volume
 
         Parameters
@@ -2144,6 +2285,9 @@ class Phonopy(object):
         temperatures : array_like, optional
             Temperature points where thermal properties are calculated.
             When this is set, t_min, t_max, and t_step are ignored.
+        with_mode_thermal_properties : bool, optional
+            Thermal properties of respective phonon modes are stored in
+            ThermalProperties.mode_thermal_properties. Default is False.
 
         """
         if self._mesh is None:
@@ -2155,7 +2299,9 @@ class Phonopy(object):
                                is_projection=is_projection,
                                band_indices=band_indices,
                                cutoff_frequency=cutoff_frequency,
-                               pretend_real=pretend_real)
+                               pretend_real=pretend_real,
+                               with_mode_thermal_properties=(
+                                   with_mode_thermal_properties))
         if temperatures is None:
             tp.set_temperature_range(t_step=t_step,
                                      t_max=t_max,
@@ -2736,7 +2882,8 @@ class Phonopy(object):
                                       atomic_form_factor_func=None,
                                       scattering_lengths=None,
                                       freq_min=None,
-                                      freq_max=None):
+                                      freq_max=None,
+                                      is_qpoints_symmetry=False):
         """Initialize dynamic structure factor calculation.
 
         *******************************************************************
@@ -2775,6 +2922,9 @@ class Phonopy(object):
         freq_min, freq_min: float
             Minimum and maximum phonon frequencies to determine whether
             phonons are included in the calculation.
+        is_qpoints_symmetry : bool, optional
+            With True, phonons are solved only at symmetrically irreducible
+            q-points. Default is False.
 
         """
         if self._mesh is None:
@@ -2797,7 +2947,9 @@ class Phonopy(object):
             atomic_form_factor_func=atomic_form_factor_func,
             scattering_lengths=scattering_lengths,
             freq_min=freq_min,
-            freq_max=freq_max)
+            freq_max=freq_max,
+            symmetry=(self._primitive_symmetry if is_qpoints_symmetry
+                      else None))
 
     def run_dynamic_structure_factor(self,
                                      Qpoints,
@@ -2805,7 +2957,8 @@ class Phonopy(object):
                                      atomic_form_factor_func=None,
                                      scattering_lengths=None,
                                      freq_min=None,
-                                     freq_max=None):
+                                     freq_max=None,
+                                     is_qpoints_symmetry=False):
         """Run dynamic structure factor calculation
 
         See the detail of parameters at
@@ -2819,7 +2972,8 @@ class Phonopy(object):
             atomic_form_factor_func=atomic_form_factor_func,
             scattering_lengths=scattering_lengths,
             freq_min=freq_min,
-            freq_max=freq_max)
+            freq_max=freq_max,
+            is_qpoints_symmetry=is_qpoints_symmetry)
         self._dynamic_structure_factor.run()
 
     def set_dynamic_structure_factor(self,
@@ -2930,8 +3084,21 @@ class Phonopy(object):
                                          distributed_atom_list=None,
                                          fc_calculator=None,
                                          fc_calculator_options=None,
-                                         decimals=None):
+                                         decimals=None,
+                                         hdf5_filename=None):
         if self._displacement_dataset is not None:
+            if hdf5_filename is None:
+                fc = None
+            else:
+                if distributed_atom_list is None:
+                    fc_dim0 = len(self._supercell)
+                else:
+                    fc_dim0 = len(distributed_atom_list)
+                fc = get_force_constants_hdf5_memmap(
+                    (fc_dim0, len(self._supercell), 3, 3),
+                    filename=hdf5_filename,
+                    p2s_map=self._primitive.p2s_map)
+
             if fc_calculator is not None:
                 disps, forces = get_displacements_and_forces(
                     self._displacement_dataset)
@@ -2945,6 +3112,11 @@ class Phonopy(object):
                     atom_list=distributed_atom_list,
                     log_level=self._log_level,
                     symprec=self._symprec)
+                if fc is not None:
+                    # External calculators allocate force constants by
+                    # themselves, so they are copied into the file here.
+                    fc[:] = self._force_constants
+                    self._force_constants = fc
             else:
                 if 'displacements' in self._displacement_dataset:
                     msg = ("fc_calculator has to be set to produce force "
@@ -2955,7 +3127,8 @@ class Phonopy(object):
                     self._symmetry,
                     self._displacement_dataset,
                     atom_list=distributed_atom_list,
-                    decimals=decimals)
+                    decimals=decimals,
+                    force_constants=fc)
 
     def _set_dynamical_matrix(self):
         self._dynamical_matrix = None
@@ -3081,7 +3254,10 @@ class Phonopy(object):
 
         try:
             self._primitive = get_primitive(
-                self._supercell, trans_mat, self._symprec)
+                self._supercell,
+                trans_mat,
+                self._symprec,
+                store_dense_svecs=self._store_dense_svecs)
         except ValueError:
             msg = ("Creating primitive cell is failed. "
                    "PRIMITIVE_AXIS may be incorrectly specified.")
@@ -48,6 +48,7 @@ except ImportError:
 from phonopy.structure.atoms import PhonopyAtoms
 from phonopy.cui.settings import fracval
 from phonopy.structure.dataset import get_displacements_and_forces
+from phonopy.harmonic.force_constants import SparseForceConstants
 from phonopy.structure.symmetry import Symmetry, elaborate_borns_and_epsilon
 from phonopy.harmonic.force_constants import similarity_transformation
 
@@ -330,10 +331,12 @@ def write_force_constants_to_hdf5(force_constants,
 
     Parameters
     ----------
-    force_constants: ndarray
+    force_constants: ndarray or SparseForceConstants
         Force constants
         shape=(n_satom,n_satom,3,3) or (n_patom,n_satom,3,3)
         dtype=double
+        With SparseForceConstants, force constants of atom pairs are
+        written with the atom pairs, shortest vectors, and multiplicities.
     filename: str
         Filename to be saved
     p2s_map: ndarray
@@ -355,8 +358,78 @@ def write_force_constants_to_hdf5(force_constants,
         raise ModuleNotFoundError("You need to install python-h5py.")
 
     with h5py.File(filename, 'w') as w:
-        w.create_dataset('force_constants', data=force_constants,
-                         compression=compression)
+        if isinstance(force_constants, SparseForceConstants):
+            sfc = force_constants
+            w.create_dataset('force_constants', data=sfc.force_constants,
+                             compression=compression)
+            w.create_dataset('atom_pairs', data=sfc.atom_pairs,
+                             compression=compression)
+            w.create_dataset('shortest_vectors', data=sfc.shortest_vectors,
+                             compression=compression)
+            w.create_dataset('multiplicity', data=sfc.multiplicity,
+                             compression=compression)
+            w.create_dataset('num_atoms',
+                             data=np.array([sfc.num_patom, sfc.num_satom],
+                                           dtype='intc'))
+            if sfc.cutoff_radius is not None:
+                w.create_dataset('cutoff_radius', data=sfc.cutoff_radius)
+        else:
+            w.create_dataset('force_constants', data=force_constants,
+                             compression=compression)
+        if p2s_map is not None:
+            w.create_dataset('p2s_map', data=p2s_map)
+        if physical_unit is not None:
+            dset = w.create_dataset('physical_unit', (1,),
+                                    dtype='S%d' % len(physical_unit))
+            dset[0] = np.string_(physical_unit)
+
+
+def get_force_constants_hdf5_memmap(shape,
+                                    filename='force_constants.hdf5',
+                                    p2s_map=None,
+                                    physical_unit=None):
+    """Create force constants hdf5 file and return its data memory-mapped
+
+    The force constants dataset is allocated contiguously, uncompressed,
+    and filled by zero, so that the returned array can be passed to
+    phonopy.harmonic.force_constants.get_fc2 to write force constants
+    directly to the file. The file is read by read_force_constants_hdf5
+    as usual.
+
+    Parameters
+    ----------
+    shape: tuple
+        Shape of force constants, (n_satom,n_satom,3,3) or
+        (n_patom,n_satom,3,3).
+    filename: str
+        Filename to be saved
+    p2s_map: ndarray
+        Primitive atom indices in supercell index system
+        shape=(n_patom,)
+        dtype=intc
+    physical_unit : str, optional
+        Physical unit used for force contants. Default is None.
+
+    Returns
+    -------
+    numpy.memmap
+        Force constants in the file.
+        dtype=double
+        shape=shape
+
+    """
+
+    try:
+        import h5py
+    except ImportError:
+        raise ModuleNotFoundError("You need to install python-h5py.")
+
+    with h5py.File(filename, 'w') as w:
+        dset = w.create_dataset('force_constants', shape, dtype='double',
+                                fillvalue=0)
+        # Writing an element allocates the whole contiguous storage.
+        dset[(0,) * len(shape)] = 0
+        offset = dset.id.get_offset()
         if p2s_map is not None:
             w.create_dataset('p2s_map', data=p2s_map)
         if physical_unit is not None:
@@ -364,6 +437,9 @@ def write_force_constants_to_hdf5(force_constants,
                                     dtype='S%d' % len(physical_unit))
             dset[0] = np.string_(physical_unit)
 
+    return np.memmap(filename, dtype='double', mode='r+', offset=offset,
+                     shape=tuple(shape))
+
 
 def parse_FORCE_CONSTANTS(filename="FORCE_CONSTANTS",
                           p2s_map=None):
@@ -409,9 +485,24 @@ def read_force_constants_hdf5(filename="force_constants.hdf5",
                                filename)
 
         fc = f[key][:]
+        if 'atom_pairs' in f:
+            if 'cutoff_radius' in f:
+                cutoff_radius = float(f['cutoff_radius'][()])
+            else:
+                cutoff_radius = None
+            fc = SparseForceConstants(f['atom_pairs'][:],
+                                      fc,
+                                      f['shortest_vectors'][:],
+                                      f['multiplicity'][:],
+                                      int(f['num_atoms'][0]),
+                                      int(f['num_atoms'][1]),
+                                      cutoff_radius=cutoff_radius)
+            fc_shape = (fc.num_patom, fc.num_satom)
+        else:
+            fc_shape = fc.shape[:2]
         if 'p2s_map' in f:
             p2s_map_in_file = f['p2s_map'][:]
-            check_force_constants_indices(fc.shape[:2],
+            check_force_constants_indices(fc_shape,
                                           p2s_map_in_file,
                                           p2s_map,
                                           filename)
@@ -33,12 +33,15 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 import numpy as np
+from phonopy.harmonic.force_constants import SparseForceConstants
 
 
 class DerivativeOfDynamicalMatrix(object):
     """Compute analytical derivative of dynamical matrix
 
     This can be used dynamical matrix without NAC or with Wang-NAC.
+    Force constants given by SparseForceConstants are supported without
+    NAC.
 
     """
 
@@ -48,7 +51,7 @@ class DerivativeOfDynamicalMatrix(object):
         self._scell = self._dynmat.supercell
         self._pcell = self._dynmat.primitive
         (self._smallest_vectors,
-         self._multiplicity) = self._pcell.get_smallest_vectors()
+         self._multiplicity) = self._pcell.get_dense_smallest_vectors()
 
         self._p2s_map = self._pcell.p2s_map
         self._s2p_map = self._pcell.s2p_map
@@ -59,6 +62,7 @@ class DerivativeOfDynamicalMatrix(object):
         self._mass = self._pcell.get_masses()
 
         self._ddm = None
+        self._ddms = None
 
         # Derivative order=2 can work only within the following conditions:
         # 1. Second derivative of NAC is not considered.
@@ -66,11 +70,48 @@ class DerivativeOfDynamicalMatrix(object):
         self._derivative_order = None
 
     def run(self, q, q_direction=None, lang='C'):
-        if self._derivative_order is not None or lang != 'C':
+        if isinstance(self._force_constants, SparseForceConstants):
+            self._run_sparse(q)
+        elif self._derivative_order is not None or lang != 'C':
             self._run_py(q, q_direction=q_direction)
         else:
             self._run_c(q, q_direction=q_direction)
 
+    def run_batch(self, qpoints, q_direction=None, lang='C'):
+        """Derivatives of dynamical matrices at q-points are computed.
+
+        With the C implementation, q-points are distributed over threads
+        in one call. Otherwise this is equivalent to calling ``run`` at
+        each q-point.
+
+        qpoints : array_like
+            q-points in reduced coordinates.
+            shape=(n_qpoints, 3), dtype='double'
+        q_direction : array_like, optional
+            Direction of q used for NAC. This is shared by all q-points.
+
+        """
+        _qpoints = np.array(qpoints, dtype='double', order='C')
+        if (isinstance(self._force_constants, SparseForceConstants) or
+            self._derivative_order is not None or
+            lang != 'C'):
+            ddms = []
+            for q in _qpoints:
+                self.run(q, q_direction=q_direction, lang=lang)
+                ddms.append(self._ddm)
+            self._ddms = np.array(ddms, order='C')
+        else:
+            self._ddms = self._run_c_batch(_qpoints, q_direction=q_direction)
+
+    @property
+    def derivative_of_dynamical_matrices(self):
+        """Derivatives of dynamical matrices computed by ``run_batch``
+
+        shape=(n_qpoints, 3, num_patom * 3, num_patom * 3), dtype=complex
+
+        """
+        return self._ddms
+
     def set_derivative_order(self, order):
         if order == 1 or order == 2:
             self._derivative_order = order
@@ -81,14 +122,19 @@ class DerivativeOfDynamicalMatrix(object):
         return self._ddm
 
     def _run_c(self, q, q_direction=None):
+        self._ddm = self._run_c_batch(
+            np.array([q], dtype='double', order='C'),
+            q_direction=q_direction)[0]
+
+    def _run_c_batch(self, qpoints, q_direction=None):
         import phonopy._phonopy as phonoc
         num_patom = len(self._p2s_map)
 
         mass = self._pcell.get_masses()
         fc = self._force_constants
         itemsize = self._force_constants.itemsize
-        ddm = np.zeros((3, num_patom * 3, num_patom * 3),
-                       dtype=("c%d" % (itemsize * 2)))
+        ddms = np.zeros((len(qpoints), 3, num_patom * 3, num_patom * 3),
+                        dtype=("c%d" % (itemsize * 2)))
         vectors = self._smallest_vectors
         multiplicity = self._multiplicity
         if self._dynmat.is_nac():
@@ -106,38 +152,63 @@ class DerivativeOfDynamicalMatrix(object):
             q_dir = None
 
         if fc.shape[0] == fc.shape[1]:  # full fc
-            phonoc.derivative_dynmat(ddm.view(dtype='double'),
-                                     fc,
-                                     np.array(q, dtype='double'),
-                                     np.array(self._pcell.get_cell().T,
-                                              dtype='double', order='C'),
-                                     vectors,
-                                     multiplicity,
-                                     mass,
-                                     self._s2p_map,
-                                     self._p2s_map,
-                                     nac_factor,
-                                     born,
-                                     dielectric,
-                                     q_dir)
+            s2p_map = self._s2p_map
+            p2s_map = self._p2s_map
+        else:
+            s2p_map = self._s2pp_map
+            p2s_map = np.arange(len(self._p2s_map), dtype='intc')
+
+        phonoc.derivative_dynmats(ddms.view(dtype='double'),
+                                  fc,
+                                  qpoints,
+                                  np.array(self._pcell.get_cell().T,
+                                           dtype='double', order='C'),
+                                  vectors,
+                                  multiplicity,
+                                  mass,
+                                  s2p_map,
+                                  p2s_map,
+                                  nac_factor,
+                                  born,
+                                  dielectric,
+                                  q_dir)
+        return ddms
+
+    def _run_sparse(self, q):
+        sfc = self._force_constants
+        num_patom = len(self._p2s_map)
+        i_patoms = sfc.atom_pairs[:, 0]
+        j_patoms = self._s2pp_map[sfc.atom_pairs[:, 1]]
+        multi = sfc.multiplicity
+        phases = np.exp(2j * np.pi * np.dot(sfc.shortest_vectors, q))
+        phases /= np.repeat(multi[:, 0] * np.sqrt(self._mass[i_patoms] *
+                                                  self._mass[j_patoms]),
+                            multi[:, 0])
+        vecs_cart = np.dot(sfc.shortest_vectors, self._pcell.cell)
+        coef = 2j * np.pi * vecs_cart
+        if self._derivative_order == 2:
+            coef = np.array([coef[:, a] * coef[:, b]
+                             for a, b in ((0, 0), (1, 1), (2, 2),
+                                          (1, 2), (0, 2), (0, 1))])
         else:
-            phonoc.derivative_dynmat(ddm.view(dtype='double'),
-                                     fc,
-                                     np.array(q, dtype='double'),
-                                     np.array(self._pcell.get_cell().T,
-                                              dtype='double', order='C'),
-                                     vectors,
-                                     multiplicity,
-                                     mass,
-                                     self._s2pp_map,
-                                     np.arange(len(self._p2s_map),
-                                               dtype='intc'),
-                                     nac_factor,
-                                     born,
-                                     dielectric,
-                                     q_dir)
-
-        self._ddm = ddm
+            coef = coef.T
+
+        num_elem = len(coef)
+        itemsize = sfc.itemsize
+        ddm_local = np.zeros((num_elem, num_patom, num_patom, 3, 3),
+                             dtype=("c%d" % (itemsize * 2)))
+        for l, coef_l in enumerate(coef):
+            np.add.at(ddm_local[l],
+                      (i_patoms, j_patoms),
+                      sfc.force_constants *
+                      np.add.reduceat(coef_l * phases,
+                                      multi[:, 1])[:, None, None])
+        ddm = ddm_local.transpose(0, 1, 3, 2, 4).reshape(
+            num_elem, num_patom * 3, num_patom * 3)
+
+        # Impose Hermite condition
+        self._ddm = np.array([(ddm[i] + ddm[i].conj().T) / 2
+                              for i in range(num_elem)])
 
     def _run_py(self, q, q_direction=None):
         if self._dynmat.is_nac():
@@ -174,8 +245,8 @@ class DerivativeOfDynamicalMatrix(object):
                 if s_j != self._s2p_map[k]:
                     continue
 
-                multi = multiplicity[k, i]
-                vecs_multi = vecs[k, i, :multi]
+                multi, adrs = multiplicity[k, i]
+                vecs_multi = vecs[adrs:(adrs + multi)]
                 phase_multi = np.exp([np.vdot(vec, q) * 2j * np.pi
                                       for vec in vecs_multi])
                 vecs_multi_cart = np.dot(vecs_multi, self._pcell.get_cell())
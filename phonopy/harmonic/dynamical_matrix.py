@@ -34,7 +34,11 @@
 
 import sys
 import warnings
+from collections import OrderedDict
 from phonopy.harmonic.dynmat_to_fc import DynmatToForceConstants
+from phonopy.harmonic.force_constants import (
+    SparseForceConstants, FullForceConstantsView,
+    get_real_space_force_constants)
 import numpy as np
 
 
@@ -78,6 +82,130 @@ def get_dynamical_matrix(fc2,
     return dm
 
 
+class DynamicalMatrixCache(object):
+    """LRU cache of dynamical matrices and phonon eigen-solutions
+
+    Entries are keyed by q-point rounded to q_decimals decimal places and
+    normalized q-direction used for NAC at Gamma point. When the total
+    size of cached arrays exceeds memory_limit, least recently used
+    entries are discarded.
+
+    Attributes
+    ----------
+    memory_limit : float
+        Maximum total size of cached arrays in MB.
+    with_eigen_solutions : bool
+        Whether eigenvalues and eigenvectors are also cached.
+    num_hits : int
+        Number of dynamical matrices found in cache.
+    num_misses : int
+        Number of dynamical matrices not found in cache.
+    num_eigen_hits : int
+        Number of eigen-solutions found in cache.
+    num_eigen_misses : int
+        Number of eigen-solutions not found in cache.
+    size : int
+        Total size of cached arrays in bytes.
+
+    """
+
+    def __init__(self,
+                 memory_limit=100,
+                 with_eigen_solutions=False,
+                 q_decimals=8):
+        self._memory_limit = memory_limit
+        self._with_eigen_solutions = with_eigen_solutions
+        self._q_decimals = q_decimals
+        self._entries = OrderedDict()
+        self._size = 0
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_eigen_hits = 0
+        self.num_eigen_misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def memory_limit(self):
+        return self._memory_limit
+
+    @property
+    def with_eigen_solutions(self):
+        return self._with_eigen_solutions
+
+    @property
+    def size(self):
+        return self._size
+
+    def get_key(self, q, q_direction=None):
+        key = tuple(np.round(q, decimals=self._q_decimals) + 0.0)
+        if q_direction is None:
+            return key + (None, )
+        else:
+            q_dir = np.array(q_direction, dtype='double')
+            q_dir /= np.linalg.norm(q_dir)
+            return key + (
+                tuple(np.round(q_dir, decimals=self._q_decimals) + 0.0), )
+
+    def get_dynamical_matrix(self, key):
+        entry = self._get_entry(key)
+        if entry is None or 'dm' not in entry:
+            self.num_misses += 1
+            return None
+        self.num_hits += 1
+        return entry['dm'].copy()
+
+    def set_dynamical_matrix(self, key, dm):
+        self._set_item(key, 'dm', np.array(dm, order='C'))
+
+    def get_eigen_solution(self, key, with_eigenvectors=True):
+        """Return (eigenvalues, eigenvectors) or None
+
+        eigenvectors is None when with_eigenvectors=False.
+
+        """
+
+        entry = self._get_entry(key)
+        if (entry is None or 'eigvals' not in entry or
+            (with_eigenvectors and 'eigvecs' not in entry)):
+            self.num_eigen_misses += 1
+            return None
+        self.num_eigen_hits += 1
+        if with_eigenvectors:
+            return entry['eigvals'].copy(), entry['eigvecs'].copy()
+        else:
+            return entry['eigvals'].copy(), None
+
+    def set_eigen_solution(self, key, eigvals, eigvecs=None):
+        if not self._with_eigen_solutions:
+            return
+        self._set_item(key, 'eigvals', np.array(eigvals, order='C'))
+        if eigvecs is not None:
+            self._set_item(key, 'eigvecs', np.array(eigvecs, order='C'))
+
+    def clear(self):
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def _get_entry(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._entries[key] = entry
+        return entry
+
+    def _set_item(self, key, name, array):
+        entry = self._entries.pop(key, {})
+        if name in entry:
+            self._size -= entry[name].nbytes
+        entry[name] = array
+        self._size += array.nbytes
+        self._entries[key] = entry
+        while self._size > self._memory_limit * 1024 ** 2 and self._entries:
+            _, old_entry = self._entries.popitem(last=False)
+            self._size -= sum(v.nbytes for v in old_entry.values())
+
+
 class DynamicalMatrix(object):
     """Dynamical matrix class
 
@@ -101,16 +229,22 @@ class DynamicalMatrix(object):
         PhonopyAtoms.
     supercell: Supercell
         Supercell instance. Note that Supercell is inherited from PhonopyAtoms.
-    force_constants: ndarray
+    force_constants: ndarray or SparseForceConstants
         Supercell force constants. Full and compact shapes of arrays are
         supported.
         dtype='double'
         shape=(supercell atoms, supercell atoms, 3, 3) for full array
         shape=(primitive atoms, supercell atoms, 3, 3) for compact array
+        Force constants of atom pairs within cutoff radius given by
+        SparseForceConstants are also accepted without NAC.
     dynatmical_matrix: ndarray
         Dynamical matrix at specified q.
         dtype=complex of "c%d" % (np.dtype('double').itemsize * 2)
         shape=(primitive atoms * 3, primitive atoms * 3)
+    dynatmical_matrices: ndarray
+        Dynamical matrices at q-points specified by run_batch.
+        dtype=complex of "c%d" % (np.dtype('double').itemsize * 2)
+        shape=(q-points, primitive atoms * 3, primitive atoms * 3)
 
     """
 
@@ -126,6 +260,9 @@ class DynamicalMatrix(object):
         self._pcell = primitive
         self._decimals = decimals
         self._dynamical_matrix = None
+        self._dynamical_matrices = None
+        self._cache = None
+        self._real_space_force_constants = None
         self._force_constants = None
         self._set_force_constants(force_constants)
 
@@ -137,8 +274,10 @@ class DynamicalMatrix(object):
         self._s2pp_map = np.array(
             [p2p_map[self._s2p_map[i]] for i in range(len(self._s2p_map))],
             dtype='intc')
+        # Shortest vectors are held in the dense layout as used by the C
+        # implementation.
         (self._smallest_vectors,
-         self._multiplicity) = primitive.get_smallest_vectors()
+         self._multiplicity) = primitive.get_dense_smallest_vectors()
 
     def is_nac(self):
         return self._nac
@@ -197,6 +336,79 @@ class DynamicalMatrix(object):
     def get_dynamical_matrix(self):
         return self.dynamical_matrix
 
+    @property
+    def dynamical_matrices(self):
+        """Dynamcial matrices calculated at q-points by run_batch
+
+        ndarray
+            shape=(qpoints, natom * 3, natom *3)
+            dtype=complex of "c%d" % (np.dtype('double').itemsize * 2)
+
+        """
+
+        dms = self._dynamical_matrices
+
+        if dms is None:
+            return None
+
+        if self._decimals is None:
+            return dms
+        else:
+            return dms.round(decimals=self._decimals)
+
+    @property
+    def cache(self):
+        """DynamicalMatrixCache or None when cache is disabled"""
+        return self._cache
+
+    def enable_cache(self,
+                     memory_limit=100,
+                     with_eigen_solutions=False,
+                     q_decimals=8):
+        """Cache dynamical matrices computed by run and run_batch
+
+        Dynamical matrices at q-points that are computed once are
+        reused. This is useful when phonons at the same q-points are
+        requested repeatedly. See DynamicalMatrixCache for the
+        parameters.
+
+        """
+
+        self._cache = DynamicalMatrixCache(
+            memory_limit=memory_limit,
+            with_eigen_solutions=with_eigen_solutions,
+            q_decimals=q_decimals)
+
+    def disable_cache(self):
+        self._cache = None
+
+    def clear_cache(self):
+        if self._cache is not None:
+            self._cache.clear()
+
+    def enable_real_space_force_constants(self):
+        """Compute dynamical matrices from force constants on lattice vectors
+
+        Force constants are collapsed onto lattice vectors of primitive
+        cell with mass weights (see RealSpaceForceConstants) when they
+        are used first time. Then dynamical matrices at q-points are
+        obtained by a matrix product, which is efficient for dense
+        sampling of q-points. Force constants must not be modified in
+        place after this is enabled.
+
+        """
+
+        if isinstance(self._force_constants, SparseForceConstants):
+            raise RuntimeError(
+                "Sparse force constants can not be used with force "
+                "constants on lattice vectors.")
+        self._real_space_force_constants = []
+        self.clear_cache()
+
+    def disable_real_space_force_constants(self):
+        self._real_space_force_constants = None
+        self.clear_cache()
+
     def run(self, q):
         """Calculate dynamical matrix at q
 
@@ -206,7 +418,32 @@ class DynamicalMatrix(object):
 
         """
 
-        self._run(q)
+        if self._cache is None:
+            self._run(q)
+            return
+
+        key = self._cache.get_key(q)
+        dm = self._cache.get_dynamical_matrix(key)
+        if dm is None:
+            self._run(q)
+            self._cache.set_dynamical_matrix(key, self._dynamical_matrix)
+        else:
+            self._dynamical_matrix = dm
+
+    def run_batch(self, qpoints):
+        """Calculate dynamical matrices at q-points at once
+
+        With the C implementation, all dynamical matrices are computed
+        in one call, where the loop over q-points is parallelized by
+        OpenMP.
+
+        qpoints : array_like
+            q-points in fractional coordinates without 2pi.
+            shape=(qpoints, 3), dtype='double'
+
+        """
+
+        self._run_batch_with_cache(qpoints)
 
     def set_dynamical_matrix(self, q):
         warnings.warn("DynamicalMatrix.set_dynamical_matrix is deprecated."
@@ -214,15 +451,91 @@ class DynamicalMatrix(object):
                       DeprecationWarning)
         self.run(q)
 
+    def _run_batch_with_cache(self, qpoints, q_direction=None):
+        if self._cache is None:
+            self._run_batch_at_qpoints(qpoints, q_direction=q_direction)
+            return
+
+        num_band = len(self._p2s_map) * 3
+        dms = np.zeros((len(qpoints), num_band, num_band),
+                       dtype=self._dtype_complex, order='C')
+        keys = [self._cache.get_key(q, q_direction=q_direction)
+                for q in qpoints]
+        indices = []
+        for i, key in enumerate(keys):
+            dm = self._cache.get_dynamical_matrix(key)
+            if dm is None:
+                indices.append(i)
+            else:
+                dms[i] = dm
+        if indices:
+            self._run_batch_at_qpoints(
+                np.array(np.array(qpoints)[indices],
+                         dtype='double', order='C'),
+                q_direction=q_direction)
+            dms[indices] = self._dynamical_matrices
+            for i in indices:
+                self._cache.set_dynamical_matrix(keys[i], dms[i])
+        self._dynamical_matrices = dms
+
+    def _run_batch_at_qpoints(self, qpoints, q_direction=None):
+        self._run_batch(qpoints)
+
     def _run(self, q):
+        if isinstance(self._force_constants, SparseForceConstants):
+            self._dynamical_matrix = self._get_sparse_dynamical_matrices(
+                [q])[0]
+            return
+
+        if self._real_space_force_constants is not None:
+            self._dynamical_matrix = self._get_real_space_dynamical_matrices(
+                [q])[0]
+            return
+
         try:
             import phonopy._phonopy as phonoc
             self._run_c_dynamical_matrix(q)
         except ImportError:
             self._run_py_dynamical_matrix(q)
 
+    def _run_batch(self, qpoints):
+        if isinstance(self._force_constants, SparseForceConstants):
+            self._dynamical_matrices = self._get_sparse_dynamical_matrices(
+                qpoints)
+            return
+
+        if self._real_space_force_constants is not None:
+            self._dynamical_matrices = (
+                self._get_real_space_dynamical_matrices(qpoints))
+            return
+
+        try:
+            import phonopy._phonopy as phonoc
+            self._run_c_dynamical_matrices(qpoints)
+        except ImportError:
+            num_band = len(self._p2s_map) * 3
+            dms = np.zeros((len(qpoints), num_band, num_band),
+                           dtype=self._dtype_complex, order='C')
+            for i, q in enumerate(qpoints):
+                self._run_py_dynamical_matrix(q)
+                dms[i] = self._dynamical_matrix
+            self._dynamical_matrices = dms
+
     def _set_force_constants(self, fc):
-        if (type(fc) is np.ndarray and
+        if isinstance(fc, SparseForceConstants):
+            if self._nac:
+                raise RuntimeError(
+                    "Sparse force constants can not be used with NAC.")
+            self._force_constants = fc
+        elif isinstance(fc, FullForceConstantsView):
+            # Dynamical matrix is computed from compact force constants.
+            self._force_constants = fc.force_constants
+        elif (isinstance(fc, np.memmap) and
+              fc.dtype == np.dtype('double') and
+              fc.flags.c_contiguous):
+            # Force constants memory-mapped on a file are not copied.
+            self._force_constants = fc
+        elif (type(fc) is np.ndarray and
             fc.dtype is np.double and
             fc.flags.aligned and
             fc.flags.owndata and
@@ -272,6 +585,109 @@ class DynamicalMatrix(object):
         #   dm = dm_double[:, :, 0] + 1j * dm_double[:, :, 1]
         self._dynamical_matrix = dm
 
+    def _run_c_dynamical_matrices(self, qpoints):
+        import phonopy._phonopy as phonoc
+
+        fc = self._force_constants
+        _qpoints = np.array(qpoints, dtype='double', order='C').reshape(-1, 3)
+        mass = self._pcell.masses
+        size_prim = len(mass)
+        dms = np.zeros((len(_qpoints), size_prim * 3, size_prim * 3),
+                       dtype=self._dtype_complex, order='C')
+
+        if fc.shape[0] == fc.shape[1]:  # full FC
+            s2p_map = self._s2p_map
+            p2s_map = self._p2s_map
+        else:
+            s2p_map = self._s2pp_map
+            p2s_map = np.arange(len(self._p2s_map), dtype='intc')
+
+        if len(_qpoints) > 0:
+            phonoc.dynamical_matrices(dms.view(dtype='double'),
+                                      fc,
+                                      _qpoints,
+                                      self._smallest_vectors,
+                                      self._multiplicity,
+                                      mass,
+                                      s2p_map,
+                                      p2s_map)
+
+        self._dynamical_matrices = dms
+
+    def _get_sparse_dynamical_matrices(self, qpoints):
+        sfc = self._force_constants
+        _qpoints = np.array(qpoints, dtype='double', order='C').reshape(-1, 3)
+        mass = np.array(self._pcell.masses, dtype='double')
+        size_prim = len(mass)
+        dms = np.zeros((len(_qpoints), size_prim * 3, size_prim * 3),
+                       dtype=self._dtype_complex, order='C')
+        if len(_qpoints) == 0:
+            return dms
+
+        try:
+            import phonopy._phonopy as phonoc
+            phonoc.sparse_dynamical_matrices(dms.view(dtype='double'),
+                                             sfc.atom_pairs,
+                                             sfc.force_constants,
+                                             _qpoints,
+                                             sfc.shortest_vectors,
+                                             sfc.multiplicity,
+                                             mass,
+                                             self._s2pp_map)
+        except ImportError:
+            i_patoms = sfc.atom_pairs[:, 0]
+            j_patoms = self._s2pp_map[sfc.atom_pairs[:, 1]]
+            multi = sfc.multiplicity
+            coef = 1.0 / multi[:, 0] / np.sqrt(mass[i_patoms] *
+                                               mass[j_patoms])
+            for dm, q in zip(dms, _qpoints):
+                phases = np.exp(2j * np.pi * np.dot(sfc.shortest_vectors, q))
+                phase_factors = np.add.reduceat(phases, multi[:, 1]) * coef
+                dm_local = np.zeros((size_prim, size_prim, 3, 3),
+                                    dtype=self._dtype_complex)
+                np.add.at(dm_local,
+                          (i_patoms, j_patoms),
+                          sfc.force_constants * phase_factors[:, None, None])
+                dm_local = dm_local.transpose(0, 2, 1, 3).reshape(
+                    size_prim * 3, size_prim * 3)
+                dm[:] = (dm_local + dm_local.conj().T) / 2
+
+        return dms
+
+    def _get_real_space_dynamical_matrices(self, qpoints):
+        rfc = self._get_real_space_force_constants()
+        _qpoints = np.array(qpoints, dtype='double', order='C').reshape(-1, 3)
+        num_band = len(self._p2s_map) * 3
+        phases = np.exp(2j * np.pi * np.dot(_qpoints, rfc.lattice_points.T))
+        fc = rfc.force_constants.reshape(len(rfc), -1)
+        dms = (np.dot(phases.real, fc) +
+               1j * np.dot(phases.imag, fc)).reshape(-1, num_band, num_band)
+        phases = np.repeat(
+            np.exp(2j * np.pi * np.dot(_qpoints, rfc.positions.T)), 3, axis=1)
+        dms *= phases.conj()[:, :, None] * phases[:, None, :]
+        # Impose Hermisian condition
+        dms = (dms + dms.conj().transpose(0, 2, 1)) / 2
+        return np.array(dms, dtype=self._dtype_complex, order='C')
+
+    def _get_real_space_force_constants(self):
+        """Return RealSpaceForceConstants of current force constants
+
+        Short range force constants of Gonze NAC are swapped in
+        temporarily, therefore those of the two sets of force constants
+        are kept.
+
+        """
+
+        for fc, rfc in self._real_space_force_constants:
+            if fc is self._force_constants:
+                return rfc
+        rfc = get_real_space_force_constants(self._force_constants,
+                                             self._pcell)
+        self._real_space_force_constants = [
+            (self._force_constants, rfc)] + self._real_space_force_constants
+        del self._real_space_force_constants[2:]
+        return rfc
+
     def _run_py_dynamical_matrix(self, q):
         fc = self._force_constants
         vecs = self._smallest_vectors
@@ -287,10 +703,10 @@ class DynamicalMatrix(object):
                 # Sum in lattice points
                 for k in range(self._scell.get_number_of_atoms()):
                     if s_j == self._s2p_map[k]:
-                        multi = multiplicity[k][i]
+                        multi, adrs = multiplicity[k][i]
                         phase = []
                         for l in range(multi):
-                            vec = vecs[k][i][l]
+                            vec = vecs[adrs + l]
                             phase.append(np.vdot(vec, q) * 2j * np.pi)
                         phase_factor = np.exp(phase).sum()
                         dm_local += fc[s_i, k] * phase_factor / sqrt_mm / multi
@@ -327,17 +743,34 @@ class DynamicalMatrixNAC(DynamicalMatrix):
             shape=(3,), dtype='double'
 
         """
-        rec_lat = np.linalg.inv(self._pcell.cell)  # column vectors
-        if q_direction is None:
-            q_norm = np.linalg.norm(np.dot(q, rec_lat.T))
+
+        if self._cache is None:
+            self._run_nac(q, q_direction=q_direction)
+            return
+
+        key = self._cache.get_key(q, q_direction=q_direction)
+        dm = self._cache.get_dynamical_matrix(key)
+        if dm is None:
+            self._run_nac(q, q_direction=q_direction)
+            self._cache.set_dynamical_matrix(key, self._dynamical_matrix)
         else:
-            q_norm = np.linalg.norm(np.dot(q_direction, rec_lat.T))
+            self._dynamical_matrix = dm
 
-        if q_norm < self._symprec:
-            self._run(q)
-            return False
+    def run_batch(self, qpoints, q_direction=None):
+        """Calculate dynamical matrices at q-points
 
-        self._compute_dynamical_matrix(q, q_direction)
+        The result is the same as that obtained by calling run for each
+        q-point with the same q_direction.
+
+        qpoints : array_like
+            q-points in fractional coordinates without 2pi.
+            shape=(qpoints, 3), dtype='double'
+        q_direction : array_like
+            See the docstring of DynamicalMatrixNAC.run.
+
+        """
+
+        self._run_batch_with_cache(qpoints, q_direction=q_direction)
 
     @property
     def born(self):
@@ -381,7 +814,59 @@ class DynamicalMatrixNAC(DynamicalMatrix):
                       DeprecationWarning)
         self.run(q, q_direction=q_direction)
 
+    def _run_nac(self, q, q_direction=None):
+        rec_lat = np.linalg.inv(self._pcell.cell)  # column vectors
+        if q_direction is None:
+            q_norm = np.linalg.norm(np.dot(q, rec_lat.T))
+        else:
+            q_norm = np.linalg.norm(np.dot(q_direction, rec_lat.T))
+
+        if q_norm < self._symprec:
+            self._run(q)
+            return False
+
+        self._compute_dynamical_matrix(q, q_direction)
+
+    def _run_batch_at_qpoints(self, qpoints, q_direction=None):
+        """Calculate dynamical matrices at q-points with and without NAC
+
+        As done in _run_nac, NAC is not applied at Gamma point unless
+        q_direction is given.
+
+        """
+
+        _qpoints = np.array(qpoints, dtype='double', order='C').reshape(-1, 3)
+        rec_lat = np.linalg.inv(self._pcell.cell)  # column vectors
+        if q_direction is None:
+            q_norms = np.linalg.norm(np.dot(_qpoints, rec_lat.T), axis=1)
+        else:
+            q_norms = np.repeat(
+                np.linalg.norm(np.dot(q_direction, rec_lat.T)),
+                len(_qpoints))
+        is_nac = q_norms >= self._symprec
+
+        num_band = len(self._pcell) * 3
+        dms = np.zeros((len(_qpoints), num_band, num_band),
+                       dtype=self._dtype_complex, order='C')
+        if (~is_nac).any():
+            self._run_batch(_qpoints[~is_nac])
+            dms[~is_nac] = self._dynamical_matrices
+        if is_nac.any():
+            dms[is_nac] = self._compute_dynamical_matrices(_qpoints[is_nac],
+                                                           q_direction)
+        self._dynamical_matrices = dms
+
+    def _compute_dynamical_matrices(self, qpoints, q_direction):
+        num_band = len(self._pcell) * 3
+        dms = np.zeros((len(qpoints), num_band, num_band),
+                       dtype=self._dtype_complex, order='C')
+        for i, q in enumerate(qpoints):
+            self._compute_dynamical_matrix(q, q_direction)
+            dms[i] = self._dynamical_matrix
+        return dms
+
     def _set_basic_nac_params(self, nac_params):
+        self.clear_cache()
         self._born = np.array(nac_params['born'], dtype='double', order='C')
         self._unit_conversion = nac_params['factor']
         self._dielectric = np.array(nac_params['dielectric'],
@@ -431,6 +916,7 @@ class DynamicalMatrixGL(DynamicalMatrixNAC):
         else:
             self._num_G_points = num_G_points
         self._G_list = None
+        self._G_phases = None
         self._G_cutoff = None
         self._Lambda = None  # 4*Lambda**2 is stored.
         self._dd_q0 = None
@@ -457,6 +943,10 @@ class DynamicalMatrixGL(DynamicalMatrixNAC):
             self._G_cutoff = (3 * self._num_G_points / (4 * np.pi) /
                               self._pcell.volume) ** (1.0 / 3)
         self._G_list = self._get_G_list(self._G_cutoff)
+        self._G_phases = np.array(
+            np.exp(2j * np.pi * np.dot(self._G_list,
+                                       self._pcell.positions.T)),
+            dtype=self._dtype_complex, order='C')
         if 'Lambda' in nac_params:
             self._Lambda = nac_params['Lambda']
         else:
@@ -477,6 +967,7 @@ class DynamicalMatrixGL(DynamicalMatrixNAC):
 
         self._run_Gonze_force_constants()
         self._Gonze_count = 0
+        self.clear_cache()
 
     def show_nac_message(self):
         print("Use NAC by Gonze et al. (no real space sum in current "
@@ -507,27 +998,53 @@ class DynamicalMatrixGL(DynamicalMatrixNAC):
         dm_dd = self._get_Gonze_dipole_dipole(q_red, q_direction)
         self._dynamical_matrix += dm_dd
 
+    def _compute_dynamical_matrices(self, qpoints, q_direction):
+        """Calculate dynamical matrices with NAC at q-points at once
+
+        Short range part is computed by DynamicalMatrix._run_batch with
+        Gonze force constants and the dipole-dipole part is computed
+        using the tables of G-vectors and their phase factors.
+
+        """
+
+        if self._Gonze_force_constants is None:
+            self.make_Gonze_nac_dataset()
+
+        if self._log_level > 2:
+            for i, q_red in enumerate(qpoints):
+                print("%d %s" % (self._Gonze_count + i + 1, q_red))
+        self._Gonze_count += len(qpoints)
+        fc = self._force_constants
+        self._force_constants = self._Gonze_force_constants
+        self._run_batch(qpoints)
+        self._force_constants = fc
+        return (self._dynamical_matrices +
+                self._get_Gonze_dipole_dipoles(qpoints, q_direction))
+
     def _run_Gonze_force_constants(self):
         fc_shape = self._force_constants.shape
         d2f = DynmatToForceConstants(self._pcell,
                                      self._scell,
                                      is_full_fc=(fc_shape[0] == fc_shape[1]))
-        dynmat = []
-        num_q = len(d2f.commensurate_points)
-        for i, q_red in enumerate(d2f.commensurate_points):
-            if self._log_level > 2:
+        comm_points = d2f.commensurate_points
+        if self._log_level > 2:
+            num_q = len(comm_points)
+            for i, q_red in enumerate(comm_points):
                 print("%d/%d %s" % (i + 1, num_q, q_red))
-            self._run(q_red)
-            dm_dd = self._get_Gonze_dipole_dipole(q_red, None)
-            self._dynamical_matrix -= dm_dd
-            dynmat.append(self._dynamical_matrix)
+        self._run_batch(comm_points)
+        dynmat = (self._dynamical_matrices -
+                  self._get_Gonze_dipole_dipoles(comm_points, None))
         d2f.dynamical_matrices = dynmat
         d2f.run()
         self._Gonze_force_constants = d2f.force_constants
 
     def _get_Gonze_dipole_dipole(self, q_red, q_direction):
+        return self._get_Gonze_dipole_dipoles([q_red], q_direction)[0]
+
+    def _get_Gonze_dipole_dipoles(self, qpoints, q_direction):
         rec_lat = np.linalg.inv(self._pcell.cell)  # column vectors
-        q_cart = np.array(np.dot(q_red, rec_lat.T), dtype='double')
+        q_cart = np.array(np.dot(np.reshape(qpoints, (-1, 3)), rec_lat.T),
+                          dtype='double', order='C')
         if q_direction is None:
             q_dir_cart = None
         else:
@@ -536,7 +1053,7 @@ class DynamicalMatrixGL(DynamicalMatrixNAC):
 
         try:
             import phonopy._phonopy as phonoc
-            C_recip = self._get_c_recip_dipole_dipole(q_cart, q_dir_cart)
+            C_recip = self._get_c_recip_dipole_dipoles(q_cart, q_dir_cart)
         except ImportError:
             print("Python version of dipole-dipole calculation is not well "
                   "implemented.")
@@ -545,15 +1062,14 @@ class DynamicalMatrixGL(DynamicalMatrixNAC):
         # Mass weighted
         mass = self._pcell.masses
         num_atom = len(self._pcell)
-        for i in range(num_atom):
-            for j in range(num_atom):
-                C_recip[i, :, j, :] *= 1.0 / np.sqrt(mass[i] * mass[j])
+        sqrt_mm = np.sqrt(np.outer(mass, mass))
+        C_recip /= sqrt_mm[None, :, None, :, None]
 
-        C_dd = C_recip.reshape(num_atom * 3, num_atom * 3)
+        C_dd = C_recip.reshape(-1, num_atom * 3, num_atom * 3)
 
         return C_dd
 
-    def _get_c_recip_dipole_dipole(self, q_cart, q_dir_cart):
+    def _get_c_recip_dipole_dipoles(self, q_cart, q_dir_cart):
         """Reciprocal part of Eq.(71) on the right hand side
 
         This is subtracted from supercell force constants to create
@@ -562,25 +1078,28 @@ class DynamicalMatrixGL(DynamicalMatrixNAC):
         This is added to interpolated short range force constants
         to create full force constants. Called many times.
 
+        G-vectors and their phase factors at atomic positions are
+        tabulated when NAC parameters are set, and the loop over
+        q-points is parallelized by OpenMP.
+
         """
 
         import phonopy._phonopy as phonoc
 
-        pos = self._pcell.positions
-        num_atom = len(pos)
+        num_atom = len(self._pcell)
         volume = self._pcell.volume
-        dd = np.zeros((num_atom, 3, num_atom, 3),
+        dd = np.zeros((len(q_cart), num_atom, 3, num_atom, 3),
                       dtype=self._dtype_complex, order='C')
 
-        phonoc.recip_dipole_dipole(
+        phonoc.recip_dipole_dipoles(
             dd.view(dtype='double'),
             self._dd_q0.view(dtype='double'),
             self._G_list,
+            self._G_phases.view(dtype='double'),
             q_cart,
             q_dir_cart,
             self._born,
             self._dielectric,
-            np.array(pos, dtype='double', order='C'),
             self._unit_conversion * 4.0 * np.pi / volume,
             self._Lambda,
             self._symprec)
@@ -661,13 +1180,25 @@ class DynamicalMatrixGL(DynamicalMatrixNAC):
 
         return C
 
-    def _get_G_list(self, G_cutoff, g_rad=100):
+    def _get_G_list(self, G_cutoff, g_rad=None):
+        """Return G-vectors in Cartesian coordinates within G_cutoff
+
+        Since |n_i| = |G.a_i| <= |G||a_i| for G = sum_i n_i b_i, the search
+        range along each reciprocal basis vector is determined from
+        G_cutoff unless g_rad is given.
+
+        """
+
         rec_lat = np.linalg.inv(self._pcell.cell)  # column vectors
+        if g_rad is None:
+            lengths = np.linalg.norm(self._pcell.cell, axis=1)
+            g_rads = np.array(np.ceil(G_cutoff * lengths), dtype=int)
+        else:
+            g_rads = [g_rad, ] * 3
         # g_rad must be greater than 0 for broadcasting.
-        n = g_rad * 2 + 1
-        G = np.zeros((n ** 3, 3), dtype='double', order='C')
-        pts = np.arange(-g_rad, g_rad + 1)
-        grid = np.meshgrid(pts, pts, pts)
+        g_rads = np.maximum(g_rads, 1)
+        G = np.zeros((np.prod(2 * g_rads + 1), 3), dtype='double', order='C')
+        grid = np.meshgrid(*[np.arange(-n, n + 1) for n in g_rads])
         for i in range(3):
             G[:, i] = grid[i].ravel()
         grid = None
@@ -749,20 +1280,20 @@ class DynamicalMatrixWang(DynamicalMatrixNAC):
 
     def _compute_dynamical_matrix(self, q_red, q_direction):
         # Wang method (J. Phys.: Condens. Matter 22 (2010) 202201)
-        rec_lat = np.linalg.inv(self._pcell.cell)  # column vectors
-        if q_direction is None:
-            q = np.dot(q_red, rec_lat.T)
-        else:
-            q = np.dot(q_direction, rec_lat.T)
-
-        constant = self._get_constant_factor(q,
-                                             self._dielectric,
-                                             self._pcell.volume,
-                                             self._unit_conversion)
         try:
             import phonopy._phonopy as phonoc
-            self._run_c_Wang_dynamical_matrix(q_red, q, constant)
+            self._dynamical_matrix = self._run_c_Wang_dynamical_matrices(
+                [q_red], q_direction)[0]
         except ImportError:
+            rec_lat = np.linalg.inv(self._pcell.cell)  # column vectors
+            if q_direction is None:
+                q = np.dot(q_red, rec_lat.T)
+            else:
+                q = np.dot(q_direction, rec_lat.T)
+            constant = self._get_constant_factor(q,
+                                                 self._dielectric,
+                                                 self._pcell.volume,
+                                                 self._unit_conversion)
             num_atom = len(self._pcell)
             fc_backup = self._force_constants.copy()
             nac_q = self._get_charge_sum(num_atom, q, self._born) * constant
@@ -770,44 +1301,63 @@ class DynamicalMatrixWang(DynamicalMatrixNAC):
             self._run(q_red)
             self._force_constants = fc_backup
 
-    def _run_c_Wang_dynamical_matrix(self, q_red, q, factor):
+    def _compute_dynamical_matrices(self, qpoints, q_direction):
+        try:
+            import phonopy._phonopy as phonoc
+            return self._run_c_Wang_dynamical_matrices(qpoints, q_direction)
+        except ImportError:
+            return super(DynamicalMatrixWang,
+                         self)._compute_dynamical_matrices(qpoints,
+                                                           q_direction)
+
+    def _run_c_Wang_dynamical_matrices(self, qpoints, q_direction):
+        """Calculate dynamical matrices at q-points in one call
+
+        The loop over q-points is parallelized by OpenMP. The charge sum
+        and the factor of 4pi/V/(q.eps.q) are computed in C for each
+        q-point.
+
+        """
+
         import phonopy._phonopy as phonoc
 
+        _qpoints = np.array(qpoints, dtype='double', order='C').reshape(-1, 3)
+        rec_lat = np.linalg.inv(self._pcell.cell)  # column vectors
+        if q_direction is None:
+            q_cart = np.dot(_qpoints, rec_lat.T)
+        else:
+            q_cart = np.tile(np.dot(q_direction, rec_lat.T),
+                             (len(_qpoints), 1))
+        q_cart = np.array(q_cart, dtype='double', order='C')
+
         fc = self._force_constants
-        vectors = self._smallest_vectors
         mass = self._pcell.masses
-        multiplicity = self._multiplicity
         size_prim = len(mass)
-        dm = np.zeros((size_prim * 3, size_prim * 3),
-                      dtype=self._dtype_complex)
+        dms = np.zeros((len(_qpoints), size_prim * 3, size_prim * 3),
+                       dtype=self._dtype_complex, order='C')
+        if len(_qpoints) == 0:
+            return dms
 
         if fc.shape[0] == fc.shape[1]:  # full fc
-            phonoc.nac_dynamical_matrix(dm.view(dtype='double'),
-                                        fc,
-                                        np.array(q_red, dtype='double'),
-                                        vectors,
-                                        multiplicity,
-                                        mass,
-                                        self._s2p_map,
-                                        self._p2s_map,
-                                        np.array(q, dtype='double'),
-                                        self._born,
-                                        factor)
+            s2p_map = self._s2p_map
+            p2s_map = self._p2s_map
         else:
-            phonoc.nac_dynamical_matrix(dm.view(dtype='double'),
-                                        fc,
-                                        np.array(q_red, dtype='double'),
-                                        vectors,
-                                        multiplicity,
-                                        mass,
-                                        self._s2pp_map,
-                                        np.arange(len(self._p2s_map),
-                                                  dtype='intc'),
-                                        np.array(q, dtype='double'),
-                                        self._born,
-                                        factor)
-
-        self._dynamical_matrix = dm
+            s2p_map = self._s2pp_map
+            p2s_map = np.arange(len(self._p2s_map), dtype='intc')
+
+        phonoc.nac_dynamical_matrices(dms.view(dtype='double'),
+                                      fc,
+                                      _qpoints,
+                                      self._smallest_vectors,
+                                      self._multiplicity,
+                                      mass,
+                                      s2p_map,
+                                      p2s_map,
+                                      q_cart,
+                                      self._born,
+                                      self._dielectric,
+                                      self.nac_factor)
+        return dms
 
     def _run_py_Wang_force_constants(self, fc, nac_q):
         N = (len(self._scell) // len(self._pcell))
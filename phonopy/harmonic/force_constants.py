@@ -33,6 +33,7 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 import textwrap
+from collections import OrderedDict
 import numpy as np
 from phonopy.structure.cells import (get_smallest_vectors,
                                      compute_permutation_for_rotation)
@@ -59,7 +60,8 @@ def get_fc2(supercell,
             symmetry,
             dataset,
             atom_list=None,
-            decimals=None):
+            decimals=None,
+            force_constants=None):
     """Force constants are computed.
 
     Force constants, Phi, are calculated from sets for forces, F, and
@@ -68,6 +70,16 @@ def get_fc2(supercell,
     This is solved by matrix pseudo-inversion.
     Crystal symmetry is included when creating F and d matrices.
 
+    Parameters
+    ----------
+    force_constants: ndarray, optional
+        Zero-filled array where force constants are written, e.g., that
+        returned by phonopy.file_IO.get_force_constants_hdf5_memmap to
+        write rows directly to a file. Default is None, i.e., a new array
+        is allocated.
+        dtype=double
+        shape=(len(atom_list),n_satom,3,3),
+
     Returns
     -------
     ndarray
@@ -85,8 +97,11 @@ def get_fc2(supercell,
     else:
         fc_dim0 = len(atom_list)
 
-    force_constants = np.zeros((fc_dim0, len(supercell), 3, 3),
-                               dtype='double', order='C')
+    if force_constants is None:
+        force_constants = np.zeros((fc_dim0, len(supercell), 3, 3),
+                                   dtype='double', order='C')
+    elif force_constants.shape != (fc_dim0, len(supercell), 3, 3):
+        raise RuntimeError("Shape of force constants array is wrong.")
 
     # Fill force_constants[ displaced_atoms, all_atoms_in_supercell ]
     atom_list_done = _get_force_constants_disps(
@@ -107,7 +122,7 @@ def get_fc2(supercell,
                                atom_list=atom_list)
 
     if decimals:
-        force_constants = force_constants.round(decimals=decimals)
+        force_constants.round(decimals=decimals, out=force_constants)
 
     return force_constants
 
@@ -119,16 +134,20 @@ def cutoff_force_constants(force_constants,
                            symprec=1e-5):
     fc_shape = force_constants.shape
     if fc_shape[0] == fc_shape[1]:
-        svecs, _ = get_smallest_vectors(supercell.get_cell(),
-                                        supercell.get_scaled_positions(),
-                                        supercell.get_scaled_positions(),
-                                        symprec=symprec)
+        svecs, multi = get_smallest_vectors(
+            supercell.get_cell(),
+            supercell.get_scaled_positions(),
+            supercell.get_scaled_positions(),
+            store_dense_svecs=True,
+            symprec=symprec)
         min_distances = np.sqrt(np.sum(
-            np.dot(svecs[:, :, 0, :], supercell.get_cell()) ** 2, axis=-1))
+            np.dot(svecs[multi[:, :, 1]], supercell.get_cell()) ** 2,
+            axis=-1))
     else:
-        svecs, _ = primitive.get_smallest_vectors()
+        svecs, multi = primitive.get_dense_smallest_vectors()
         min_distances = np.sqrt(np.sum(
-            np.dot(svecs[:, :, 0, :], primitive.get_cell()) ** 2, axis=-1))
+            np.dot(svecs[multi[:, :, 1]], primitive.get_cell()) ** 2,
+            axis=-1))
 
     for i in range(fc_shape[0]):
         for j in range(fc_shape[1]):
@@ -136,7 +155,402 @@ def cutoff_force_constants(force_constants,
                 force_constants[i, j] = 0.0
 
 
-def symmetrize_force_constants(force_constants, level=1):
+class SparseForceConstants(object):
+    """Force constants stored as list of atom pairs within cutoff radius
+
+    Only the force constants between atoms in primitive cell and atoms in
+    supercell, whose shortest distance is within cutoff radius, are stored.
+    The memory and the cost to compute dynamical matrix scale with the
+    number of the atom pairs instead of the supercell size.
+
+    Attributes
+    ----------
+    atom_pairs : ndarray
+        Pairs of atom indices (primitive atom index, supercell atom index).
+        dtype='intc'
+        shape=(pairs, 2)
+    force_constants : ndarray
+        Force constants of atom pairs.
+        dtype='double'
+        shape=(pairs, 3, 3)
+    shortest_vectors : ndarray
+        Shortest vectors of atom pairs in primitive cell coordinates in
+        the dense layout (see get_smallest_vectors).
+        dtype='double'
+        shape=(sum of multiplicities, 3)
+    multiplicity : ndarray
+        Number of equivalent shortest vectors of atom pairs and address of
+        the first one in shortest_vectors.
+        dtype='intc'
+        shape=(pairs, 2)
+    num_patom, num_satom : int
+        Numbers of atoms in primitive cell and supercell.
+    cutoff_radius : float
+        Cutoff radius used to select atom pairs in the unit of the cell
+        lattice vectors (Angstrom for VASP).
+
+    """
+
+    def __init__(self,
+                 atom_pairs,
+                 force_constants,
+                 shortest_vectors,
+                 multiplicity,
+                 num_patom,
+                 num_satom,
+                 cutoff_radius=None):
+        self._atom_pairs = np.array(atom_pairs, dtype='intc', order='C')
+        self._force_constants = np.array(force_constants,
+                                         dtype='double', order='C')
+        self._shortest_vectors = np.array(shortest_vectors,
+                                          dtype='double', order='C')
+        self._multiplicity = np.array(multiplicity, dtype='intc', order='C')
+        self._num_patom = num_patom
+        self._num_satom = num_satom
+        self._cutoff_radius = cutoff_radius
+
+    def __len__(self):
+        return len(self._atom_pairs)
+
+    def __mul__(self, factor):
+        return SparseForceConstants(self._atom_pairs,
+                                    self._force_constants * factor,
+                                    self._shortest_vectors,
+                                    self._multiplicity,
+                                    self._num_patom,
+                                    self._num_satom,
+                                    cutoff_radius=self._cutoff_radius)
+
+    @property
+    def atom_pairs(self):
+        return self._atom_pairs
+
+    @property
+    def force_constants(self):
+        return self._force_constants
+
+    @property
+    def shortest_vectors(self):
+        return self._shortest_vectors
+
+    @property
+    def multiplicity(self):
+        return self._multiplicity
+
+    @property
+    def num_patom(self):
+        return self._num_patom
+
+    @property
+    def num_satom(self):
+        return self._num_satom
+
+    @property
+    def cutoff_radius(self):
+        return self._cutoff_radius
+
+    @property
+    def itemsize(self):
+        return self._force_constants.itemsize
+
+    def get_compact_force_constants(self):
+        """Return compact force constants in dense array
+
+        shape=(num_patom, num_satom, 3, 3)
+
+        """
+
+        fc = np.zeros((self._num_patom, self._num_satom, 3, 3),
+                      dtype='double', order='C')
+        fc[self._atom_pairs[:, 0], self._atom_pairs[:, 1]] = (
+            self._force_constants)
+        return fc
+
+
+def get_sparse_force_constants(force_constants,
+                               primitive,
+                               cutoff_radius):
+    """Return force constants of atom pairs within cutoff radius
+
+    Atom pairs are selected by the shortest distance between primitive
+    atom and supercell atom in the same way as cutoff_force_constants.
+
+    Parameters
+    ----------
+    force_constants : ndarray
+        Supercell force constants in full or compact format.
+        shape=(n_satom, n_satom, 3, 3) or (n_patom, n_satom, 3, 3)
+    primitive : Primitive
+        Primitive cell.
+    cutoff_radius : float
+        Cutoff radius in the unit of the cell lattice vectors, i.e.,
+        Angstrom for VASP. Shortest Cartesian distances between atom pairs
+        are compared with this value.
+
+    Returns
+    -------
+    SparseForceConstants
+
+    """
+
+    svecs, multi = primitive.get_dense_smallest_vectors()
+    p2s_map = primitive.p2s_map
+    num_satom, num_patom = multi.shape[:2]
+    min_distances = np.sqrt(np.sum(
+        np.dot(svecs[multi[:, :, 1]], primitive.cell) ** 2, axis=-1))
+    j_satoms, i_patoms = np.where(min_distances <= cutoff_radius)
+    order = np.lexsort((j_satoms, i_patoms))
+    i_patoms = i_patoms[order]
+    j_satoms = j_satoms[order]
+
+    fc_shape = force_constants.shape
+    if fc_shape[0] == fc_shape[1]:
+        fc = force_constants[p2s_map[i_patoms], j_satoms]
+    else:
+        fc = force_constants[i_patoms, j_satoms]
+    counts = multi[j_satoms, i_patoms, 0]
+    adrs = multi[j_satoms, i_patoms, 1]
+    pair_multi = np.zeros((len(counts), 2), dtype='intc')
+    pair_multi[:, 0] = counts
+    pair_multi[:, 1] = np.cumsum(counts) - counts
+    svecs_indices = (np.arange(np.sum(counts)) -
+                     np.repeat(pair_multi[:, 1] - adrs, counts))
+    pair_svecs = svecs[svecs_indices]
+
+    return SparseForceConstants(np.transpose([i_patoms, j_satoms]),
+                                fc,
+                                pair_svecs,
+                                pair_multi,
+                                num_patom,
+                                num_satom,
+                                cutoff_radius=cutoff_radius)
+
+
+class RealSpaceForceConstants(object):
+    """Mass weighted force constants collapsed onto lattice vectors
+
+    Force constants between atoms in primitive cell and atoms in supercell
+    are divided by multiplicities of the shortest vectors and square
+    roots of atomic masses, and summed up for each lattice vector R of
+    primitive cell. The dynamical matrix is then written as
+
+        D_ij(q) = exp(-2pi i q.r_i) sum_R Phi_ij(R) exp(2pi i q.R)
+                  exp(2pi i q.r_j),
+
+    where r_i are atomic positions in primitive cell. The number of
+    complex exponentials per q-point is the number of lattice vectors,
+    and dynamical matrices at many q-points are obtained by a matrix
+    product.
+
+    Attributes
+    ----------
+    lattice_points : ndarray
+        Lattice vectors R in primitive cell coordinates.
+        dtype='intc'
+        shape=(lattice_points, 3)
+    force_constants : ndarray
+        Mass weighted force constants Phi(R).
+        dtype='double'
+        shape=(lattice_points, num_patom * 3, num_patom * 3)
+    positions : ndarray
+        Atomic positions in primitive cell coordinates.
+        dtype='double'
+        shape=(num_patom, 3)
+
+    """
+
+    def __init__(self, lattice_points, force_constants, positions):
+        self._lattice_points = np.array(lattice_points,
+                                        dtype='intc', order='C')
+        self._force_constants = np.array(force_constants,
+                                         dtype='double', order='C')
+        self._positions = np.array(positions, dtype='double', order='C')
+
+    def __len__(self):
+        return len(self._lattice_points)
+
+    @property
+    def lattice_points(self):
+        return self._lattice_points
+
+    @property
+    def force_constants(self):
+        return self._force_constants
+
+    @property
+    def positions(self):
+        return self._positions
+
+
+class FullForceConstantsView(object):
+    """Full force constants computed on demand from compact force constants
+
+    Full force constants are indexed as fc[i, j, a, b] without allocating
+    n_satom x n_satom x 3 x 3 array. A row fc[i] is obtained from the
+    compact force constants by the lattice translation that sends
+    supercell atom i to the atom in primitive cell,
+
+        fc[i, j] = compact_fc[s2pp[i], t(j)],
+
+    and the recently used rows are cached.
+
+    Attributes
+    ----------
+    force_constants : ndarray
+        Compact force constants.
+        dtype='double'
+        shape=(n_patom, n_satom, 3, 3)
+    shape : tuple
+        Shape of full force constants, (n_satom, n_satom, 3, 3).
+    max_cached_rows : int
+        Maximum number of rows of full force constants kept in cache.
+
+    """
+
+    def __init__(self, force_constants, primitive, max_cached_rows=None):
+        """
+
+        Parameters
+        ----------
+        force_constants : ndarray
+            Compact force constants.
+            shape=(n_patom, n_satom, 3, 3)
+        primitive : Primitive
+            Primitive cell.
+        max_cached_rows : int, optional
+            Maximum number of cached rows. Default is None, which gives
+            the number of atoms in primitive cell, i.e., the cached rows
+            take the same memory as the compact force constants.
+
+        """
+
+        fc_shape = force_constants.shape
+        if fc_shape[0] != len(primitive) or fc_shape[1] != len(
+                primitive.s2p_map):
+            raise RuntimeError("Compact force constants are necessary.")
+
+        self._force_constants = force_constants
+        self._trans_perms = primitive.get_atomic_permutations()
+        self._s2pp, self._nsym_list = get_nsym_list_and_s2pp(
+            primitive.s2p_map, primitive.p2p_map, self._trans_perms)
+        self._num_satom = fc_shape[1]
+        if max_cached_rows is None:
+            self._max_cached_rows = fc_shape[0]
+        else:
+            self._max_cached_rows = max_cached_rows
+        self._rows = OrderedDict()
+
+    def __len__(self):
+        return self._num_satom
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, )
+        if isinstance(key[0], (int, np.integer)):
+            return self._get_row(range(self._num_satom)[key[0]])[key[1:]]
+        return np.array([self._get_row(i)[key[1:]]
+                         for i in np.arange(self._num_satom)[key[0]]],
+                        dtype='double', order='C')
+
+    def __array__(self, dtype=None):
+        fc = self._force_constants[
+            self._s2pp[:, None], self._trans_perms[self._nsym_list]]
+        return np.array(fc, dtype=dtype, order='C')
+
+    @property
+    def force_constants(self):
+        return self._force_constants
+
+    @property
+    def shape(self):
+        return (self._num_satom, ) + self._force_constants.shape[1:]
+
+    @property
+    def max_cached_rows(self):
+        return self._max_cached_rows
+
+    def _get_row(self, i):
+        row = self._rows.pop(i, None)
+        if row is not None:
+            self._rows[i] = row
+            return row
+
+        t = self._trans_perms[self._nsym_list[i]]
+        row = self._force_constants[self._s2pp[i]][t]
+        row.flags.writeable = False
+        if self._max_cached_rows > 0:
+            self._rows[i] = row
+            if len(self._rows) > self._max_cached_rows:
+                self._rows.popitem(last=False)
+        return row
+
+
+def get_real_space_force_constants(force_constants, primitive):
+    """Return mass weighted force constants collapsed onto lattice vectors
+
+    Parameters
+    ----------
+    force_constants : ndarray
+        Supercell force constants in full or compact format.
+        shape=(n_satom, n_satom, 3, 3) or (n_patom, n_satom, 3, 3)
+    primitive : Primitive
+        Primitive cell.
+
+    Returns
+    -------
+    RealSpaceForceConstants
+
+    """
+
+    svecs, multi = primitive.get_dense_smallest_vectors()
+    num_satom, num_patom = multi.shape[:2]
+    p2s_map = primitive.p2s_map
+    p2p_map = primitive.p2p_map
+    s2pp_map = np.array([p2p_map[i] for i in primitive.s2p_map], dtype=int)
+    masses = primitive.masses
+    positions = primitive.scaled_positions
+
+    # Atom pairs of (supercell atom, primitive atom)
+    j_satoms = np.repeat(np.arange(num_satom), num_patom)
+    i_patoms = np.tile(np.arange(num_patom), num_satom)
+    fc_shape = force_constants.shape
+    if fc_shape[0] == fc_shape[1]:
+        fc = force_constants[p2s_map[i_patoms], j_satoms]
+    else:
+        fc = force_constants[i_patoms, j_satoms]
+    j_patoms = s2pp_map[j_satoms]
+    counts = multi[:, :, 0].ravel()
+    fc = fc / (counts * np.sqrt(masses[i_patoms] * masses[j_patoms])
+               )[:, None, None]
+
+    # Shortest vectors of atom pairs
+    pair_indices = np.repeat(np.arange(len(counts)), counts)
+    svecs_indices = (multi[:, :, 1].ravel()[pair_indices] +
+                     np.arange(len(pair_indices)) -
+                     np.repeat(np.cumsum(counts) - counts, counts))
+    i_patoms = i_patoms[pair_indices]
+    j_patoms = j_patoms[pair_indices]
+    lattice_vectors = np.rint(svecs[svecs_indices] - positions[j_patoms] +
+                              positions[i_patoms]).astype(int)
+    lattice_points, R_indices = np.unique(lattice_vectors, axis=0,
+                                          return_inverse=True)
+
+    fc_R = np.zeros((len(lattice_points), num_patom, num_patom, 3, 3),
+                    dtype='double', order='C')
+    np.add.at(fc_R,
+              (R_indices.ravel(), i_patoms, j_patoms),
+              fc[pair_indices])
+    fc_R = fc_R.transpose(0, 1, 3, 2, 4).reshape(
+        len(lattice_points), num_patom * 3, num_patom * 3)
+
+    return RealSpaceForceConstants(lattice_points, fc_R, positions)
+
+
+def symmetrize_force_constants(force_constants,
+                               level=1,
+                               tolerance=None,
+                               max_iterations=100,
+                               drift_callback=None):
     """Symmetry force constants by translational and permutation symmetries
 
     Note
@@ -151,28 +565,47 @@ def symmetrize_force_constants(force_constants, level=1):
         Force constants. Symmetrized force constants are overwritten.
         dtype=double
         shape=(n_satom,n_satom,3,3)
-    primitive: Primitive
-        Primitive cell
     level: int
         Controls the number of times the following steps repeated:
         1) Subtract drift force constants along row and column
         2) Average fc and fc.T
+        This is not used when tolerance is given.
+    tolerance: float, optional
+        The steps are repeated until the maximum drift, i.e., the maximum
+        absolute value of sums of force constants along row and column
+        subtracted in a repetition, becomes smaller than this value.
+        Default is None.
+    max_iterations: int, optional
+        Maximum number of repetitions with tolerance. Default is 100.
+    drift_callback: callable, optional
+        Called as drift_callback(iteration, drift) with the maximum drift
+        after every repetition, e.g., to log convergence. Default is None.
 
     """
 
-    try:
-        import phonopy._phonopy as phonoc
-        phonoc.perm_trans_symmetrize_fc(force_constants, level)
-    except ImportError:
-        for i in range(level):
-            set_translational_invariance(force_constants)
-            set_permutation_symmetry(force_constants)
-        set_translational_invariance(force_constants)
+    if tolerance is None and drift_callback is None:
+        _perm_trans_symmetrize_fc(force_constants, level)
+        return
+
+    if tolerance is None:
+        num_iterations = level
+    else:
+        num_iterations = max_iterations
+
+    for i in range(num_iterations):
+        drift = _perm_trans_symmetrize_fc(force_constants, 1)
+        if drift_callback is not None:
+            drift_callback(i + 1, drift)
+        if tolerance is not None and drift < tolerance:
+            break
 
 
 def symmetrize_compact_force_constants(force_constants,
                                        primitive,
-                                       level=1):
+                                       level=1,
+                                       tolerance=None,
+                                       max_iterations=100,
+                                       drift_callback=None):
     """Symmetry force constants by translational and permutation symmetries
 
     Parameters
@@ -187,6 +620,15 @@ def symmetrize_compact_force_constants(force_constants,
         Controls the number of times the following steps repeated:
         1) Subtract drift force constants along row and column
         2) Average fc and fc.T
+        This is not used when tolerance is given.
+    tolerance: float, optional
+        The steps are repeated until the maximum drift becomes smaller
+        than this value. See symmetrize_force_constants. Default is None.
+    max_iterations: int, optional
+        Maximum number of repetitions with tolerance. Default is 100.
+    drift_callback: callable, optional
+        Called as drift_callback(iteration, drift) after every repetition.
+        Default is None.
 
     """
 
@@ -199,16 +641,36 @@ def symmetrize_compact_force_constants(force_constants,
                                                  permutations)
     try:
         import phonopy._phonopy as phonoc
+    except ImportError:
+        text = ("Import error at phonoc.perm_trans_symmetrize_compact_fc. "
+                "Corresponding pytono code is not implemented.")
+        raise RuntimeError(text)
+
+    if tolerance is None and drift_callback is None:
         phonoc.perm_trans_symmetrize_compact_fc(force_constants,
                                                 permutations,
                                                 s2pp_map,
                                                 p2s_map,
                                                 nsym_list,
                                                 level)
-    except ImportError:
-        text = ("Import error at phonoc.perm_trans_symmetrize_compact_fc. "
-                "Corresponding pytono code is not implemented.")
-        raise RuntimeError(text)
+        return
+
+    if tolerance is None:
+        num_iterations = level
+    else:
+        num_iterations = max_iterations
+
+    for i in range(num_iterations):
+        drift = phonoc.perm_trans_symmetrize_compact_fc(force_constants,
+                                                        permutations,
+                                                        s2pp_map,
+                                                        p2s_map,
+                                                        nsym_list,
+                                                        1)
+        if drift_callback is not None:
+            drift_callback(i + 1, drift)
+        if tolerance is not None and drift < tolerance:
+            break
 
 
 def distribute_force_constants(force_constants,
@@ -219,9 +681,9 @@ def distribute_force_constants(force_constants,
                                atom_list=None):
     map_atoms, map_syms = _get_sym_mappings_from_permutations(
         permutations, atom_list_done)
-    rots_cartesian = np.array([similarity_transformation(lattice, r)
-                               for r in rotations],
-                              dtype='double', order='C')
+    rots_cartesian = np.array(
+        np.matmul(np.matmul(lattice, rotations), np.linalg.inv(lattice)),
+        dtype='double', order='C')
     if atom_list is None:
         targets = np.arange(force_constants.shape[1], dtype='intc')
     else:
@@ -376,6 +838,18 @@ def set_tensor_symmetry(force_constants,
                         lattice,  # column vectors
                         positions,
                         symmetry):
+    try:
+        import phonopy._phonopy as phonoc
+    except ImportError:
+        pass
+    else:
+        _set_tensor_symmetry_PJ_c(phonoc,
+                                  force_constants,
+                                  lattice,
+                                  symmetry,
+                                  None)
+        return
+
     rotations = symmetry.get_symmetry_operations()['rotations']
     translations = symmetry.get_symmetry_operations()['translations']
     map_atoms = symmetry.get_map_atoms()
@@ -421,8 +895,9 @@ def set_tensor_symmetry(force_constants,
 def set_tensor_symmetry_PJ(force_constants,
                            lattice,
                            positions,
-                           symmetry):
-    """Full force constants are symmetrized using crystal symmetry.
+                           symmetry,
+                           primitive=None):
+    """Force constants are symmetrized using crystal symmetry.
 
     This method extracts symmetrically equivalent sets of atomic pairs and
     take sum of their force constants and average the sum.
@@ -430,8 +905,89 @@ def set_tensor_symmetry_PJ(force_constants,
     Since get_force_constants_disps may include crystal symmetry, this method
     is usually meaningless.
 
+    Parameters
+    ----------
+    force_constants: ndarray
+        Supercell force constants. Symmetrized force constants are
+        overwritten.
+        dtype=double
+        shape=(n_satom, n_satom, 3, 3) or (n_patom, n_satom, 3, 3)
+    lattice: ndarray
+        Supercell basis vectors in column vectors.
+    positions: ndarray
+        Supercell atomic positions in fractional coordinates.
+    symmetry: Symmetry
+        Supercell symmetry.
+    primitive: Primitive, optional
+        Primitive cell. This is necessary for compact force constants.
+
     """
 
+    try:
+        import phonopy._phonopy as phonoc
+    except ImportError:
+        if force_constants.shape[0] != force_constants.shape[1]:
+            text = ("Import error at phonoc.space_group_symmetrize_fc. "
+                    "Corresponding python code is not implemented.")
+            raise RuntimeError(text)
+        _set_tensor_symmetry_PJ_py(force_constants,
+                                   lattice,
+                                   positions,
+                                   symmetry)
+    else:
+        _set_tensor_symmetry_PJ_c(phonoc,
+                                  force_constants,
+                                  lattice,
+                                  symmetry,
+                                  primitive)
+
+
+def _set_tensor_symmetry_PJ_c(phonoc,
+                              force_constants,
+                              lattice,
+                              symmetry,
+                              primitive):
+    rotations = symmetry.get_symmetry_operations()['rotations']
+    permutations = np.array(symmetry.get_atomic_permutations(),
+                            dtype='intc', order='C')
+    rots_cartesian = np.array([similarity_transformation(lattice, r)
+                               for r in rotations],
+                              dtype='double', order='C')
+    n_satom = force_constants.shape[1]
+    if force_constants.shape[0] == n_satom:
+        p2s_map = np.arange(n_satom, dtype='intc')
+        s2pp_map = p2s_map
+        nsym_list = np.zeros(n_satom, dtype='intc')
+        trans_perms = p2s_map.reshape(1, -1)
+    else:
+        if primitive is None:
+            raise RuntimeError(
+                "Primitive cell is necessary for compact force constants.")
+        s2p_map = primitive.get_supercell_to_primitive_map()
+        p2s_map = np.array(primitive.get_primitive_to_supercell_map(),
+                           dtype='intc')
+        p2p_map = primitive.get_primitive_to_primitive_map()
+        trans_perms = np.array(primitive.get_atomic_permutations(),
+                               dtype='intc', order='C')
+        s2pp_map, nsym_list = get_nsym_list_and_s2pp(s2p_map,
+                                                     p2p_map,
+                                                     trans_perms)
+
+    fc_orig = np.array(force_constants, dtype='double', order='C')
+    phonoc.space_group_symmetrize_fc(force_constants,
+                                     fc_orig,
+                                     rots_cartesian,
+                                     permutations,
+                                     p2s_map,
+                                     s2pp_map,
+                                     nsym_list,
+                                     trans_perms)
+
+
+def _set_tensor_symmetry_PJ_py(force_constants,
+                               lattice,
+                               positions,
+                               symmetry):
     rotations = symmetry.get_symmetry_operations()['rotations']
     translations = symmetry.get_symmetry_operations()['translations']
     symprec = symmetry.get_symmetry_tolerance()
@@ -472,14 +1028,14 @@ def set_translational_invariance(force_constants):
 
 
 def set_translational_invariance_per_index(fc2, index=0):
-    for i in range(fc2.shape[1 - index]):
-        for j, k in list(np.ndindex(3, 3)):
-            if index == 0:
-                fc2[:, i, j, k] -= np.sum(
-                    fc2[:, i, j, k]) / fc2.shape[0]
-            else:
-                fc2[i, :, j, k] -= np.sum(
-                    fc2[i, :, j, k]) / fc2.shape[1]
+    """Return maximum absolute sum of fc2 subtracted along the index"""
+    if index == 0:
+        drift = fc2.sum(axis=0)
+        fc2 -= drift / fc2.shape[0]
+    else:
+        drift = fc2.sum(axis=1)
+        fc2 -= drift[:, None] / fc2.shape[1]
+    return np.abs(drift).max()
 
 
 def set_permutation_symmetry(force_constants):
@@ -496,11 +1052,12 @@ def set_permutation_symmetry(force_constants):
 
     """
 
-    fc_copy = force_constants.copy()
+    # In place row by row: fc[i, j] and fc[j, i] for j >= i.
     for i in range(force_constants.shape[0]):
-        for j in range(force_constants.shape[1]):
-            force_constants[i, j] = (force_constants[i, j] +
-                                     fc_copy[j, i].T) / 2
+        fc_elems = (force_constants[i, i:] +
+                    force_constants[i:, i].transpose(0, 2, 1)) / 2
+        force_constants[i, i:] = fc_elems
+        force_constants[i:, i] = fc_elems.transpose(0, 2, 1)
 
 
 def rotational_invariance(force_constants,
@@ -519,7 +1076,7 @@ def rotational_invariance(force_constants,
     fc = force_constants
     p2s = primitive.get_primitive_to_supercell_map()
 
-    smallest_vectors, multiplicity = primitive.get_smallest_vectors()
+    smallest_vectors, multiplicity = primitive.get_dense_smallest_vectors()
 
     abc = "xyz"
 
@@ -527,8 +1084,8 @@ def rotational_invariance(force_constants,
         for i in range(3):
             mat = np.zeros((3, 3), dtype='double')
             for s in range(supercell.get_number_of_atoms()):
-                m = multiplicity[s, pi]
-                vecs = smallest_vectors[s, pi, :m]
+                m, adrs = multiplicity[s, pi]
+                vecs = smallest_vectors[adrs:(adrs + m)]
                 v = np.dot(vecs.sum(axis=0) / m, primitive.get_cell())
                 for j in range(3):
                     for k in range(3):
@@ -621,6 +1178,18 @@ def get_nsym_list_and_s2pp(s2p_map,
 
 
 def get_harmonic_potential_energy(force_constants, displacements):
+    """Return harmonic potential energy of displacements
+
+    force_constants is either full force constants array or
+    FullForceConstantsView. With the latter, the energy is summed row by
+    row of the force constants.
+
+    """
+
+    if isinstance(force_constants, FullForceConstantsView):
+        return _get_harmonic_potential_energy_by_rows(force_constants,
+                                                      displacements)
+
     if force_constants.shape[0] != force_constants.shape[1]:
         raise RuntimeError("Full shape force constants are necessary.")
 
@@ -638,6 +1207,39 @@ def get_harmonic_potential_energy(force_constants, displacements):
         raise RuntimeError("Array shape of displacements is wrong.")
 
 
+def _get_harmonic_potential_energy_by_rows(fc_view, displacements):
+    if displacements.ndim not in (2, 3):
+        raise RuntimeError("Array shape of displacements is wrong.")
+
+    d = np.reshape(displacements, (-1, len(fc_view), 3))
+    energies = np.zeros(len(d), dtype='double')
+    for i in range(len(fc_view)):
+        # forces[n, a] = -sum_jb fc[i, j, a, b] d[n, j, b]
+        forces = np.einsum('jab,njb->na', fc_view[i], d)
+        energies += (forces * d[:, i]).sum(axis=1) / 2
+    if displacements.ndim == 3:
+        return list(energies)
+    else:
+        return energies[0]
+
+
+def _perm_trans_symmetrize_fc(force_constants, level):
+    """Return maximum drift subtracted in the last repetition"""
+    try:
+        import phonopy._phonopy as phonoc
+        return phonoc.perm_trans_symmetrize_fc(force_constants, level)
+    except ImportError:
+        drift = 0
+        for i in range(level):
+            drift = 0
+            for index in (0, 1):
+                drift = max(drift, set_translational_invariance_per_index(
+                    force_constants, index=index))
+            set_permutation_symmetry(force_constants)
+        set_translational_invariance(force_constants)
+        return drift
+
+
 def _get_drift_per_index(force_constants):
     num_atom = force_constants.shape[0]
     maxval = 0
@@ -669,18 +1271,15 @@ def _solve_force_constants_svd(disp_atom_number,
     rot_disps = get_rotated_displacement(displacements, site_sym_cart)
     inv_displacements = np.linalg.pinv(rot_disps)
 
-    fc = np.zeros((supercell.get_number_of_atoms(), 3, 3),
-                  dtype='double', order='C')
-    for i in range(supercell.get_number_of_atoms()):
-        combined_forces = []
-        for forces in sets_of_forces:
-            combined_forces.append(
-                get_rotated_forces(forces[rot_map_syms[:, i]],
-                                   site_sym_cart))
-
-        combined_forces = np.reshape(combined_forces, (-1, 3))
-        fc[i] = -np.dot(inv_displacements, combined_forces)
-    return fc
+    # rot_forces[d, s, i] = R_s F_d[rot_map_syms[s, i]] with rows ordered
+    # as rot_disps, i.e., (displacement, site-symmetry operation).
+    num_atom = len(positions)
+    forces = np.array(sets_of_forces, dtype='double', order='C')
+    rot_forces = np.matmul(forces[:, rot_map_syms],
+                           np.transpose(site_sym_cart, (0, 2, 1)))
+    fc = -np.dot(inv_displacements, rot_forces.reshape(-1, num_atom * 3))
+    return np.array(fc.reshape(3, num_atom, 3).transpose(1, 0, 2),
+                    dtype='double', order='C')
 
 
 def _get_force_constants_disps(force_constants,
@@ -843,25 +1442,21 @@ def _get_sym_mappings_from_permutations(permutations, atom_list_done):
     assert permutations.ndim == 2
     num_pos = permutations.shape[1]
 
-    # filled with -1
-    map_atoms = np.zeros((num_pos,), dtype='intc') - 1
-    map_syms = np.zeros((num_pos,), dtype='intc') - 1
-
-    atom_list_done = set(atom_list_done)
-    for atom_todo in range(num_pos):
-        for (sym_index, permutation) in enumerate(permutations):
-            if permutation[atom_todo] in atom_list_done:
-                map_atoms[atom_todo] = permutation[atom_todo]
-                map_syms[atom_todo] = sym_index
-                break
-        else:
-            text = ("Input forces are not enough to calculate force constants,"
-                    "or something wrong (e.g. crystal structure does not "
-                    "match).")
-            print(textwrap.fill(text))
-            raise ValueError
-
-    assert set(map_atoms) & set(atom_list_done) == set(map_atoms)
-    assert -1 not in map_atoms
-    assert -1 not in map_syms
+    is_done = np.zeros(num_pos, dtype=bool)
+    is_done[list(atom_list_done)] = True
+    # is_mapped[sym_index, atom_todo]
+    is_mapped = is_done[permutations]
+    if not is_mapped.any(axis=0).all():
+        text = ("Input forces are not enough to calculate force constants,"
+                "or something wrong (e.g. crystal structure does not "
+                "match).")
+        print(textwrap.fill(text))
+        raise ValueError
+
+    # The first rotation that sends each atom into atom_list_done.
+    map_syms = np.array(np.argmax(is_mapped, axis=0), dtype='intc')
+    map_atoms = np.array(permutations[map_syms, np.arange(num_pos)],
+                         dtype='intc')
+
+    assert is_done[map_atoms].all()
     return map_atoms, map_syms
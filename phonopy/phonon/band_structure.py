@@ -38,27 +38,96 @@ import gzip
 import yaml
 import numpy as np
 from phonopy.units import VaspToTHz
+from phonopy.phonon.solver import solve_dynamical_matrices
 
 
 def estimate_band_connection(prev_eigvecs, eigvecs, prev_band_order):
     metric = np.abs(np.dot(prev_eigvecs.conjugate().T, eigvecs))
-    connection_order = []
-    for overlaps in metric:
-        maxval = 0
-        for i in reversed(range(len(metric))):
-            val = overlaps[i]
-            if i in connection_order:
-                continue
-            if val > maxval:
-                maxval = val
-                maxindex = i
-        connection_order.append(maxindex)
-
+    connection_order = _get_greedy_connection_order(metric)
     band_order = [connection_order[x] for x in prev_band_order]
 
     return band_order
 
 
+def get_band_orders(eigenvectors, method='greedy', num_pairs_in_batch=100):
+    """Return band orders along a path connected by eigenvector overlaps
+
+    Overlaps between eigenvectors of consecutive q-points are computed
+    for many pairs at once by batched matrix products. Then bands of
+    each pair are matched by the given method.
+
+    Parameters
+    ----------
+    eigenvectors : array_like
+        Eigenvectors at q-points along a path as column vectors.
+        shape=(qpoints, bands, bands), dtype=complex
+    method : str, optional
+        'greedy' assigns each band of the previous q-point in turn to the
+        band of the largest overlap among those not yet assigned, which
+        is the conventional way of phonopy. 'assignment' maximizes the sum
+        of overlaps of all bands by solving a linear assignment problem
+        with scipy.optimize.linear_sum_assignment. This is robust at band
+        crossings. When scipy is not installed, 'greedy' is used instead.
+        Default is 'greedy'.
+    num_pairs_in_batch : int, optional
+        Number of pairs of q-points whose overlaps are held at once.
+        Default is 100.
+
+    Returns
+    -------
+    ndarray
+        Band order at each q-point, i.e., bands at the i-th q-point are
+        connected to eigenvalues[i][band_orders[i]].
+        shape=(qpoints, bands), dtype='int_'
+
+    """
+
+    if method == 'assignment':
+        try:
+            from scipy.optimize import linear_sum_assignment
+        except ImportError:
+            warnings.warn("scipy is not installed. Band connection by "
+                          "linear assignment is replaced by greedy one.")
+            method = 'greedy'
+    elif method != 'greedy':
+        raise RuntimeError(
+            "Band connection method has to be 'greedy' or 'assignment'.")
+
+    num_qpoints, num_band = len(eigenvectors), eigenvectors[0].shape[1]
+    band_orders = np.zeros((num_qpoints, num_band), dtype='int_')
+    band_orders[0] = np.arange(num_band)
+    for i in range(0, num_qpoints - 1, num_pairs_in_batch):
+        j = min(i + num_pairs_in_batch, num_qpoints - 1)
+        metrics = np.abs(np.matmul(
+            np.conj(eigenvectors[i:j]).transpose(0, 2, 1),
+            eigenvectors[(i + 1):(j + 1)]))
+        for k, metric in enumerate(metrics):
+            if method == 'assignment':
+                connection_order = linear_sum_assignment(-metric)[1]
+            else:
+                connection_order = _get_greedy_connection_order(metric)
+            band_orders[i + k + 1] = connection_order[band_orders[i + k]]
+
+    return band_orders
+
+
+def _get_greedy_connection_order(metric):
+    """Match bands by taking largest overlaps one by one
+
+    Ties are broken by the larger band index.
+
+    """
+
+    num_band = len(metric)
+    connection_order = np.zeros(num_band, dtype='int_')
+    is_assigned = np.zeros(num_band, dtype=bool)
+    for i, overlaps in enumerate(metric):
+        overlaps = np.where(is_assigned, -1, overlaps)[::-1]
+        connection_order[i] = num_band - 1 - np.argmax(overlaps)
+        is_assigned[connection_order[i]] = True
+    return connection_order
+
+
 def get_band_qpoints_and_path_connections(band_paths, npoints=51,
                                           rec_lattice=None):
     path_connections = []
@@ -452,7 +521,8 @@ class BandStructure(object):
                  path_connections=None,
                  labels=None,
                  is_legacy_plot=False,
-                 factor=VaspToTHz):
+                 factor=VaspToTHz,
+                 band_connection_method='greedy'):
         """
 
         Parameters
@@ -482,6 +552,10 @@ class BandStructure(object):
             to (2 - np.array(path_connections)).sum().
         is_legacy_plot: bool, optional
             This makes the old style band structure plot. Default is False.
+        band_connection_method : str, optional
+            Method to match bands of neighboring points with
+            is_band_connection=True, 'greedy' or 'assignment'. See
+            get_band_orders. Default is 'greedy'.
 
         """
 
@@ -491,9 +565,11 @@ class BandStructure(object):
         self._factor = factor
         self._with_eigenvectors = with_eigenvectors
         self._is_band_connection = is_band_connection
+        self._band_connection_method = band_connection_method
         if is_band_connection:
             self._with_eigenvectors = True
         self._group_velocity = group_velocity
+        self._num_qpoints_in_batch = 100
 
         self._paths = [np.array(path) for path in paths]
         self._is_legacy_plot = is_legacy_plot
@@ -780,27 +856,28 @@ class BandStructure(object):
         self._lastq = qpoint.copy()
 
     def _set_band(self):
-        eigvals = []
-        eigvecs = []
-        group_velocities = []
         distances = []
-
         for path in self._paths:
             self._set_initial_point(path[0])
-
-            (distances_on_path,
-             eigvals_on_path,
-             eigvecs_on_path,
-             gv_on_path) = self._solve_dm_on_path(path)
-
-            eigvals.append(np.array(eigvals_on_path))
-            if self._with_eigenvectors:
-                eigvecs.append(np.array(eigvecs_on_path))
-            if self._group_velocity is not None:
-                group_velocities.append(np.array(gv_on_path))
+            distances_on_path = []
+            for q in path:
+                self._shift_point(q)
+                distances_on_path.append(self._distance)
             distances.append(np.array(distances_on_path))
             self._special_points.append(self._distance)
 
+        eigvals, eigvecs, group_velocities = self._solve_dm_on_paths()
+
+        # Band connection is the only step that has to walk along each path
+        # in order. It is done after phonons at all q-points are obtained.
+        if self._is_band_connection:
+            for i in range(len(self._paths)):
+                if group_velocities is None:
+                    gv_on_path = None
+                else:
+                    gv_on_path = group_velocities[i]
+                self._connect_bands(eigvals[i], eigvecs[i], gv_on_path)
+
         self._eigenvalues = eigvals
         if self._with_eigenvectors:
             self._eigenvectors = eigvecs
@@ -810,58 +887,102 @@ class BandStructure(object):
 
         self._set_frequencies()
 
-    def _solve_dm_on_path(self, path):
-        is_nac = self._dynamical_matrix.is_nac()
-        distances_on_path = []
-        eigvals_on_path = []
-        eigvecs_on_path = []
-        gv_on_path = []
-        prev_eigvecs = None
+    def _solve_dm_on_paths(self):
+        """Phonons at q-points of all paths are solved in blocks
 
-        if self._group_velocity is not None:
-            self._group_velocity.run(path)
-            gv = self._group_velocity.group_velocities
+        q-points of all paths are put together and divided into blocks of
+        self._num_qpoints_in_batch q-points. Dynamical matrices of a block
+        are built in one call and diagonalized by several threads, so
+        the cost does not depend on how the q-points are divided into
+        paths.
 
-        for i, q in enumerate(path):
-            self._shift_point(q)
-            distances_on_path.append(self._distance)
+        Returns
+        -------
+        tuple
+            (eigenvalues, eigenvectors, group_velocities), each of which
+            is a list of ndarrays of paths. eigenvectors and
+            group_velocities are None if they are not computed.
 
-            if is_nac:
-                q_direction = None
-                if (np.abs(q) < 0.0001).all():  # For Gamma point
-                    q_direction = path[0] - path[-1]
-                self._dynamical_matrix.run(q, q_direction=q_direction)
-            else:
-                self._dynamical_matrix.run(q)
-            dm = self._dynamical_matrix.dynamical_matrix
+        """
 
+        qpoints = np.array(np.concatenate(self._paths),
+                           dtype='double', order='C')
+        q_directions = []
+        for path in self._paths:
+            q_directions += [path[0] - path[-1], ] * len(path)
+        num_qpoints = len(qpoints)
+        num_band = len(self._cell) * 3
+        with_eigenvectors = (self._with_eigenvectors or
+                             self._group_velocity is not None)
+
+        eigvals = np.zeros((num_qpoints, num_band), dtype='double')
+        if self._with_eigenvectors:
+            dtype = "c%d" % (np.dtype('double').itemsize * 2)
+            eigvecs = np.zeros((num_qpoints, num_band, num_band),
+                               dtype=dtype, order='C')
+        if self._group_velocity is not None:
+            group_velocities = np.zeros((num_qpoints, num_band, 3),
+                                        dtype='double', order='C')
+
+        for i in range(0, num_qpoints, self._num_qpoints_in_batch):
+            j = min(i + self._num_qpoints_in_batch, num_qpoints)
+            dms = self._get_dynamical_matrices(qpoints[i:j],
+                                               q_directions[i:j])
+            eigvals[i:j], eigvecs_block = solve_dynamical_matrices(
+                dms, with_eigenvectors=with_eigenvectors)
             if self._with_eigenvectors:
-                eigvals, eigvecs = np.linalg.eigh(dm)
-                eigvals = eigvals.real
-            else:
-                eigvals = np.linalg.eigvalsh(dm).real
+                eigvecs[i:j] = eigvecs_block
+            if self._group_velocity is not None:
+                self._group_velocity.run(
+                    qpoints[i:j],
+                    frequencies=(np.sqrt(abs(eigvals[i:j])) *
+                                 np.sign(eigvals[i:j]) * self._factor),
+                    eigenvectors=eigvecs_block)
+                group_velocities[i:j] = self._group_velocity.group_velocities
+
+        sections = np.cumsum([len(path) for path in self._paths])[:-1]
+        eigvals = np.split(eigvals, sections)
+        if self._with_eigenvectors:
+            eigvecs = np.split(eigvecs, sections)
+        else:
+            eigvecs = None
+        if self._group_velocity is not None:
+            group_velocities = np.split(group_velocities, sections)
+        else:
+            group_velocities = None
 
-            if self._is_band_connection:
-                if i == 0:
-                    band_order = range(len(eigvals))
-                else:
-                    band_order = estimate_band_connection(prev_eigvecs,
-                                                          eigvecs,
-                                                          band_order)
-                eigvals_on_path.append(eigvals[band_order])
-                eigvecs_on_path.append((eigvecs.T)[band_order].T)
-
-                if self._group_velocity is not None:
-                    gv_on_path.append(gv[i][band_order])
-                prev_eigvecs = eigvecs
-            else:
-                eigvals_on_path.append(eigvals)
-                if self._with_eigenvectors:
-                    eigvecs_on_path.append(eigvecs)
-                if self._group_velocity is not None:
-                    gv_on_path.append(gv[i])
+        return eigvals, eigvecs, group_velocities
+
+    def _connect_bands(self, eigvals, eigvecs, group_velocities):
+        """Reorder bands along a path in place by band connection"""
 
-        return distances_on_path, eigvals_on_path, eigvecs_on_path, gv_on_path
+        band_orders = get_band_orders(
+            eigvecs,
+            method=self._band_connection_method,
+            num_pairs_in_batch=self._num_qpoints_in_batch)
+        for i, band_order in enumerate(band_orders):
+            eigvals[i] = eigvals[i][band_order]
+            eigvecs[i] = eigvecs[i][:, band_order]
+            if group_velocities is not None:
+                group_velocities[i] = group_velocities[i][band_order]
+
+    def _get_dynamical_matrices(self, qpoints, q_directions):
+        """Dynamical matrices at q-points are computed at once
+
+        For NAC, dynamical matrix at Gamma point is recomputed with
+        the direction of the path that the q-point belongs to.
+
+        """
+
+        self._dynamical_matrix.run_batch(qpoints)
+        dms = self._dynamical_matrix.dynamical_matrices
+        if self._dynamical_matrix.is_nac():
+            for i, q in enumerate(qpoints):
+                if (np.abs(q) < 0.0001).all():  # For Gamma point
+                    self._dynamical_matrix.run(q,
+                                               q_direction=q_directions[i])
+                    dms[i] = self._dynamical_matrix.dynamical_matrix
+        return dms
 
     def _set_frequencies(self):
         frequencies = []
@@ -176,6 +176,122 @@ class CauchyDistribution(object):
         return self._gamma / np.pi / (x**2 + self._gamma**2)
 
 
+class FFTSmearing(object):
+    """Smearing method of DOS using histogram and FFT convolution
+
+    Weighted frequencies are accumulated on a fine uniform frequency grid
+    that includes frequency points, where each frequency is distributed
+    to the two neighboring grid points by linear interpolation. The
+    histogram is convolved with the smearing function by FFT. The cost is
+    O(nq * nb + n log n) for n fine grid points instead of
+    O(nf * nq * nb) of direct evaluation.
+
+    Attributes
+    ----------
+    dos : ndarray
+        Density of states at frequency points.
+        shape=(frequency_points,) or (coef, frequency_points)
+
+    """
+
+    def __init__(self,
+                 frequency_points,
+                 frequencies,
+                 smearing_function,
+                 sigma,
+                 num_points_per_sigma=50):
+        """
+
+        frequency_points : ndarray
+            Uniformly spaced frequency points.
+        frequencies : ndarray
+            All frequencies to be accumulated. These are used to determine
+            the range of the fine grid.
+        smearing_function : NormalDistribution or CauchyDistribution
+            Smearing function.
+        sigma : float
+            Smearing width.
+        num_points_per_sigma : int, optional
+            Number of fine grid points per sigma. Default is 50.
+
+        """
+
+        self._smearing_function = smearing_function
+        f_points = np.array(frequency_points, dtype='double')
+        if len(f_points) > 1:
+            f_delta = f_points[1] - f_points[0]
+            num_div = int(np.ceil(f_delta * num_points_per_sigma / sigma))
+            self._pitch = f_delta / num_div
+        else:
+            num_div = 1
+            self._pitch = float(sigma) / num_points_per_sigma
+        f_min = min(np.min(frequencies), f_points[0])
+        f_max = max(np.max(frequencies), f_points[-1])
+        n_min = int(np.floor((f_min - f_points[0]) / self._pitch)) - 1
+        n_max = int(np.ceil((f_max - f_points[0]) / self._pitch)) + 1
+        self._origin = f_points[0] + n_min * self._pitch
+        self._num_grid = n_max - n_min + 1
+        self._point_indices = np.arange(len(f_points)) * num_div - n_min
+        self._histogram = None
+        self._with_coef = False
+        self._dos = None
+
+    @property
+    def dos(self):
+        return self._dos
+
+    def add(self, frequencies, weights, coef=None):
+        """Accumulate weighted frequencies on the fine grid
+
+        frequencies : ndarray
+            shape=(q-points, bands)
+        weights : ndarray
+            Weights of q-points. shape=(q-points,)
+        coef : ndarray, optional
+            Coefficients for partial DOS.
+            shape=(q-points, coef, bands)
+
+        """
+
+        x = (np.ravel(frequencies) - self._origin) / self._pitch
+        indices = np.clip(np.floor(x).astype('int'), 0, self._num_grid - 2)
+        t = x - indices
+        w = np.repeat(weights, np.shape(frequencies)[1])
+        if coef is None:
+            self._with_coef = False
+            c = w[None, :]
+        else:
+            self._with_coef = True
+            c = np.transpose(coef, (1, 0, 2)).reshape(coef.shape[1], -1) * w
+
+        hist = np.zeros((len(c), self._num_grid), dtype='double')
+        for i, c_i in enumerate(c):
+            hist[i] = np.bincount(indices, weights=(1 - t) * c_i,
+                                  minlength=self._num_grid)
+            hist[i] += np.bincount(indices + 1, weights=t * c_i,
+                                   minlength=self._num_grid)
+
+        if self._histogram is None:
+            self._histogram = hist
+        else:
+            self._histogram += hist
+
+    def run(self):
+        """Convolve histogram with smearing function"""
+
+        n = self._num_grid
+        x = np.arange(-(n - 1), n) * self._pitch
+        kernel = self._smearing_function.calc(x)
+        length = 2 ** int(np.ceil(np.log2(2 * n - 1)))
+        conv = np.fft.irfft(np.fft.rfft(self._histogram, length) *
+                            np.fft.rfft(kernel, length), length)
+        dos = conv[:, self._point_indices + n - 1]
+        if self._with_coef:
+            self._dos = dos
+        else:
+            self._dos = dos[0]
+
+
 def run_tetrahedron_method_dos(mesh,
                                frequency_points,
                                frequencies,
@@ -213,7 +329,11 @@ def run_tetrahedron_method_dos(mesh,
 
 
 class Dos(object):
-    def __init__(self, mesh_object, sigma=None, use_tetrahedron_method=False):
+    def __init__(self,
+                 mesh_object,
+                 sigma=None,
+                 use_tetrahedron_method=False,
+                 use_fft=False):
         self._mesh_object = mesh_object
         self._frequencies = mesh_object.frequencies
         self._weights = mesh_object.weights
@@ -230,6 +350,7 @@ class Dos(object):
 
         self._frequency_points = None
         self._sigma = sigma
+        self._use_fft = use_fft
         self.set_draw_area()
         self.set_smearing_function('Normal')
 
@@ -280,13 +401,30 @@ class Dos(object):
                                            f_max + f_delta * 0.1,
                                            f_delta)
 
+    def _get_memory_budget(self):
+        # Integration weights of tetrahedron method are computed in blocks
+        # of ir-grid-points under the memory budget of ChunkedMesh, or
+        # otherwise in blocks of the default number of ir-grid-points.
+        return getattr(self._mesh_object, 'memory_budget', None)
+
+    def _get_fft_smearing(self):
+        return FFTSmearing(self._frequency_points,
+                           self._frequencies,
+                           self._smearing_function,
+                           self._sigma)
+
 
 class TotalDos(Dos):
-    def __init__(self, mesh_object, sigma=None, use_tetrahedron_method=False):
+    def __init__(self,
+                 mesh_object,
+                 sigma=None,
+                 use_tetrahedron_method=False,
+                 use_fft=False):
         Dos.__init__(self,
                      mesh_object,
                      sigma=sigma,
-                     use_tetrahedron_method=use_tetrahedron_method)
+                     use_tetrahedron_method=use_tetrahedron_method,
+                     use_fft=use_fft)
         self._dos = None
         self._freq_Debye = None
         self._Debye_fit_coef = None
@@ -294,8 +432,15 @@ class TotalDos(Dos):
 
     def run(self):
         if self._tetrahedron_mesh is None:
-            self._dos = np.array([self._get_density_of_states_at_freq(f)
-                                  for f in self._frequency_points])
+            if self._use_fft:
+                fft_smearing = self._get_fft_smearing()
+                fft_smearing.add(self._frequencies,
+                                 self._weights / float(np.sum(self._weights)))
+                fft_smearing.run()
+                self._dos = fft_smearing.dos
+            else:
+                self._dos = np.array([self._get_density_of_states_at_freq(f)
+                                      for f in self._frequency_points])
         else:
             if self._openmp_thm:
                 self._run_tetrahedron_method_dos()
@@ -303,8 +448,9 @@ class TotalDos(Dos):
                 self._dos = np.zeros_like(self._frequency_points)
                 thm = self._tetrahedron_mesh
                 thm.set(value='I', frequency_points=self._frequency_points)
-                for i, iw in enumerate(thm):
-                    self._dos += np.sum(iw * self._weights[i], axis=1)
+                for i, j, iws in thm.iter_blocks(
+                        memory_budget=self._get_memory_budget()):
+                    self._dos += np.dot(self._weights[i:j], iws.sum(axis=2))
 
     @property
     def dos(self):
@@ -408,32 +554,24 @@ class PartialDos(Dos):
                  sigma=None,
                  use_tetrahedron_method=False,
                  direction=None,
-                 xyz_projection=False):
+                 xyz_projection=False,
+                 use_fft=False):
         Dos.__init__(self,
                      mesh_object,
                      sigma=sigma,
-                     use_tetrahedron_method=use_tetrahedron_method)
+                     use_tetrahedron_method=use_tetrahedron_method,
+                     use_fft=use_fft)
         self._eigenvectors = self._mesh_object.eigenvectors
         self._partial_dos = None
+        self._direction = direction
+        self._xyz_projection = xyz_projection
 
-        if xyz_projection:
-            self._eigvecs2 = np.abs(self._eigenvectors) ** 2
+        # Without eigenvectors in memory (ChunkedMesh or Mesh with HDF5
+        # file), partial DOS is accumulated over blocks of q-points in run.
+        if isinstance(self._eigenvectors, np.ndarray):
+            self._eigvecs2 = self._get_eigvecs2(self._eigenvectors)
         else:
-            num_atom = self._frequencies.shape[1] // 3
-            i_x = np.arange(num_atom, dtype='int') * 3
-            i_y = np.arange(num_atom, dtype='int') * 3 + 1
-            i_z = np.arange(num_atom, dtype='int') * 3 + 2
-            if direction is None:
-                self._eigvecs2 = np.abs(self._eigenvectors[:, i_x, :]) ** 2
-                self._eigvecs2 += np.abs(self._eigenvectors[:, i_y, :]) ** 2
-                self._eigvecs2 += np.abs(self._eigenvectors[:, i_z, :]) ** 2
-            else:
-                d = np.array(direction, dtype='double')
-                d /= np.linalg.norm(direction)
-                proj_eigvecs = self._eigenvectors[:, i_x, :] * d[0]
-                proj_eigvecs += self._eigenvectors[:, i_y, :] * d[1]
-                proj_eigvecs += self._eigenvectors[:, i_z, :] * d[2]
-                self._eigvecs2 = np.abs(proj_eigvecs) ** 2
+            self._eigvecs2 = None
 
         self._openmp_thm = True
 
@@ -446,7 +584,9 @@ class PartialDos(Dos):
         return self._partial_dos
 
     def run(self):
-        if self._tetrahedron_mesh is None:
+        if self._eigvecs2 is None:
+            self._run_by_blocks()
+        elif self._tetrahedron_mesh is None:
             self._run_smearing_method()
         else:
             if self._openmp_thm:
@@ -503,16 +643,83 @@ class PartialDos(Dos):
                           comment=comment,
                           filename=filename)
 
+    def _get_eigvecs2(self, eigenvectors):
+        if self._xyz_projection:
+            return np.abs(eigenvectors) ** 2
+
+        num_atom = self._frequencies.shape[1] // 3
+        i_x = np.arange(num_atom, dtype='int') * 3
+        i_y = np.arange(num_atom, dtype='int') * 3 + 1
+        i_z = np.arange(num_atom, dtype='int') * 3 + 2
+        if self._direction is None:
+            eigvecs2 = np.abs(eigenvectors[:, i_x, :]) ** 2
+            eigvecs2 += np.abs(eigenvectors[:, i_y, :]) ** 2
+            eigvecs2 += np.abs(eigenvectors[:, i_z, :]) ** 2
+        else:
+            d = np.array(self._direction, dtype='double')
+            d /= np.linalg.norm(self._direction)
+            proj_eigvecs = eigenvectors[:, i_x, :] * d[0]
+            proj_eigvecs += eigenvectors[:, i_y, :] * d[1]
+            proj_eigvecs += eigenvectors[:, i_z, :] * d[2]
+            eigvecs2 = np.abs(proj_eigvecs) ** 2
+        return eigvecs2
+
     def _run_smearing_method(self):
-        num_pdos = self._eigvecs2.shape[1]
-        num_freqs = len(self._frequency_points)
-        self._partial_dos = np.zeros((num_pdos, num_freqs), dtype='double')
         weights = self._weights / float(np.sum(self._weights))
+        if self._use_fft:
+            fft_smearing = self._get_fft_smearing()
+            fft_smearing.add(self._frequencies, weights, coef=self._eigvecs2)
+            fft_smearing.run()
+            self._partial_dos = fft_smearing.dos
+        else:
+            self._partial_dos = self._get_smearing_partial_dos(
+                self._frequencies, self._eigvecs2, weights)
+
+    def _get_smearing_partial_dos(self, frequencies, eigvecs2, weights):
+        num_pdos = eigvecs2.shape[1]
+        num_freqs = len(self._frequency_points)
+        partial_dos = np.zeros((num_pdos, num_freqs), dtype='double')
         for i, freq in enumerate(self._frequency_points):
-            amplitudes = self._smearing_function.calc(self._frequencies - freq)
-            for j in range(self._partial_dos.shape[0]):
-                self._partial_dos[j, i] = np.dot(
-                    weights, self._eigvecs2[:, j, :] * amplitudes).sum()
+            amplitudes = self._smearing_function.calc(frequencies - freq)
+            for j in range(num_pdos):
+                partial_dos[j, i] = np.dot(
+                    weights, eigvecs2[:, j, :] * amplitudes).sum()
+        return partial_dos
+
+    def _run_by_blocks(self):
+        """Partial DOS is accumulated over blocks of ir-grid points
+
+        Eigenvectors are computed (ChunkedMesh) or read (Mesh with HDF5
+        file) block by block by the mesh object, therefore those at all
+        q-points are not held in memory.
+
+        """
+
+        if self._tetrahedron_mesh is not None:
+            thm = self._tetrahedron_mesh
+            thm.set(value='I', frequency_points=self._frequency_points)
+            fft_smearing = None
+        elif self._use_fft:
+            fft_smearing = self._get_fft_smearing()
+        else:
+            fft_smearing = None
+        weights = self._weights / float(np.sum(self._weights))
+        self._partial_dos = 0
+        for i, j, freqs, eigvecs in self._mesh_object.iter_blocks():
+            eigvecs2 = self._get_eigvecs2(eigvecs)
+            if fft_smearing is not None:
+                fft_smearing.add(freqs, weights[i:j], coef=eigvecs2)
+            elif self._tetrahedron_mesh is None:
+                self._partial_dos += self._get_smearing_partial_dos(
+                    freqs, eigvecs2, weights[i:j])
+            else:
+                iws = thm.get_integration_weights_at_ir_grid_points(i, j)
+                self._partial_dos += self._get_tetrahedron_partial_dos(
+                    iws, eigvecs2, self._weights[i:j])
+
+        if fft_smearing is not None:
+            fft_smearing.run()
+            self._partial_dos = fft_smearing.dos
 
     def _run_tetrahedron_method(self):
         num_pdos = self._eigvecs2.shape[1]
@@ -520,9 +727,21 @@ class PartialDos(Dos):
         self._partial_dos = np.zeros((num_pdos, num_freqs), dtype='double')
         thm = self._tetrahedron_mesh
         thm.set(value='I', frequency_points=self._frequency_points)
-        for i, iw in enumerate(thm):
-            w = self._weights[i]
-            self._partial_dos += np.dot(iw * w, self._eigvecs2[i].T).T
+        for i, j, iws in thm.iter_blocks(
+                memory_budget=self._get_memory_budget()):
+            self._partial_dos += self._get_tetrahedron_partial_dos(
+                iws, self._eigvecs2[i:j], self._weights[i:j])
+
+    def _get_tetrahedron_partial_dos(self, iws, eigvecs2, weights):
+        """Partial DOS from integration weights at a block of grid points
+
+        iws : shape=(grid_points, frequency_points, bands)
+        eigvecs2 : shape=(grid_points, num_pdos, bands)
+        weights : shape=(grid_points,)
+
+        """
+
+        return np.einsum('ifb,ipb,i->pf', iws, eigvecs2, weights)
 
     def _run_tetrahedron_method_dos(self):
         mesh_numbers = self._mesh_object.mesh_numbers
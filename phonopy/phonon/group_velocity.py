@@ -39,6 +39,7 @@ from phonopy.units import VaspToTHz
 from phonopy.harmonic.derivative_dynmat import DerivativeOfDynamicalMatrix
 from phonopy.harmonic.force_constants import similarity_transformation
 from phonopy.phonon.degeneracy import degenerate_sets
+from phonopy.phonon.solver import get_eigen_solutions
 
 
 def get_group_velocity(q,  # q-point
@@ -125,8 +126,10 @@ class GroupVelocity(object):
         else:
             self._ddm = None
         self._symmetry = symmetry
+        self._reciprocal_operations = None
         self._factor = frequency_factor_to_THz
         self._cutoff_frequency = cutoff_frequency
+        self._degeneracy_tolerance = 1e-4
 
         self._directions = np.array([[1, 2, 3],
                                      [1, 0, 0],
@@ -137,17 +140,32 @@ class GroupVelocity(object):
         self._q_points = None
         self._group_velocities = None
         self._perturbation = None
+        self._num_qpoints_in_batch = 100
 
-    def run(self, q_points, perturbation=None):
+    def run(self, q_points, perturbation=None, frequencies=None,
+            eigenvectors=None):
         """Group velocities are computed at q-points.
 
         q_points : Array-like
             List of q-points such as [[0, 0, 0], [0.1, 0.2, 0.3], ...].
         perturbation : Array-like
             Direction in fractional coordinates of reciprocal space.
+        frequencies : Array-like, optional
+            Phonon frequencies at q_points already computed with the same
+            dynamical matrix and frequency_factor_to_THz.
+            shape=(q-points, bands), dtype='double'
+        eigenvectors : Array-like, optional
+            Phonon eigenvectors corresponding to frequencies. When
+            frequencies and eigenvectors are given, dynamical matrices are
+            not diagonalized again.
+            shape=(q-points, bands, bands), dtype=complex
 
         """
 
+        if (frequencies is None) != (eigenvectors is None):
+            raise RuntimeError(
+                "frequencies and eigenvectors have to be given together.")
+
         self._q_points = q_points
         self._perturbation = perturbation
         if perturbation is None:
@@ -158,8 +176,29 @@ class GroupVelocity(object):
                 self._reciprocal_lattice, perturbation)
         self._directions[0] /= np.linalg.norm(self._directions[0])
 
-        gv = [self._calculate_group_velocity_at_q(q) for q in self._q_points]
-        self._group_velocities = np.array(gv, dtype='double', order='C')
+        # Phonons are solved for a block of q-points at once.
+        gv = []
+        num_batch = self._num_qpoints_in_batch
+        for i in range(0, len(self._q_points), num_batch):
+            qpoints = np.array(self._q_points[i:(i + num_batch)],
+                               dtype='double', order='C')
+            if eigenvectors is None:
+                eigvals, eigvecs = get_eigen_solutions(self._dynmat, qpoints)
+                freqs = (np.sqrt(abs(eigvals)) * np.sign(eigvals)
+                         * self._factor)
+            else:
+                freqs = np.array(frequencies[i:(i + num_batch)],
+                                 dtype='double')
+                eigvecs = np.array(eigenvectors[i:(i + num_batch)])
+            gv.append(self._calculate_group_velocities_at_qpoints(
+                qpoints, freqs, eigvecs))
+        if gv:
+            self._group_velocities = np.array(np.concatenate(gv),
+                                              dtype='double', order='C')
+        else:
+            self._group_velocities = np.zeros(
+                (0, self._dynmat.get_dimension(), 3),
+                dtype='double', order='C')
 
     @property
     def q_length(self):
@@ -182,105 +221,106 @@ class GroupVelocity(object):
     def get_group_velocity(self):
         return self.group_velocities
 
-    def _calculate_group_velocity_at_q(self, q):
-        self._dynmat.run(q)
-        dm = self._dynmat.dynamical_matrix
-        eigvals, eigvecs = np.linalg.eigh(dm)
-        eigvals = eigvals.real
-        freqs = np.sqrt(abs(eigvals)) * np.sign(eigvals) * self._factor
-        gv = np.zeros((len(freqs), 3), dtype='double', order='C')
-        deg_sets = degenerate_sets(freqs)
-
-        ddms = self._get_dD(np.array(q))
-        pos = 0
-        for deg in deg_sets:
-            gv[pos:pos+len(deg)] = self._perturb_D(ddms, eigvecs[:, deg])
-            pos += len(deg)
+    def _calculate_group_velocities_at_qpoints(self, qpoints, freqs, eigvecs):
+        """Group velocities at a block of q-points
 
-        for i, f in enumerate(freqs):
-            if f > self._cutoff_frequency:
-                gv[i, :] *= self._factor ** 2 / f / 2
-            else:
-                gv[i, :] = 0
+        Derivatives of dynamical matrices are computed for all q-points
+        at once. Matrix elements of non-degenerate bands are obtained
+        by batched matrix products, and only degenerate subspaces are
+        treated one by one.
 
-        if self._perturbation is None:
-            if self._symmetry is None:
-                return gv
+        """
+        gv = np.zeros(freqs.shape + (3,), dtype='double', order='C')
+        num_band = freqs.shape[1]
+        num_close_pairs = (np.abs(freqs[:, :, None] - freqs[:, None, :])
+                           < self._degeneracy_tolerance).sum(axis=(1, 2))
+        deg_sets = []
+        for f, n in zip(freqs, num_close_pairs):
+            if n > num_band:
+                deg_sets.append([deg for deg in degenerate_sets(
+                    f, cutoff=self._degeneracy_tolerance)
+                                 if len(deg) > 1])
             else:
-                return self._symmetrize_group_velocity(gv, q)
-        else:
-            return gv
-
-    def _symmetrize_group_velocity(self, gv, q):
-        """Symmetrize obtained group velocities using site symmetries."""
+                deg_sets.append([])
+        ddms = self._get_dD_batch(qpoints)
+
+        # Unitary transformations in degenerate subspaces that diagonalize
+        # the perturbation along the first direction.
+        rots = []
+        eigvecs_H = eigvecs.conj().transpose(0, 2, 1)
+        for i, deg_sets_q in enumerate(deg_sets):
+            rots_q = []
+            for deg in deg_sets_q:
+                eigsets = eigvecs[i][:, deg]
+                pert = np.dot(eigsets.T.conj(), np.dot(ddms[0][i], eigsets))
+                rots_q.append(np.linalg.eigh(pert)[1])
+            rots.append(rots_q)
+
+        for j, ddm in enumerate(ddms[1:]):
+            ddm_eigvecs = np.matmul(ddm, eigvecs)
+            gv[:, :, j] = (eigvecs.conj() * ddm_eigvecs).sum(axis=1).real
+            for i, deg_sets_q in enumerate(deg_sets):
+                for deg, rot in zip(deg_sets_q, rots[i]):
+                    pert = np.dot(eigvecs_H[i][deg], ddm_eigvecs[i][:, deg])
+                    gv[i, deg, j] = np.diag(
+                        np.dot(rot.T.conj(), np.dot(pert, rot))).real
 
-        rotations = []
-        for r in self._symmetry.get_reciprocal_operations():
-            q_in_BZ = q - np.rint(q)
-            diff = q_in_BZ - np.dot(r, q_in_BZ)
-            if (np.abs(diff) < self._symmetry.get_symmetry_tolerance()).all():
-                rotations.append(r)
+        for i, f in enumerate(freqs):
+            condition = f > self._cutoff_frequency
+            gv[i, condition] *= (
+                self._factor ** 2 / f[condition] / 2)[:, None]
+            gv[i, ~condition] = 0
 
-        gv_sym = np.zeros_like(gv)
-        for r in rotations:
-            r_cart = similarity_transformation(self._reciprocal_lattice, r)
-            gv_sym += np.dot(r_cart, gv.T).T
+        if self._perturbation is None and self._symmetry is not None:
+            return self._symmetrize_group_velocities(gv, qpoints)
+        else:
+            return gv
 
-        return gv_sym / len(rotations)
+    def _symmetrize_group_velocities(self, gv, qpoints):
+        """Symmetrize group velocities at q-points using site symmetries"""
+
+        if self._reciprocal_operations is None:
+            rotations = np.array(self._symmetry.get_reciprocal_operations(),
+                                 dtype='double', order='C')
+            r_carts = np.array([
+                similarity_transformation(self._reciprocal_lattice, r)
+                for r in rotations], dtype='double', order='C')
+            self._reciprocal_operations = (rotations, r_carts)
+        rotations, r_carts = self._reciprocal_operations
+
+        q_in_BZ = qpoints - np.rint(qpoints)
+        diff = q_in_BZ[:, None, :] - np.dot(q_in_BZ,
+                                            rotations.transpose(0, 2, 1))
+        site_sym = (np.abs(diff) <
+                    self._symmetry.get_symmetry_tolerance()).all(axis=2)
+        r_cart_sums = np.dot(site_sym, r_carts.reshape(-1, 9)).reshape(
+            -1, 3, 3)
+        r_cart_sums /= site_sym.sum(axis=1)[:, None, None]
+        return np.matmul(gv, r_cart_sums.transpose(0, 2, 1))
+
+    def _get_dD_batch(self, qpoints):
+        """Compute derivatives of dynamical matrices at q-points
+
+        Returns
+        -------
+        list of ndarray
+            Derivatives along self._directions.
+            shape=(len(self._directions), ) + (len(qpoints), dim, dim)
 
-    def _get_dD(self, q):
-        """Compute derivative or finite difference of dynamcial matrices"""
+        """
 
         if self._q_length is None:
-            return self._get_dD_analytical(q)
+            self._ddm.run_batch(qpoints)
+            ddms = self._ddm.derivative_of_dynamical_matrices
+            return [np.tensordot(dq, ddms, axes=(0, 1))
+                    for dq in self._directions]
         else:
-            return self._get_dD_FD(q)
-
-    def _get_dD_FD(self, q):
-        """Compute finite difference of dynamcial matrices"""
-
-        ddm = []
-        for dqc in self._directions * self._q_length:
-            dq = np.dot(self._reciprocal_lattice_inv, dqc)
-            ddm.append(delta_dynamical_matrix(q, dq, self._dynmat) /
-                       self._q_length / 2)
-        return np.array(ddm)
-
-    def _get_dD_analytical(self, q):
-        """Compute derivative of dynamcial matrices"""
-
-        self._ddm.run(q)
-        ddm = self._ddm.get_derivative_of_dynamical_matrix()
-        dtype = "c%d" % (np.dtype('double').itemsize * 2)
-        ddm_dirs = np.zeros((len(self._directions),) + ddm.shape[1:],
-                            dtype=dtype)
-        for i, dq in enumerate(self._directions):
-            for j in range(3):
-                ddm_dirs[i] += dq[j] * ddm[j]
-        return ddm_dirs
-
-    def _perturb_D(self, ddms, eigsets):
-        """Treat degeneracy
-
-        Group velocities are calculated using analytical continuation using
-        specified directions (self._directions) in reciprocal space.
-
-        ddms : Array-like
-            List of delta (derivative or finite difference) of dynamical
-            matrices along several q-directions for perturbation.
-        eigsets : Array-like
-            List of phonon eigenvectors of degenerate bands.
-
-        """
-
-        eigvals, eigvecs = np.linalg.eigh(
-            np.dot(eigsets.T.conj(), np.dot(ddms[0], eigsets)))
-
-        gv = []
-        rot_eigsets = np.dot(eigsets, eigvecs)
-        for ddm in ddms[1:]:
-            gv.append(
-                np.diag(np.dot(rot_eigsets.T.conj(),
-                               np.dot(ddm, rot_eigsets))).real)
-
-        return np.transpose(gv)
+            ddms = []
+            for dqc in self._directions * self._q_length:
+                dq = np.dot(self._reciprocal_lattice_inv, dqc)
+                self._dynmat.run_batch(qpoints - dq)
+                dm1 = self._dynmat.dynamical_matrices
+                self._dynmat.run_batch(qpoints + dq)
+                dm2 = self._dynmat.dynamical_matrices
+                ddms.append((dm2 - dm1) / self._q_length / 2)
+            return ddms
@@ -32,9 +32,11 @@
 # ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import os
 import numpy as np
 from phonopy.units import VaspToTHz
 from phonopy.structure.grid_points import GridPoints
+from phonopy.phonon.solver import get_phonons_at_qpoints, get_eigen_solutions
 
 
 class MeshBase(object):
@@ -194,7 +196,32 @@ class Mesh(MeshBase):
                  group_velocity=None,
                  rotations=None,  # Point group operations in real space
                  factor=VaspToTHz,
-                 use_lapack_solver=False):
+                 use_lapack_solver=False,
+                 hdf5_filename=None,
+                 compression=None,
+                 is_single_precision=False):
+        """
+
+        hdf5_filename : str, optional
+            When this is given, frequencies and eigenvectors are written
+            into datasets of this HDF5 file block by block of q-points as
+            they are computed, and eigenvectors are not held in memory.
+            The file is closed after the last block. Then Mesh.eigenvectors
+            reopens the file read-only and returns the h5py dataset, which
+            is read lazily. This file is closed by Mesh.close() or at the
+            exit of the with statement. If the file contains an interrupted
+            calculation of the same q-points, the calculation restarts from
+            the first unfinished block. Default is None.
+        compression : str or int, optional
+            Compression filter of h5py for the eigenvector dataset, e.g.,
+            'gzip'. Default is None.
+        is_single_precision : bool, optional
+            Dynamical matrices are diagonalized in single precision when
+            True (see solver.get_eigen_solutions). Frequencies and
+            eigenvectors are stored in double precision arrays. Default is
+            False.
+
+        """
         MeshBase.__init__(self,
                           dynamical_matrix,
                           mesh,
@@ -209,6 +236,11 @@ class Mesh(MeshBase):
         self._group_velocity = group_velocity
         self._group_velocities = None
         self._use_lapack_solver = use_lapack_solver
+        self._num_qpoints_in_batch = 100
+        self._hdf5_filename = hdf5_filename
+        self._compression = compression
+        self._hdf5_file = None
+        self._is_single_precision = is_single_precision
 
     def __iter__(self):
         if self._frequencies is None:
@@ -225,14 +257,29 @@ class Mesh(MeshBase):
         else:
             i = self._q_count
             self._q_count += 1
-            if self._eigenvectors is None:
+            eigvecs = self.eigenvectors
+            if eigvecs is None:
                 return self._frequencies[i], None
             else:
-                return self._frequencies[i], self._eigenvectors[i]
+                return self._frequencies[i], eigvecs[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close HDF5 file opened to read eigenvectors"""
+        if self._hdf5_file is not None:
+            self._hdf5_file.close()
+            self._hdf5_file = None
 
     def run(self):
+        self._group_velocities = None
         self._set_phonon()
-        if self._group_velocity is not None:
+        if (self._group_velocity is not None and
+            self._group_velocities is None):
             self._set_group_velocities(self._group_velocity)
 
     @property
@@ -254,9 +301,17 @@ class Mesh(MeshBase):
 
         The third index corresponds to the eigenvalue's index.
         The second index is for atoms [x1, y1, z1, x2, y2, z2, ...].
+
+        With hdf5_filename, the h5py dataset in the HDF5 file opened
+        read-only is returned.
         """
         if self._frequencies is None:
             self.run()
+        if self._hdf5_filename is not None and self._with_eigenvectors:
+            if self._hdf5_file is None:
+                import h5py
+                self._hdf5_file = h5py.File(self._hdf5_filename, 'r')
+            return self._hdf5_file['eigenvector']
         return self._eigenvectors
 
     def get_eigenvectors(self):
@@ -271,6 +326,32 @@ class Mesh(MeshBase):
     def get_group_velocities(self):
         return self.group_velocities
 
+    def iter_blocks(self):
+        """Iterate over blocks of ir-grid points
+
+        With hdf5_filename, eigenvectors are read from the file block by
+        block.
+
+        Yields
+        ------
+        tuple
+            (i, j, frequencies, eigenvectors) for ir-grid points from i to
+            j - 1. eigenvectors is None if eigenvectors are not calculated.
+
+        """
+
+        if self._frequencies is None:
+            self.run()
+        eigenvectors = self.eigenvectors
+        num_qpoints = len(self._qpoints)
+        for i in range(0, num_qpoints, self._num_qpoints_in_batch):
+            j = min(i + self._num_qpoints_in_batch, num_qpoints)
+            if eigenvectors is None:
+                eigvecs = None
+            else:
+                eigvecs = eigenvectors[i:j]
+            yield i, j, self._frequencies[i:j], eigvecs
+
     def write_hdf5(self):
         import h5py
         with h5py.File('mesh.hdf5', 'w') as w:
@@ -278,8 +359,15 @@ class Mesh(MeshBase):
             w.create_dataset('qpoint', data=self._qpoints)
             w.create_dataset('weight', data=self._weights)
             w.create_dataset('frequency', data=self._frequencies)
-            if self._eigenvectors is not None:
-                w.create_dataset('eigenvector', data=self._eigenvectors)
+            eigenvectors = self.eigenvectors
+            if isinstance(eigenvectors, np.ndarray):
+                w.create_dataset('eigenvector', data=eigenvectors)
+            elif eigenvectors is not None:
+                dset = w.create_dataset('eigenvector',
+                                        eigenvectors.shape,
+                                        dtype=eigenvectors.dtype)
+                for i, j, _, eigvecs in self.iter_blocks():
+                    dset[i:j] = eigvecs
             if self._group_velocities is not None:
                 w.create_dataset('group_velocity', data=self._group_velocities)
 
@@ -302,6 +390,7 @@ class Mesh(MeshBase):
         lines.append("")
         lines.append("phonon:")
 
+        eigenvectors = self.eigenvectors
         for i, (q, d) in enumerate(zip(self._qpoints, distances)):
             lines.append("- q-position: [ %12.7f, %12.7f, %12.7f ]"
                          % tuple(q))
@@ -325,8 +414,8 @@ class Mesh(MeshBase):
                         for l in (0, 1, 2):
                             lines.append(
                                 "      - [ %17.14f, %17.14f ]"
-                                % (self._eigenvectors[i, k*3+l, j].real,
-                                   self._eigenvectors[i, k*3+l, j].imag))
+                                % (eigenvectors[i, k*3+l, j].real,
+                                   eigenvectors[i, k*3+l, j].imag))
             lines.append("")
 
         with open('mesh.yaml', 'w') as w:
@@ -337,36 +426,157 @@ class Mesh(MeshBase):
         num_qpoints = len(self._qpoints)
 
         self._frequencies = np.zeros((num_qpoints, num_band), dtype='double')
+        if self._hdf5_filename is not None:
+            self._set_phonon_on_hdf5()
+            return
+
         if self._with_eigenvectors or self._use_lapack_solver:
             dtype = "c%d" % (np.dtype('double').itemsize * 2)
             self._eigenvectors = np.zeros(
                 (num_qpoints, num_band, num_band,), dtype=dtype, order='C')
 
         if self._use_lapack_solver:
-            from phono3py.phonon.solver import get_phonons_at_qpoints
-            get_phonons_at_qpoints(self._frequencies,
-                                   self._eigenvectors,
-                                   self._dynamical_matrix,
-                                   self._qpoints,
-                                   self._factor,
-                                   nac_q_direction=None,
-                                   lapack_zheev_uplo='L')
-        else:
-            for i, q in enumerate(self._qpoints):
-                self._dynamical_matrix.run(q)
-                dm = self._dynamical_matrix.dynamical_matrix
-                if self._with_eigenvectors:
-                    eigvals, self._eigenvectors[i] = np.linalg.eigh(dm)
-                    eigenvalues = eigvals.real
-                else:
-                    eigenvalues = np.linalg.eigvalsh(dm).real
-                self._frequencies[i] = np.array(np.sqrt(abs(eigenvalues)) *
-                                                np.sign(eigenvalues),
-                                                dtype='double',
-                                                order='C') * self._factor
+            # phono3py's LAPACK solver is used when it is installed to
+            # obtain identical eigenvectors with phono3py.
+            try:
+                from phono3py.phonon.solver import (
+                    get_phonons_at_qpoints as get_phonons_by_lapack)
+            except ImportError:
+                pass
+            else:
+                get_phonons_by_lapack(self._frequencies,
+                                      self._eigenvectors,
+                                      self._dynamical_matrix,
+                                      self._qpoints,
+                                      self._factor,
+                                      nac_q_direction=None,
+                                      lapack_zheev_uplo='L')
+                return
+
+        # Group velocities are computed block by block from eigenvectors
+        # obtained here.
+        if self._group_velocity is not None:
+            self._group_velocities = np.zeros(
+                (num_qpoints, num_band, 3), dtype='double', order='C')
+        get_phonons_at_qpoints(self._frequencies,
+                               self._eigenvectors,
+                               self._dynamical_matrix,
+                               self._qpoints,
+                               self._factor,
+                               num_qpoints_in_batch=self._num_qpoints_in_batch,
+                               group_velocity=self._group_velocity,
+                               group_velocities=self._group_velocities,
+                               is_single_precision=self._is_single_precision)
+
+    def _set_phonon_on_hdf5(self):
+        """Phonons are computed and written into HDF5 file block by block
+
+        The number of finished q-points is stored in the file attribute
+        'num_finished_qpoints' after each block is written. The file is
+        closed at the end.
+
+        """
+
+        w = self._open_hdf5_file()
+        num_qpoints = len(self._qpoints)
+        if self._group_velocity is not None:
+            self._group_velocities = np.zeros(
+                w['frequency'].shape + (3,), dtype='double', order='C')
+        start = int(w.attrs['num_finished_qpoints'])
+        if start > 0:
+            # Stored phonons are used only when those of the first block
+            # are reproduced by the current dynamical matrix.
+            j = min(self._num_qpoints_in_batch, start)
+            get_phonons_at_qpoints(
+                self._frequencies[:j],
+                None,
+                self._dynamical_matrix,
+                self._qpoints[:j],
+                self._factor,
+                is_single_precision=self._is_single_precision)
+            if np.allclose(self._frequencies[:j], w['frequency'][:j]):
+                self._frequencies[:start] = w['frequency'][:start]
+                if self._group_velocity is not None:
+                    self._group_velocities[:start] = (
+                        w['group_velocity'][:start])
+            else:
+                start = 0
+        for i in range(start, num_qpoints, self._num_qpoints_in_batch):
+            j = min(i + self._num_qpoints_in_batch, num_qpoints)
+            if self._with_eigenvectors:
+                eigvecs = np.zeros(
+                    (j - i,) + w['eigenvector'].shape[1:],
+                    dtype=w['eigenvector'].dtype, order='C')
+            else:
+                eigvecs = None
+            if self._group_velocity is not None:
+                gv = self._group_velocities[i:j]
+            else:
+                gv = None
+            get_phonons_at_qpoints(
+                self._frequencies[i:j],
+                eigvecs,
+                self._dynamical_matrix,
+                self._qpoints[i:j],
+                self._factor,
+                group_velocity=self._group_velocity,
+                group_velocities=gv,
+                is_single_precision=self._is_single_precision)
+            w['frequency'][i:j] = self._frequencies[i:j]
+            if self._with_eigenvectors:
+                w['eigenvector'][i:j] = eigvecs
+            if self._group_velocity is not None:
+                w['group_velocity'][i:j] = gv
+            w.attrs['num_finished_qpoints'] = j
+            w.flush()
+
+        w.close()
+
+    def _open_hdf5_file(self):
+        import h5py
+
+        num_band = self._cell.get_number_of_atoms() * 3
+        num_qpoints = len(self._qpoints)
+        dtype = "c%d" % (np.dtype('double').itemsize * 2)
+
+        self.close()
+
+        if os.path.exists(self._hdf5_filename):
+            w = h5py.File(self._hdf5_filename, 'a')
+            if ('num_finished_qpoints' in w.attrs and
+                'qpoint' in w and
+                w['qpoint'].shape == self._qpoints.shape and
+                np.allclose(w['qpoint'][:], self._qpoints) and
+                w['frequency'].shape == (num_qpoints, num_band) and
+                (not self._with_eigenvectors or 'eigenvector' in w) and
+                (self._group_velocity is None or 'group_velocity' in w)):
+                return w
+            w.close()
+
+        w = h5py.File(self._hdf5_filename, 'w')
+        w.create_dataset('mesh', data=self._mesh)
+        w.create_dataset('qpoint', data=self._qpoints)
+        w.create_dataset('weight', data=self._weights)
+        w.create_dataset('frequency', (num_qpoints, num_band), dtype='double')
+        if self._with_eigenvectors:
+            w.create_dataset('eigenvector',
+                             (num_qpoints, num_band, num_band),
+                             dtype=dtype,
+                             chunks=(1, num_band, num_band),
+                             compression=self._compression)
+        if self._group_velocity is not None:
+            w.create_dataset('group_velocity', (num_qpoints, num_band, 3),
+                             dtype='double')
+        w.attrs['num_finished_qpoints'] = 0
+        return w
 
     def _set_group_velocities(self, group_velocity):
-        group_velocity.run(self._qpoints)
+        if isinstance(self._eigenvectors, np.ndarray):
+            group_velocity.run(self._qpoints,
+                               frequencies=self._frequencies,
+                               eigenvectors=self._eigenvectors)
+        else:
+            group_velocity.run(self._qpoints)
         self._group_velocities = group_velocity.group_velocities
 
 
@@ -428,3 +638,193 @@ class IterMesh(MeshBase):
                                    order='C') * self._factor
             self._q_count += 1
             return frequencies, eigenvectors
+
+
+class ChunkedMesh(MeshBase):
+    """Class for phonons on mesh grid computed in blocks of q-points
+
+    Frequencies and group velocities at ir-grid points are stored, but
+    eigenvectors are not. Eigenvectors are recomputed for a block of
+    q-points at a time when they are requested through iter_blocks or the
+    iterator representation compatible with Mesh and IterMesh. The number
+    of q-points in a block is determined from memory_budget, so that peak
+    memory usage does not depend on the sampling mesh size.
+
+    Attributes
+    ----------
+    frequencies: ndarray
+        Phonon frequencies at ir-grid points. Imaginary frequenies are
+        represented by negative real numbers.
+        dtype='double'
+        shape=(ir-grid points, bands)
+    eigenvectors: None
+        Eigenvectors are not stored.
+    group_velocities: ndarray
+        Phonon group velocities at ir-grid points.
+        shape=(ir-grid points, bands, 3)
+        dtype='double'
+    num_qpoints_in_batch: int
+        Number of q-points in a block.
+    More attributes from MeshBase should be watched.
+
+    """
+    def __init__(self,
+                 dynamical_matrix,
+                 mesh,
+                 shift=None,
+                 is_time_reversal=True,
+                 is_mesh_symmetry=True,
+                 with_eigenvectors=False,
+                 is_gamma_center=False,
+                 group_velocity=None,
+                 rotations=None,  # Point group operations in real space
+                 factor=VaspToTHz,
+                 memory_budget=None,
+                 is_single_precision=False):
+        """
+
+        memory_budget : float, optional
+            Memory size in MB used for dynamical matrices and eigenvectors
+            of a block of q-points. Default is None, which gives 100
+            q-points in a block.
+        is_single_precision : bool, optional
+            Dynamical matrices are diagonalized in single precision when
+            True (see solver.get_eigen_solutions). Default is False.
+
+        """
+        MeshBase.__init__(self,
+                          dynamical_matrix,
+                          mesh,
+                          shift=shift,
+                          is_time_reversal=is_time_reversal,
+                          is_mesh_symmetry=is_mesh_symmetry,
+                          with_eigenvectors=with_eigenvectors,
+                          is_gamma_center=is_gamma_center,
+                          rotations=rotations,
+                          factor=factor)
+
+        self._group_velocity = group_velocity
+        self._group_velocities = None
+        self._memory_budget = memory_budget
+        self._is_single_precision = is_single_precision
+        self._num_qpoints_in_batch = self._get_num_qpoints_in_batch()
+        self._block = None
+
+    def __iter__(self):
+        if self._frequencies is None:
+            self.run()
+        return self
+
+    def next(self):
+        return self.__next__()
+
+    def __next__(self):
+        if self._q_count == len(self._qpoints):
+            self._q_count = 0
+            self._block = None
+            raise StopIteration
+        else:
+            i = self._q_count
+            self._q_count += 1
+            if not self._with_eigenvectors:
+                return self._frequencies[i], None
+            if self._block is None or i >= self._block[1]:
+                j = min(i + self._num_qpoints_in_batch, len(self._qpoints))
+                self._block = (i, j, self._get_eigenvectors(i, j))
+            return self._frequencies[i], self._block[2][i - self._block[0]]
+
+    def run(self):
+        num_band = self._cell.get_number_of_atoms() * 3
+        num_qpoints = len(self._qpoints)
+        self._frequencies = np.zeros((num_qpoints, num_band), dtype='double')
+        if self._group_velocity is not None:
+            self._group_velocities = np.zeros(
+                (num_qpoints, num_band, 3), dtype='double', order='C')
+        get_phonons_at_qpoints(self._frequencies,
+                               None,
+                               self._dynamical_matrix,
+                               self._qpoints,
+                               self._factor,
+                               num_qpoints_in_batch=self._num_qpoints_in_batch,
+                               group_velocity=self._group_velocity,
+                               group_velocities=self._group_velocities,
+                               is_single_precision=self._is_single_precision)
+
+    def iter_blocks(self):
+        """Iterate over blocks of ir-grid points
+
+        Yields
+        ------
+        tuple
+            (i, j, frequencies, eigenvectors) for ir-grid points from i to
+            j - 1, where frequencies and eigenvectors have the shapes of
+            (j - i, bands) and (j - i, bands, bands). eigenvectors is None
+            unless with_eigenvectors=True.
+
+        """
+
+        if self._frequencies is None:
+            self.run()
+        num_qpoints = len(self._qpoints)
+        for i in range(0, num_qpoints, self._num_qpoints_in_batch):
+            j = min(i + self._num_qpoints_in_batch, num_qpoints)
+            if self._with_eigenvectors:
+                eigvecs = self._get_eigenvectors(i, j)
+            else:
+                eigvecs = None
+            yield i, j, self._frequencies[i:j], eigvecs
+
+    @property
+    def frequencies(self):
+        if self._frequencies is None:
+            self.run()
+        return self._frequencies
+
+    def get_frequencies(self):
+        return self.frequencies
+
+    @property
+    def eigenvectors(self):
+        return None
+
+    def get_eigenvectors(self):
+        return self.eigenvectors
+
+    @property
+    def group_velocities(self):
+        if self._frequencies is None:
+            self.run()
+        return self._group_velocities
+
+    def get_group_velocities(self):
+        return self.group_velocities
+
+    @property
+    def memory_budget(self):
+        return self._memory_budget
+
+    @property
+    def num_qpoints_in_batch(self):
+        return self._num_qpoints_in_batch
+
+    def _get_eigenvectors(self, i, j):
+        eigvecs = get_eigen_solutions(
+            self._dynamical_matrix,
+            self._qpoints[i:j],
+            is_single_precision=self._is_single_precision)[1]
+        if self._is_single_precision:
+            dtype = "c%d" % (np.dtype('double').itemsize * 2)
+            eigvecs = np.array(eigvecs, dtype=dtype, order='C')
+        return eigvecs
+
+    def _get_num_qpoints_in_batch(self):
+        if self._memory_budget is None:
+            return 100
+        num_band = self._cell.get_number_of_atoms() * 3
+        # Dynamical matrices, eigenvectors and a work space of the solver.
+        # With is_single_precision=True, the first two are in single
+        # precision but eigenvectors are returned in double precision,
+        # so the same size is used.
+        itemsize = np.dtype('double').itemsize * 2
+        size_per_qpoint = 3 * num_band ** 2 * itemsize
+        return max(int(self._memory_budget * 1024 ** 2 / size_per_qpoint), 1)
@@ -34,11 +34,21 @@
 
 import numpy as np
 from phonopy.units import VaspToTHz
+from phonopy.phonon.solver import (get_dynamical_matrices,
+                                   get_eigen_solutions,
+                                   get_phonons_at_qpoints,
+                                   solve_dynamical_matrices)
+from phonopy.phonon.qpoints_reducer import QpointsReducer
 
 
 class QpointsPhonon(object):
     """Calculate phonons at specified qpoints
 
+    When symmetry of the primitive cell is given, phonons are solved only
+    at irreducible q-points and those at the other q-points are obtained
+    by symmetry operations (see QpointsReducer). This is not applied with
+    with_dynamical_matrices=True or nac_q_direction with NAC.
+
     Attributes
     ----------
     frequencies : ndarray
@@ -65,7 +75,8 @@ class QpointsPhonon(object):
                  with_eigenvectors=False,
                  group_velocity=None,
                  with_dynamical_matrices=False,
-                 factor=VaspToTHz):
+                 factor=VaspToTHz,
+                 symmetry=None):
         primitive = dynamical_matrix.get_primitive()
         self._natom = primitive.get_number_of_atoms()
         self._masses = primitive.get_masses()
@@ -80,11 +91,13 @@ class QpointsPhonon(object):
         self._group_velocity = group_velocity
         self._with_dynamical_matrices = with_dynamical_matrices
         self._factor = factor
+        self._symmetry = symmetry
 
         self._group_velocities = None
         self._eigenvectors = None
         self._frequencies = None
         self._dynamical_matrices = None
+        self._num_qpoints_in_batch = 100
 
         self._run()
 
@@ -170,47 +183,102 @@ class QpointsPhonon(object):
             w.write("\n")
 
     def _run(self):
-        if self._group_velocity is not None:
-            self._group_velocity.run(
-                self._qpoints, perturbation=self._nac_q_direction)
-            self._group_velocities = self._group_velocity.group_velocities
+        if (self._symmetry is not None and
+            not self._with_dynamical_matrices and
+            (self._nac_q_direction is None or
+             not self._dynamical_matrix.is_nac())):
+            self._run_with_symmetry()
+            return
 
-        if self._with_dynamical_matrices:
-            dynamical_matrices = []
-
-        self._frequencies = []
+        num_qpoints = len(self._qpoints)
+        num_band = self._natom * 3
+        dtype = "c%d" % (np.dtype('double').itemsize * 2)
+        self._frequencies = np.zeros((num_qpoints, num_band),
+                                     dtype='double', order='C')
         if self._with_eigenvectors:
-            self._eigenvectors = []
+            self._eigenvectors = np.zeros((num_qpoints, num_band, num_band),
+                                          dtype=dtype, order='C')
+        if self._with_dynamical_matrices:
+            self._dynamical_matrices = np.zeros(
+                (num_qpoints, num_band, num_band), dtype=dtype, order='C')
+        if self._group_velocity is not None:
+            self._group_velocities = np.zeros((num_qpoints, num_band, 3),
+                                              dtype='double', order='C')
 
-        for q in self._qpoints:
-            dm = self._get_dynamical_matrix(q)
+        # Dynamical matrices are computed for a block of q-points at once.
+        num_batch = self._num_qpoints_in_batch
+        for i in range(0, num_qpoints, num_batch):
+            qpoints = self._qpoints[i:(i + num_batch)]
+            j = i + len(qpoints)
+            with_eigenvectors = (self._with_eigenvectors or
+                                 self._group_velocity is not None)
             if self._with_dynamical_matrices:
-                dynamical_matrices.append(dm)
-            if self._with_eigenvectors:
-                eigvals, eigvecs = np.linalg.eigh(dm)
-                self._eigenvectors.append(eigvecs)
+                dms = get_dynamical_matrices(
+                    self._dynamical_matrix,
+                    qpoints,
+                    nac_q_direction=self._nac_q_direction)
+                self._dynamical_matrices[i:j] = dms
+                eigvals, eigvecs = solve_dynamical_matrices(
+                    dms, with_eigenvectors=with_eigenvectors)
             else:
-                eigvals = np.linalg.eigvalsh(dm)
-            eigvals = eigvals.real
-            self._frequencies.append(np.sqrt(np.abs(eigvals)) *
-                                     np.sign(eigvals) * self._factor)
+                eigvals, eigvecs = get_eigen_solutions(
+                    self._dynamical_matrix,
+                    qpoints,
+                    nac_q_direction=self._nac_q_direction,
+                    with_eigenvectors=with_eigenvectors)
+            if self._with_eigenvectors:
+                self._eigenvectors[i:j] = eigvecs
+            self._frequencies[i:j] = (np.sqrt(np.abs(eigvals)) *
+                                      np.sign(eigvals) * self._factor)
+            if self._group_velocity is not None:
+                self._group_velocity.run(
+                    qpoints,
+                    perturbation=self._nac_q_direction,
+                    frequencies=self._frequencies[i:j],
+                    eigenvectors=eigvecs)
+                self._group_velocities[i:j] = (
+                    self._group_velocity.group_velocities)
 
-        self._frequencies = np.array(self._frequencies,
-                                     dtype='double', order='C')
-        dtype = "c%d" % (np.dtype('double').itemsize * 2)
-        if self._with_eigenvectors:
-            self._eigenvectors = np.array(self._eigenvectors,
-                                          dtype=dtype, order='C')
-        if self._with_dynamical_matrices:
-            self._dynamical_matrices = np.array(dynamical_matrices,
-                                                dtype=dtype, order='C')
-
-    def _get_dynamical_matrix(self, q):
-        if (self._dynamical_matrix.is_nac() and
-            self._nac_q_direction is not None and
-            (np.abs(q) < 1e-5).all()):
-            self._dynamical_matrix.run(
-                q, q_direction=self._nac_q_direction)
+    def _run_with_symmetry(self):
+        """Phonons are solved only at irreducible q-points
+
+        Frequencies and eigenvectors at the other q-points are obtained by
+        symmetry operations. Lattice translation in reciprocal space is
+        not used with NAC because the NAC term is not periodic.
+
+        """
+
+        reducer = QpointsReducer(
+            self._qpoints,
+            self._dynamical_matrix.primitive,
+            self._symmetry,
+            is_lattice_translation=(not self._dynamical_matrix.is_nac()))
+        ir_qpoints = reducer.ir_qpoints
+        num_band = self._natom * 3
+        with_eigenvectors = (self._with_eigenvectors or
+                             self._group_velocity is not None)
+        ir_freqs = np.zeros((len(ir_qpoints), num_band), dtype='double')
+        if with_eigenvectors:
+            dtype = "c%d" % (np.dtype('double').itemsize * 2)
+            ir_eigvecs = np.zeros((len(ir_qpoints), num_band, num_band),
+                                  dtype=dtype, order='C')
         else:
-            self._dynamical_matrix.run(q)
-        return self._dynamical_matrix.dynamical_matrix
+            ir_eigvecs = None
+        get_phonons_at_qpoints(ir_freqs,
+                               ir_eigvecs,
+                               self._dynamical_matrix,
+                               ir_qpoints,
+                               self._factor,
+                               num_qpoints_in_batch=self._num_qpoints_in_batch)
+
+        self._frequencies = reducer.get_frequencies(ir_freqs)
+        if with_eigenvectors:
+            eigvecs = reducer.get_eigenvectors(ir_eigvecs)
+            if self._with_eigenvectors:
+                self._eigenvectors = eigvecs
+        if self._group_velocity is not None:
+            self._group_velocity.run(self._qpoints,
+                                     perturbation=self._nac_q_direction,
+                                     frequencies=self._frequencies,
+                                     eigenvectors=eigvecs)
+            self._group_velocities = self._group_velocity.group_velocities
@@ -0,0 +1,248 @@
+# Copyright (C) 2020 Atsushi Togo
+# All rights reserved.
+#
+# This file is part of phonopy.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in
+#   the documentation and/or other materials provided with the
+#   distribution.
+#
+# * Neither the name of the phonopy project nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import numpy as np
+from phonopy.harmonic.force_constants import similarity_transformation
+
+
+class QpointsReducer(object):
+    """Reduce q-points to irreducible ones by symmetry
+
+    Each q-point is mapped to an irreducible q-point q_ir by a point-group
+    operation R, optionally time reversal s = -1, and a reciprocal lattice
+    vector G as
+
+        R^-T q = s (q_ir + G),
+
+    where R is the rotation part of a space-group operation of the
+    primitive cell in fractional coordinates. Phonons need to be solved
+    only at the irreducible q-points. Frequencies at the other q-points
+    are copied, and eigenvectors are reconstructed by
+
+        e(q)_i = R_cart^T e'(R^-T q)_perm(i),
+        e'(q_ir + G) = exp(-2 pi i G.r_i) e(q_ir),
+        e'(-(q_ir + G)) = e'(q_ir + G)^*,
+
+    where perm(i) is the atom that atom i is sent to by the space-group
+    operation. This follows the phase convention of phonopy dynamical
+    matrix, in which atomic positions are included in the phase factor.
+
+    Eigenvectors reconstructed in this way are exact eigenvectors of the
+    dynamical matrix when force constants satisfy the symmetry. Within
+    degenerate bands, they can be different linear combinations from
+    those obtained by direct diagonalization.
+
+    Attributes
+    ----------
+    qpoints : ndarray
+        Input q-points.
+        shape=(qpoints, 3), dtype='double'
+    ir_qpoints : ndarray
+        Irreducible q-points.
+        shape=(ir_qpoints, 3), dtype='double'
+    ir_map : ndarray
+        Indices of ir_qpoints of q-points.
+        shape=(qpoints, ), dtype='int_'
+
+    """
+
+    def __init__(self,
+                 qpoints,
+                 primitive,
+                 symmetry,
+                 is_time_reversal=True,
+                 is_lattice_translation=True,
+                 tolerance=1e-5):
+        """
+
+        Parameters
+        ----------
+        qpoints : array_like
+            q-points in reduced coordinates.
+            shape=(qpoints, 3), dtype='double'
+        primitive : Primitive
+            Primitive cell.
+        symmetry : Symmetry
+            Symmetry of the primitive cell.
+        is_time_reversal : bool, optional
+            Time reversal symmetry, i.e., D(-q) = D(q)^*, is used. Default
+            is True.
+        is_lattice_translation : bool, optional
+            q-points different by reciprocal lattice vectors are regarded
+            as equivalent. This has to be False for NAC by Wang et al.,
+            which is not periodic in reciprocal space. Default is True.
+        tolerance : float, optional
+            Tolerance to compare q-points. Default is 1e-5.
+
+        """
+
+        self._qpoints = np.array(np.reshape(qpoints, (-1, 3)),
+                                 dtype='double', order='C')
+        self._primitive = primitive
+        self._is_time_reversal = is_time_reversal
+        self._is_lattice_translation = is_lattice_translation
+        self._tolerance = tolerance
+
+        self._set_operations(symmetry)
+        self._ir_qpoints = None
+        self._ir_map = None
+        self._ops = None  # Index of operation for each q-point
+        self._signs = None  # Time reversal for each q-point
+        self._G = None  # Reciprocal lattice vector for each q-point
+        self._reduce()
+
+    @property
+    def qpoints(self):
+        return self._qpoints
+
+    @property
+    def ir_qpoints(self):
+        return self._ir_qpoints
+
+    @property
+    def ir_map(self):
+        return self._ir_map
+
+    def get_frequencies(self, ir_frequencies):
+        """Return frequencies at q-points from those at ir-q-points
+
+        ir_frequencies : array_like
+            shape=(ir_qpoints, bands)
+
+        """
+
+        return np.array(np.array(ir_frequencies)[self._ir_map],
+                        dtype='double', order='C')
+
+    def get_eigenvectors(self, ir_eigenvectors):
+        """Return eigenvectors at q-points from those at ir-q-points
+
+        ir_eigenvectors : array_like
+            Eigenvectors as column vectors.
+            shape=(ir_qpoints, bands, bands), dtype=complex
+
+        """
+
+        ir_eigvecs = np.array(ir_eigenvectors)
+        num_atom = len(self._primitive)
+        num_band = ir_eigvecs.shape[2]
+        positions = self._primitive.scaled_positions
+
+        eigvecs = np.zeros((len(self._qpoints), ) + ir_eigvecs.shape[1:],
+                           dtype=ir_eigvecs.dtype, order='C')
+        for i, (j, k, s, G) in enumerate(zip(self._ir_map,
+                                             self._ops,
+                                             self._signs,
+                                             self._G)):
+            phases = np.exp(-2j * np.pi * np.dot(positions, G))
+            e = (ir_eigvecs[j].reshape(num_atom, 3, num_band) *
+                 phases[:, None, None])
+            if s < 0:
+                e = e.conj()
+            e = np.einsum('ba,ibn->ian',
+                          self._rotations_cart[k],
+                          e[self._permutations[k]])
+            eigvecs[i] = e.reshape(num_atom * 3, num_band)
+
+        return eigvecs
+
+    def _set_operations(self, symmetry):
+        """Collect space-group operations with different rotations"""
+
+        rotations = symmetry.get_symmetry_operations()['rotations']
+        permutations = symmetry.get_atomic_permutations()
+        lattice = self._primitive.cell.T
+
+        unique_indices = []
+        for i, r in enumerate(rotations):
+            if not any([(rotations[j] == r).all() for j in unique_indices]):
+                unique_indices.append(i)
+
+        self._permutations = np.array(permutations[unique_indices],
+                                      dtype='int_')
+        self._rotations_cart = np.array(
+            [similarity_transformation(lattice, rotations[i])
+             for i in unique_indices], dtype='double', order='C')
+        # q' = R^-T q
+        self._reciprocal_rotations = np.array(
+            [np.rint(np.linalg.inv(rotations[i]).T) for i in unique_indices],
+            dtype='int_')
+
+    def _reduce(self):
+        """Find irreducible q-points
+
+        Among the q-points in the star of each q-point (modulo reciprocal
+        lattice vectors if is_lattice_translation=True), the
+        lexicographically smallest one is chosen as the representative.
+
+        """
+
+        num_ops = len(self._reciprocal_rotations)
+        rotated = np.dot(self._qpoints,
+                         self._reciprocal_rotations.transpose(0, 2, 1))
+        if self._is_time_reversal:
+            rotated = np.concatenate((rotated, -rotated), axis=1)
+        if self._is_lattice_translation:
+            G = np.floor(rotated + self._tolerance)
+        else:
+            G = np.zeros_like(rotated)
+        reduced = rotated - G
+        keys = np.rint(reduced / self._tolerance).astype('int64')
+
+        # Lexicographic minimum among the images of each q-point.
+        is_min = np.ones(keys.shape[:2], dtype=bool)
+        for axis in range(3):
+            vals = np.where(is_min, keys[:, :, axis],
+                            np.iinfo(keys.dtype).max)
+            is_min &= keys[:, :, axis] == vals.min(axis=1)[:, None]
+        arg_min = is_min.argmax(axis=1)
+        indices = np.arange(len(self._qpoints))
+        min_keys = keys[indices, arg_min]
+
+        _, first_indices, ir_map = np.unique(
+            min_keys, axis=0, return_index=True, return_inverse=True)
+        ir_map = ir_map.ravel()
+        # Irreducible q-points are ordered by their first appearance.
+        order = np.argsort(first_indices)
+        self._ir_map = np.array(np.argsort(order)[ir_map], dtype='int_')
+        self._ir_qpoints = np.array(
+            reduced[first_indices[order], arg_min[first_indices[order]]],
+            dtype='double', order='C')
+        self._ops = arg_min % num_ops
+        self._signs = np.where(arg_min < num_ops, 1, -1)
+        # s R^-T q = q_ir + G with q_ir of the representative, which can be
+        # different from the reduced image of q within the tolerance.
+        self._G = np.rint(rotated[indices, arg_min] -
+                          self._ir_qpoints[self._ir_map])
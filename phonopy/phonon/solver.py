@@ -0,0 +1,307 @@
+# Copyright (C) 2020 Atsushi Togo
+# All rights reserved.
+#
+# This file is part of phonopy.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in
+#   the documentation and/or other materials provided with the
+#   distribution.
+#
+# * Neither the name of the phonopy project nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy as np
+
+
+def get_phonons_at_qpoints(frequencies,
+                           eigenvectors,
+                           dynamical_matrix,
+                           qpoints,
+                           factor,
+                           nac_q_direction=None,
+                           num_qpoints_in_batch=100,
+                           num_threads=None,
+                           group_velocity=None,
+                           group_velocities=None,
+                           is_single_precision=False):
+    """Phonons at q-points are computed and stored in the given arrays
+
+    Dynamical matrices are built for a block of q-points at once and
+    the stack is diagonalized by several threads.
+
+    Parameters
+    ----------
+    frequencies : ndarray
+        Phonon frequencies are stored in this array.
+        shape=(qpoints, bands), dtype='double'
+    eigenvectors : ndarray or None
+        Phonon eigenvectors are stored in this array unless None.
+        shape=(qpoints, bands, bands),
+        dtype=complex of "c%d" % (np.dtype('double').itemsize * 2)
+    dynamical_matrix : DynamicalMatrix or DynamicalMatrixNAC
+        Dynamical matrix class instance.
+    qpoints : array_like
+        q-points in reduced coordinates of reciprocal lattice.
+        shape=(qpoints, 3)
+    factor : float
+        Unit conversion factor to frequency.
+    nac_q_direction : array_like, optional
+        q-direction used for non-analytical term correction at Gamma point.
+        Default is None.
+    num_qpoints_in_batch : int, optional
+        Number of q-points whose dynamical matrices are held at once.
+        Default is 100.
+    num_threads : int, optional
+        Number of threads used for diagonalization. Default is None, which
+        means OMP_NUM_THREADS or the number of CPUs.
+    group_velocity : GroupVelocity, optional
+        When this is given, group velocities are computed from the
+        frequencies and eigenvectors of each block and stored in
+        group_velocities. Default is None.
+    group_velocities : ndarray, optional
+        Group velocities are stored in this array when group_velocity is
+        given.
+        shape=(qpoints, bands, 3), dtype='double'
+    is_single_precision : bool, optional
+        Dynamical matrices are diagonalized in single precision. See
+        get_eigen_solutions. Default is False.
+
+    """
+
+    num_qpoints = len(qpoints)
+    for i in range(0, num_qpoints, num_qpoints_in_batch):
+        j = min(i + num_qpoints_in_batch, num_qpoints)
+        eigvals, eigvecs = get_eigen_solutions(
+            dynamical_matrix,
+            qpoints[i:j],
+            nac_q_direction=nac_q_direction,
+            with_eigenvectors=(eigenvectors is not None or
+                               group_velocity is not None),
+            num_threads=num_threads,
+            is_single_precision=is_single_precision)
+        if eigenvectors is not None:
+            eigenvectors[i:j] = eigvecs
+        frequencies[i:j] = np.sqrt(np.abs(eigvals)) * np.sign(eigvals) * factor
+        if group_velocity is not None:
+            group_velocity.run(qpoints[i:j],
+                               frequencies=frequencies[i:j],
+                               eigenvectors=eigvecs)
+            group_velocities[i:j] = group_velocity.group_velocities
+
+
+def get_eigen_solutions(dynamical_matrix,
+                        qpoints,
+                        nac_q_direction=None,
+                        with_eigenvectors=True,
+                        num_threads=None,
+                        is_single_precision=False):
+    """Return eigenvalues and eigenvectors of dynamical matrices at q-points
+
+    When cache of eigen-solutions is enabled for dynamical_matrix (see
+    DynamicalMatrix.enable_cache), cached solutions are reused and only
+    dynamical matrices at the other q-points are built and diagonalized.
+
+    With is_single_precision=True, dynamical matrices are built in double
+    precision for a few q-points at a time and stored in single precision
+    complex numbers, then diagonalized. Eigenvalues and eigenvectors are
+    given in single precision, which is accurate enough for frequencies
+    used for DOS and thermal properties. Cache of eigen-solutions is not
+    used in this case.
+
+    Returns
+    -------
+    tuple
+        (eigenvalues, eigenvectors) as returned by solve_dynamical_matrices.
+
+    """
+
+    if is_single_precision:
+        num_band = dynamical_matrix.get_dimension()
+        dtype = "c%d" % (np.dtype('single').itemsize * 2)
+        dms = np.zeros((len(qpoints), num_band, num_band),
+                       dtype=dtype, order='C')
+        # Not to hold all dynamical matrices in double precision.
+        num_qpoints_in_chunk = 10
+        for i in range(0, len(qpoints), num_qpoints_in_chunk):
+            j = min(i + num_qpoints_in_chunk, len(qpoints))
+            dms[i:j] = get_dynamical_matrices(
+                dynamical_matrix,
+                np.array(qpoints[i:j], dtype='double'),
+                nac_q_direction=nac_q_direction)
+        return solve_dynamical_matrices(dms,
+                                        with_eigenvectors=with_eigenvectors,
+                                        num_threads=num_threads)
+
+    cache = dynamical_matrix.cache
+    if cache is None or not cache.with_eigen_solutions:
+        dms = get_dynamical_matrices(dynamical_matrix,
+                                     qpoints,
+                                     nac_q_direction=nac_q_direction)
+        return solve_dynamical_matrices(dms,
+                                        with_eigenvectors=with_eigenvectors,
+                                        num_threads=num_threads)
+
+    num_band = dynamical_matrix.get_dimension()
+    eigvals = np.zeros((len(qpoints), num_band), dtype='double')
+    if with_eigenvectors:
+        dtype = "c%d" % (np.dtype('double').itemsize * 2)
+        eigvecs = np.zeros((len(qpoints), num_band, num_band), dtype=dtype)
+    else:
+        eigvecs = None
+
+    keys = []
+    indices = []
+    for i, q in enumerate(qpoints):
+        if (dynamical_matrix.is_nac() and nac_q_direction is not None and
+            (np.abs(q) < 1e-5).all()):
+            keys.append(cache.get_key(q, q_direction=nac_q_direction))
+        else:
+            keys.append(cache.get_key(q))
+        solution = cache.get_eigen_solution(
+            keys[i], with_eigenvectors=with_eigenvectors)
+        if solution is None:
+            indices.append(i)
+        else:
+            eigvals[i] = solution[0]
+            if with_eigenvectors:
+                eigvecs[i] = solution[1]
+
+    if indices:
+        dms = get_dynamical_matrices(dynamical_matrix,
+                                     np.array(qpoints)[indices],
+                                     nac_q_direction=nac_q_direction)
+        vals, vecs = solve_dynamical_matrices(
+            dms, with_eigenvectors=with_eigenvectors, num_threads=num_threads)
+        eigvals[indices] = vals
+        if with_eigenvectors:
+            eigvecs[indices] = vecs
+        for i, k in enumerate(indices):
+            if with_eigenvectors:
+                cache.set_eigen_solution(keys[k], vals[i], vecs[i])
+            else:
+                cache.set_eigen_solution(keys[k], vals[i])
+
+    return eigvals, eigvecs
+
+
+def get_dynamical_matrices(dynamical_matrix, qpoints, nac_q_direction=None):
+    """Return dynamical matrices at q-points
+
+    With non-analytical term correction, dynamical matrices at Gamma point
+    are recomputed with nac_q_direction if it is given.
+
+    """
+
+    dynamical_matrix.run_batch(qpoints)
+    dms = dynamical_matrix.dynamical_matrices
+    if dynamical_matrix.is_nac() and nac_q_direction is not None:
+        for i, q in enumerate(qpoints):
+            if (np.abs(q) < 1e-5).all():
+                dynamical_matrix.run(q, q_direction=nac_q_direction)
+                dms[i] = dynamical_matrix.dynamical_matrix
+    return dms
+
+
+def solve_dynamical_matrices(dynamical_matrices,
+                             with_eigenvectors=True,
+                             num_threads=None):
+    """Diagonalize a stack of dynamical matrices
+
+    The stack is split into contiguous chunks and each chunk is
+    diagonalized by numpy.linalg.eigh (or eigvalsh) in its own thread.
+    LAPACK runs without GIL, so the chunks are solved in parallel.
+
+    Parameters
+    ----------
+    dynamical_matrices : ndarray
+        Hermitian matrices. Eigenvalues and eigenvectors are computed in
+        the precision of this array.
+        shape=(num_matrices, bands, bands)
+    with_eigenvectors : bool, optional
+        Eigenvectors are computed if True. Default is True.
+    num_threads : int, optional
+        Number of threads. Default is None, which means OMP_NUM_THREADS or
+        the number of CPUs.
+
+    Returns
+    -------
+    tuple
+        (eigenvalues, eigenvectors). Eigenvalues are in ascending order
+        with shape=(num_matrices, bands) and eigenvectors are given as
+        column vectors with shape=(num_matrices, bands, bands).
+        Eigenvectors are None when with_eigenvectors=False.
+
+    """
+
+    dms = dynamical_matrices
+    num_dms = len(dms)
+    if num_threads is None:
+        _num_threads = get_number_of_threads()
+    else:
+        _num_threads = num_threads
+    num_chunks = max(min(_num_threads, num_dms), 1)
+
+    eigvals = np.zeros(dms.shape[:2], dtype=dms.real.dtype, order='C')
+    if with_eigenvectors:
+        eigvecs = np.zeros(dms.shape, dtype=dms.dtype, order='C')
+    else:
+        eigvecs = None
+
+    def _solve(k):
+        i, j = bounds[k], bounds[k + 1]
+        if with_eigenvectors:
+            eigvals[i:j], eigvecs[i:j] = np.linalg.eigh(dms[i:j])
+        else:
+            eigvals[i:j] = np.linalg.eigvalsh(dms[i:j])
+
+    bounds = np.linspace(0, num_dms, num_chunks + 1).astype(int)
+    if num_chunks == 1:
+        _solve(0)
+    else:
+        pool = ThreadPool(num_chunks)
+        try:
+            pool.map(_solve, range(num_chunks))
+        finally:
+            pool.close()
+            pool.join()
+
+    return eigvals, eigvecs
+
+
+def get_number_of_threads():
+    """Return default number of threads used by solvers
+
+    OMP_NUM_THREADS is respected if it is set, otherwise the number of
+    CPUs is returned.
+
+    """
+
+    try:
+        return max(int(os.environ['OMP_NUM_THREADS']), 1)
+    except (KeyError, ValueError):
+        return multiprocessing.cpu_count()
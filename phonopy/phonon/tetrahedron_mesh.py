@@ -188,13 +188,7 @@ class TetrahedronMesh(object):
             raise StopIteration
         else:
             gp = self._ir_grid_points[self._grid_point_count]
-            self._set_tetrahedra_frequencies(gp)
-            for ib, frequencies in enumerate(self._tetrahedra_frequencies):
-                self._tm.set_tetrahedra_omegas(frequencies)
-                self._tm.run(self._frequency_points, value=self._value)
-                iw = self._tm.get_integration_weight()
-                self._integration_weights[:, ib] = iw
-            self._integration_weights /= np.prod(self._mesh)
+            self._set_integration_weights(gp)
             self._grid_point_count += 1
             return self._integration_weights
 
@@ -207,6 +201,85 @@ class TetrahedronMesh(object):
     def get_frequency_points(self):
         return self._frequency_points
 
+    def get_integration_weights_at_ir_grid_points(self,
+                                                  i_start=0,
+                                                  i_end=None):
+        """Integration weights at ir-grid-points[i_start:i_end]
+
+        With C implementation, the integration weights for all the
+        ir-grid-points and bands are computed in one call. ``set`` has to be
+        called beforehand.
+
+        Returns
+        -------
+        ndarray
+            Integration weights.
+            shape=(i_end - i_start, frequency_points, bands)
+            dtype='double'
+
+        """
+
+        if i_end is None:
+            i_end = len(self._ir_grid_points)
+        num_band = self._frequencies.shape[1]
+        num_freqs = len(self._frequency_points)
+        iws = np.zeros((i_end - i_start, num_freqs, num_band),
+                       dtype='double')
+        if self._lang == 'C':
+            try:
+                import phonopy._phonopy as phonoc
+            except ImportError:
+                phonoc = None
+        else:
+            phonoc = None
+
+        if phonoc is None:
+            for i, gp in enumerate(self._ir_grid_points[i_start:i_end]):
+                self._set_integration_weights(gp)
+                iws[i] = self._integration_weights
+        else:
+            phonoc.tetrahedron_method_integration_weights(
+                iws,
+                self._frequency_points,
+                np.array(self._ir_grid_points[i_start:i_end], dtype='uintp'),
+                self._mesh,
+                np.array(self._grid_address, dtype='intc', order='C'),
+                np.array(self._gp_ir_index, dtype='uintp'),
+                np.array(self._relative_grid_address,
+                         dtype='intc', order='C'),
+                np.array(self._frequencies, dtype='double', order='C'),
+                self._value)
+            iws /= np.prod(self._mesh)
+        return iws
+
+    def iter_blocks(self, memory_budget=None, num_gp_in_block=100):
+        """Iterate over blocks of ir-grid-points with integration weights
+
+        Parameters
+        ----------
+        memory_budget : float, optional
+            Upper bound of memory in MB used for integration weights in one
+            block. Default is None, i.e., num_gp_in_block is used.
+        num_gp_in_block : int, optional
+            Number of ir-grid-points in one block used when memory_budget
+            is None. Default is 100.
+
+        Yields
+        ------
+        tuple
+            (i, j, integration weights at ir-grid-points[i:j])
+
+        """
+
+        num_ir_gp = len(self._ir_grid_points)
+        if memory_budget is not None:
+            size = len(self._frequency_points) * self._frequencies.shape[1] * 8
+            num_gp_in_block = max(
+                1, int(memory_budget * 1024 ** 2 / size))
+        for i in range(0, num_ir_gp, num_gp_in_block):
+            j = min(i + num_gp_in_block, num_ir_gp)
+            yield i, j, self.get_integration_weights_at_ir_grid_points(i, j)
+
     def set(self,
             value='I',
             division_number=201,
@@ -240,6 +313,15 @@ class TetrahedronMesh(object):
         for i, gp in enumerate(self._grid_mapping_table):
             self._gp_ir_index[i] = ir_gp_indices[gp]
 
+    def _set_integration_weights(self, gp):
+        self._set_tetrahedra_frequencies(gp)
+        for ib, frequencies in enumerate(self._tetrahedra_frequencies):
+            self._tm.set_tetrahedra_omegas(frequencies)
+            self._tm.run(self._frequency_points, value=self._value)
+            iw = self._tm.get_integration_weight()
+            self._integration_weights[:, ib] = iw
+        self._integration_weights /= np.prod(self._mesh)
+
     def _set_tetrahedra_frequencies(self, gp):
         self._tetrahedra_frequencies = get_tetrahedra_frequencies(
             gp,
@@ -53,6 +53,22 @@ def mode_S(temp, freqs):
             - Kb * np.log(2 * np.sinh(val)))
 
 
+def mode_F_S_cv(temp, freqs):
+    """Return free energy without zero point energy, entropy, heat capacity
+
+    exp(-freqs / Kb / temp) is shared by the three properties. temp and
+    freqs (eV) are broadcast each other.
+
+    """
+    x = freqs / Kb / temp
+    expVal = np.exp(-x)
+    log_1m_expVal = np.log1p(-expVal)
+    fe = Kb * temp * log_1m_expVal
+    entropy = Kb * (x * expVal / (1 - expVal) - log_1m_expVal)
+    cv = Kb * x ** 2 * expVal / (1 - expVal) ** 2
+    return fe, entropy, cv
+
+
 def mode_ZPE(temp, freqs):
     return freqs / 2
 
@@ -68,6 +84,7 @@ class ThermalPropertiesBase(object):
                  band_indices=None,
                  cutoff_frequency=None,
                  pretend_real=False):
+        self._mesh = mesh
         self._is_projection = is_projection
         self._band_indices = None
 
@@ -76,17 +93,28 @@ class ThermalPropertiesBase(object):
         else:
             self._cutoff_frequency = cutoff_frequency
 
+        # Eigenvectors not held in memory (ChunkedMesh or Mesh with HDF5
+        # file) are treated block by block of q-points.
+        if isinstance(mesh.eigenvectors, np.ndarray):
+            eigvecs = mesh.eigenvectors
+        else:
+            eigvecs = None
+
         if band_indices is not None:
             bi = np.hstack(band_indices).astype('intc')
             self._band_indices = bi
             self._frequencies = np.array(mesh.frequencies[:, bi],
                                          dtype='double', order='C')
-            if mesh.eigenvectors is not None:
-                self._eigenvectors = np.array(mesh.eigenvectors[:, :, bi],
-                                              dtype='double', order='C')
+            if eigvecs is not None:
+                self._eigenvectors = np.array(
+                    eigvecs[:, :, bi],
+                    dtype=("c%d" % (np.dtype('double').itemsize * 2)),
+                    order='C')
+            else:
+                self._eigenvectors = None
         else:
             self._frequencies = mesh.frequencies
-            self._eigenvectors = mesh.eigenvectors
+            self._eigenvectors = eigvecs
 
         if pretend_real:
             self._frequencies = abs(self._frequencies)
@@ -143,7 +171,15 @@ class ThermalProperties(ThermalPropertiesBase):
                  is_projection=False,
                  band_indices=None,
                  cutoff_frequency=None,
-                 pretend_real=False):
+                 pretend_real=False,
+                 with_mode_thermal_properties=False):
+        """
+
+        with_mode_thermal_properties : bool, optional
+            Thermal properties of respective phonon modes are stored if
+            True. Default is False.
+
+        """
         ThermalPropertiesBase.__init__(self,
                                        mesh,
                                        is_projection=is_projection,
@@ -155,6 +191,8 @@ class ThermalProperties(ThermalPropertiesBase):
         self._high_T_entropy = None
         self._zero_point_energy = None
         self._projected_thermal_properties = None
+        self._with_mode_thermal_properties = with_mode_thermal_properties
+        self._mode_thermal_properties = None
 
         self._set_high_T_entropy_and_zero_point_energy()
 
@@ -172,6 +210,23 @@ class ThermalProperties(ThermalPropertiesBase):
     def get_thermal_properties(self):
         return self.thermal_properties
 
+    @property
+    def projected_thermal_properties(self):
+        return self._projected_thermal_properties
+
+    @property
+    def mode_thermal_properties(self):
+        """Free energy, entropy, and heat capacity of phonon modes
+
+        Free energy includes zero point energy. Units are kJ/mol, J/K/mol,
+        and J/K/mol, respectively. Weighted sum over ir-grid points and
+        bands divided by the sum of weights gives thermal_properties.
+
+        shape=(temperatures, ir-grid points, bands, 3), dtype='double'
+
+        """
+        return self._mode_thermal_properties
+
     @property
     def zero_point_energy(self):
         return self._zero_point_energy
@@ -263,19 +318,7 @@ class ThermalProperties(ThermalPropertiesBase):
             self._run_py_thermal_properties()
 
         if self._is_projection:
-            fe = []
-            entropy = []
-            cv = []
-            for t in self._temperatures:
-                fe.append(self.run_free_energy(t))
-                entropy.append(self.run_entropy(t) * 1000,)
-                cv.append(self.run_heat_capacity(t) * 1000)
-
-            self._projected_thermal_properties = [
-                self._temperatures,
-                np.array(fe, dtype='double'),
-                np.array(entropy, dtype='double'),
-                np.array(cv, dtype='double')]
+            self._run_projected_thermal_properties()
 
     def write_yaml(self, filename='thermal_properties.yaml', volume=None):
         lines = self._get_tp_yaml_lines(volume=volume)
@@ -289,39 +332,133 @@ class ThermalProperties(ThermalPropertiesBase):
 
         props = np.zeros((len(self._temperatures), 3),
                          dtype='double', order='C')
+        if self._with_mode_thermal_properties:
+            mode_props = np.zeros(
+                (len(self._temperatures),) + self._frequencies.shape + (3,),
+                dtype='double', order='C')
+        else:
+            mode_props = None
         phonoc.thermal_properties(props,
                                   self._temperatures,
                                   self._frequencies,
                                   self._weights,
-                                  self._cutoff_frequency)
-        # for f, w in zip(self._frequencies, self._weights):
-        #     phonoc.thermal_properties(
-        #         props,
-        #         self._temperatures,
-        #         np.array(f, dtype='double', order='C')[None, :],
-        #         np.array([w], dtype='intc'),
-        #         cutoff_frequency)
+                                  self._cutoff_frequency,
+                                  mode_props)
+        self._set_thermal_properties(props, mode_props)
+
+    def _run_py_thermal_properties(self):
+        """Thermal properties are computed by broadcasting over blocks
+
+        Arrays of (temperatures, q-points, bands) are processed by blocks of
+        q-points to limit the memory usage.
 
+        """
+
+        temps = self._temperatures
+        positive_t = temps > 0
+        t = temps[positive_t][:, None, None]
+        num_qpoints, num_band = self._frequencies.shape
+        props = np.zeros((len(temps), 3), dtype='double')
+        if self._with_mode_thermal_properties:
+            mode_props = np.zeros(
+                (len(temps), num_qpoints, num_band, 3), dtype='double')
+        else:
+            mode_props = None
+
+        num_batch = max(1000000 // max(len(t) * num_band, 1), 1)
+        for i in range(0, num_qpoints, num_batch):
+            j = min(i + num_batch, num_qpoints)
+            freqs = self._frequencies[i:j]
+            cond = freqs > self._cutoff_frequency
+            # Frequencies below cutoff are replaced not to give nan.
+            f = np.where(cond, freqs, 1)
+            tp = np.array(mode_F_S_cv(t, f[None, :, :])) * cond
+            w = self._weights[i:j][:, None]
+            props[positive_t] += (tp * w).sum(axis=(2, 3)).T
+            if mode_props is not None:
+                mode_props[positive_t, i:j] = np.moveaxis(tp, 0, -1)
+        self._set_thermal_properties(props, mode_props)
+
+    def _set_thermal_properties(self, props, mode_props):
         props /= np.sum(self._weights)
         fe = props[:, 0] * EvTokJmol + self._zero_point_energy
         entropy = props[:, 1] * EvTokJmol * 1000
         cv = props[:, 2] * EvTokJmol * 1000
         self._thermal_properties = [self._temperatures, fe, entropy, cv]
 
-    def _run_py_thermal_properties(self):
-        fe = []
-        entropy = []
-        cv = []
-        for t in self._temperatures:
-            props = self._get_py_thermal_properties(t)
-            fe.append(props[0])
-            entropy.append(props[1] * 1000)
-            cv.append(props[2] * 1000)
-        self._thermal_properties = [
+        if mode_props is not None:
+            zpe = np.where(self._frequencies > 0, self._frequencies / 2, 0)
+            mode_props[:, :, :, 0] += zpe
+            mode_props *= EvTokJmol
+            mode_props[:, :, :, 1:] *= 1000
+            self._mode_thermal_properties = mode_props
+
+    def _run_projected_thermal_properties(self):
+        """Thermal properties projected on eigenvector elements
+
+        Without eigenvectors in memory, eigenvectors are computed
+        (ChunkedMesh) or read (Mesh with HDF5 file) block by block of
+        ir-grid points by the mesh object and the contributions are
+        accumulated.
+
+        """
+
+        if self._eigenvectors is None:
+            blocks = self._iter_eigenvector_blocks()
+        else:
+            blocks = [(0, len(self._frequencies), self._eigenvectors)]
+
+        props = None
+        for i, j, eigvecs in blocks:
+            if props is None:
+                props = np.zeros(
+                    (len(self._temperatures), eigvecs.shape[1], 3),
+                    dtype='double', order='C')
+            try:
+                import phonopy._phonopy as phonoc
+                phonoc.projected_thermal_properties(props,
+                                                    self._temperatures,
+                                                    self._frequencies[i:j],
+                                                    eigvecs,
+                                                    self._weights[i:j],
+                                                    self._cutoff_frequency)
+            except ImportError:
+                self._add_py_projected_thermal_properties(
+                    props,
+                    self._frequencies[i:j],
+                    eigvecs,
+                    self._weights[i:j])
+
+        props *= EvTokJmol / np.sum(self._weights)
+        self._projected_thermal_properties = [
             self._temperatures,
-            np.array(fe, dtype='double'),
-            np.array(entropy, dtype='double'),
-            np.array(cv, dtype='double')]
+            props[:, :, 0],
+            props[:, :, 1] * 1000,
+            props[:, :, 2] * 1000]
+
+    def _iter_eigenvector_blocks(self):
+        for i, j, _, eigvecs in self._mesh.iter_blocks():
+            if self._band_indices is not None:
+                eigvecs = eigvecs[:, :, self._band_indices]
+            yield i, j, eigvecs
+
+    def _add_py_projected_thermal_properties(self,
+                                             props,
+                                             frequencies,
+                                             eigenvectors,
+                                             weights):
+        temps = self._temperatures
+        positive_t = temps > 0
+        t = temps[positive_t][:, None]
+        for freqs, eigvecs, w in zip(frequencies, eigenvectors, weights):
+            cond = freqs > self._cutoff_frequency
+            f = freqs[cond]
+            e2 = (np.abs(eigvecs[:, cond]) ** 2).T * w
+            fe, entropy, cv = mode_F_S_cv(t, f)
+            props[positive_t, :, 0] += np.dot(fe + f / 2, e2)
+            props[positive_t, :, 1] += np.dot(entropy, e2)
+            props[positive_t, :, 2] += np.dot(cv, e2)
+            props[~positive_t, :, 0] += np.dot(f / 2, e2)
 
     def _get_tp_yaml_lines(self, volume=None):
         lines = []
@@ -400,11 +537,6 @@ class ThermalProperties(ThermalPropertiesBase):
             lines.append(line)
         return lines
 
-    def _get_py_thermal_properties(self, t):
-        return (self.run_free_energy(t),
-                self.run_entropy(t),
-                self.run_heat_capacity(t))
-
     def _set_high_T_entropy_and_zero_point_energy(self):
         zp_energy = 0.0
         entropy = 0.0
@@ -101,7 +101,8 @@ class DynamicStructureFactor(object):
                  atomic_form_factor_func=None,
                  scattering_lengths=None,
                  freq_min=None,
-                 freq_max=None):
+                 freq_max=None,
+                 symmetry=None):
         """
 
         Parameters
@@ -138,6 +139,9 @@ class DynamicStructureFactor(object):
         freq_max: float
             Maximum phonon frequency to determine wheather include or not. Only
             for Debye-Waller factor.
+        symmetry: Symmetry, optional
+            Symmetry of the primitive cell. When this is given, phonons are
+            solved only at symmetrically irreducible q-points.
 
         """
 
@@ -158,6 +162,8 @@ class DynamicStructureFactor(object):
         else:
             self._fmax = freq_max
 
+        self._symmetry = symmetry
+
         self._rec_lat = np.linalg.inv(self._primitive.get_cell())
         self.qpoints = None
         self._Gpoints = None
@@ -215,7 +221,8 @@ class DynamicStructureFactor(object):
     def _set_phonon(self):
         qpoints_phonon = QpointsPhonon(self.qpoints,
                                        self._dynamical_matrix,
-                                       with_eigenvectors=True)
+                                       with_eigenvectors=True,
+                                       symmetry=self._symmetry)
         self.frequencies = qpoints_phonon.frequencies
         self._eigvecs = qpoints_phonon.eigenvectors
 
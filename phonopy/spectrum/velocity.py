@@ -81,7 +81,7 @@ class VelocityQpoints(object):
         self._velocities = velocities
 
         (self._shortest_vectors,
-         self._multiplicity) = primitive.get_smallest_vectors()
+         self._multiplicity) = primitive.get_dense_smallest_vectors()
 
         self._qpoints = None
         self._weights = None
@@ -136,8 +136,8 @@ class VelocityQpoints(object):
         return v_q
 
     def _get_phase_factor(self, p_i, s_j, q_array):
-        multi = self._multiplicity[s_j, p_i]
-        pos = self._shortest_vectors[s_j, p_i, :multi]
+        multi, adrs = self._multiplicity[s_j, p_i]
+        pos = self._shortest_vectors[adrs:(adrs + multi)]
         return np.exp(-2j * np.pi * np.dot(q_array, pos.T)).sum(axis=1) / multi
 
 
@@ -48,11 +48,13 @@ def get_supercell(unitcell, supercell_matrix, is_old_style=True, symprec=1e-5):
 def get_primitive(supercell,
                   primitive_frame,
                   symprec=1e-5,
-                  positions_to_reorder=None):
+                  positions_to_reorder=None,
+                  store_dense_svecs=False):
     return Primitive(supercell,
                      primitive_frame,
                      symprec=symprec,
-                     positions_to_reorder=positions_to_reorder)
+                     positions_to_reorder=positions_to_reorder,
+                     store_dense_svecs=store_dense_svecs)
 
 
 def print_cell(cell, mapping=None, stars=None):
@@ -326,6 +328,9 @@ class Primitive(PhonopyAtoms):
            trans  [1, 2, 3, 0, 5, 6, 7, 4],
           indices [2, 3, 0, 1, 6, 7, 4, 5],
                   [3, 0, 1, 2, 7, 4, 5, 6]]
+    store_dense_svecs : bool
+        Shortest vectors are returned by get_smallest_vectors in the dense
+        layout or not. See get_smallest_vectors.
 
     """
 
@@ -333,7 +338,8 @@ class Primitive(PhonopyAtoms):
                  supercell,
                  primitive_matrix,
                  symprec=1e-5,
-                 positions_to_reorder=None):
+                 positions_to_reorder=None,
+                 store_dense_svecs=False):
         """
 
         Parameters
@@ -353,12 +359,19 @@ class Primitive(PhonopyAtoms):
             the order of atoms is expected to be sure, these positions with
             the specific order is used after position matching between
             this data and generated positions.
+        store_dense_svecs : bool, optional
+            Shortest vectors are returned by get_smallest_vectors in the
+            dense layout, i.e., a flat list of vectors with multiplicities
+            and addresses. Shortest vectors are always held in the dense
+            layout and the old layout is created at every call of
+            get_smallest_vectors unless this is True. Default is False.
 
         """
 
         self._primitive_matrix = np.array(
             primitive_matrix, dtype='double', order='C')
         self._symprec = symprec
+        self._store_dense_svecs = store_dense_svecs
         self._p2s_map = None
         self._s2p_map = None
         self._p2p_map = None
@@ -396,8 +409,30 @@ class Primitive(PhonopyAtoms):
         return self.p2p_map
 
     def get_smallest_vectors(self):
+        """Return shortest vectors and multiplicities
+
+        See the docstring of get_smallest_vectors for the sparse and dense
+        layouts of arrays.
+
+        """
+        if self._store_dense_svecs:
+            return self._smallest_vectors, self._multiplicity
+        else:
+            return dense_to_sparse_svecs(self._smallest_vectors,
+                                         self._multiplicity)
+
+    def get_dense_smallest_vectors(self):
+        """Return shortest vectors and multiplicities in the dense layout
+
+        These arrays are not copied regardless of store_dense_svecs.
+
+        """
         return self._smallest_vectors, self._multiplicity
 
+    @property
+    def store_dense_svecs(self):
+        return self._store_dense_svecs
+
     @property
     def atomic_permutations(self):
         return self._atomic_permutations
@@ -411,7 +446,10 @@ class Primitive(PhonopyAtoms):
         self._s2p_map, self._p2p_map = self._map_atomic_indices(
             supercell.scaled_positions)
         self._smallest_vectors, self._multiplicity = _get_smallest_vectors(
-            supercell, self, symprec=self._symprec)
+            supercell,
+            self,
+            store_dense_svecs=True,
+            symprec=self._symprec)
         self._atomic_permutations = self._get_atomic_permutations(supercell)
 
     def _create_primitive_cell(self, supercell, positions_to_reorder=None):
@@ -689,14 +727,21 @@ def get_reduced_bases(lattice,
         return spg.delaunay_reduce(lattice, eps=tolerance)
 
 
-def _get_smallest_vectors(supercell, primitive, symprec=1e-5):
+def _get_smallest_vectors(supercell,
+                          primitive,
+                          store_dense_svecs=False,
+                          symprec=1e-5):
     p2s_map = primitive.p2s_map
     supercell_pos = supercell.scaled_positions
     primitive_pos = supercell_pos[p2s_map]
     supercell_bases = supercell.cell
     primitive_bases = primitive.cell
     svecs, multi = get_smallest_vectors(
-        supercell_bases, supercell_pos, primitive_pos, symprec=symprec)
+        supercell_bases,
+        supercell_pos,
+        primitive_pos,
+        store_dense_svecs=store_dense_svecs,
+        symprec=symprec)
     trans_mat_float = np.dot(supercell_bases, np.linalg.inv(primitive_bases))
     trans_mat = np.rint(trans_mat_float).astype(int)
     assert (np.abs(trans_mat_float - trans_mat) < 1e-8).all()
@@ -707,6 +752,7 @@ def _get_smallest_vectors(supercell, primitive, symprec=1e-5):
 def get_smallest_vectors(supercell_bases,
                          supercell_pos,
                          primitive_pos,
+                         store_dense_svecs=False,
                          symprec=1e-5):
     """Find shortest atomic pair vectors
 
@@ -737,6 +783,8 @@ def get_smallest_vectors(supercell_bases,
         in fractional coodinates of primitive cell.
         dtype='double'
         shape=(size_prim, 3)
+    store_dense_svecs : bool, optional, default=False
+        Shortest vectors are returned in the dense layout.
     symprec : float, optional, default=1e-5
         Tolerance to find equal distances of vectors
 
@@ -747,10 +795,16 @@ def get_smallest_vectors(supercell_bases,
         possible maximum number of elements.
         dtype='double'
         shape=(size_super, size_prim, 27, 3)
+        With store_dense_svecs=True, shortest vectors of all atom pairs are
+        stored in a flat list.
+        shape=(sum of multiplicities, 3)
     multiplicities : ndarray
         Number of equidistance shortest vectors
         dtype='intc'
         shape=(size_super, size_prim)
+        With store_dense_svecs=True, the number of equidistance shortest
+        vectors and the address of the first one in shortest_vectors.
+        shape=(size_super, size_prim, 2)
 
     """
 
@@ -797,6 +851,37 @@ def get_smallest_vectors(supercell_bases,
         lattice_points = np.array(lattice_points[unique_indices],
                                   dtype='intc', order='C')
 
+    import phonopy._phonopy as phonoc
+    reduced_bases_T = np.array(reduced_bases.T, dtype='double', order='C')
+    trans_mat_inv_T = np.array(trans_mat_inv.T, dtype='intc', order='C')
+
+    if store_dense_svecs:
+        # Multiplicities are counted first, then shortest vectors are
+        # written at their addresses in the flat list.
+        multiplicity = np.zeros(
+            (len(supercell_fracs), len(primitive_fracs), 2),
+            dtype='intc', order='C')
+        shortest_vectors = np.zeros((0, 3), dtype='double', order='C')
+        for initialize in (1, 0):
+            phonoc.gsv_set_smallest_vectors_dense(
+                shortest_vectors,
+                multiplicity,
+                supercell_fracs,
+                primitive_fracs,
+                lattice_points,
+                reduced_bases_T,
+                trans_mat_inv_T,
+                initialize,
+                symprec)
+            if initialize:
+                counts = multiplicity[:, :, 0].ravel()
+                multiplicity[:, :, 1] = (
+                    np.cumsum(counts) - counts).reshape(
+                        multiplicity.shape[:2])
+                shortest_vectors = np.zeros((counts.sum(), 3),
+                                            dtype='double', order='C')
+        return shortest_vectors, multiplicity
+
     # This shortest_vectors is already used at many locations.
     # Therefore the constant number 27 = 3*3*3 can not be easily changed.
     shortest_vectors = np.zeros(
@@ -804,15 +889,14 @@ def get_smallest_vectors(supercell_bases,
         dtype='double', order='C')
     multiplicity = np.zeros((len(supercell_fracs), len(primitive_fracs)),
                             dtype='intc', order='C')
-    import phonopy._phonopy as phonoc
     phonoc.gsv_set_smallest_vectors(
         shortest_vectors,
         multiplicity,
         supercell_fracs,
         primitive_fracs,
         lattice_points,
-        np.array(reduced_bases.T, dtype='double', order='C'),
-        np.array(trans_mat_inv.T, dtype='intc', order='C'),
+        reduced_bases_T,
+        trans_mat_inv_T,
         symprec)
 
     # Here's where things get interesting.
@@ -879,6 +963,55 @@ def get_smallest_vectors(supercell_bases,
     return shortest_vectors, multiplicity
 
 
+def sparse_to_dense_svecs(svecs, multi):
+    """Convert shortest vectors from sparse to dense layout
+
+    Parameters
+    ----------
+    svecs : ndarray
+        shape=(size_super, size_prim, 27, 3)
+    multi : ndarray
+        shape=(size_super, size_prim)
+
+    Returns
+    -------
+    dense_svecs : ndarray
+        dtype='double'
+        shape=(sum of multiplicities, 3)
+    dense_multi : ndarray
+        Multiplicities and addresses of first vectors in dense_svecs.
+        dtype='intc'
+        shape=(size_super, size_prim, 2)
+
+    """
+
+    counts = np.ravel(multi)
+    dense_multi = np.zeros(multi.shape + (2, ), dtype='intc', order='C')
+    dense_multi[:, :, 0] = multi
+    dense_multi[:, :, 1] = (np.cumsum(counts) - counts).reshape(multi.shape)
+    mask = np.arange(svecs.shape[2])[None, :] < counts[:, None]
+    dense_svecs = np.array(svecs.reshape(-1, svecs.shape[2], 3)[mask],
+                           dtype='double', order='C')
+    return dense_svecs, dense_multi
+
+
+def dense_to_sparse_svecs(svecs, multi):
+    """Convert shortest vectors from dense to sparse layout
+
+    This is the inverse of sparse_to_dense_svecs.
+
+    """
+
+    sparse_svecs = np.zeros(multi.shape[:2] + (27, 3),
+                            dtype='double', order='C')
+    sparse_multi = np.array(multi[:, :, 0], dtype='intc', order='C')
+    counts = sparse_multi.ravel()
+    indices = multi[:, :, 1].reshape(-1, 1) + np.arange(27)
+    mask = np.arange(27)[None, :] < counts[:, None]
+    sparse_svecs.reshape(-1, 27, 3)[mask] = svecs[indices[mask]]
+    return sparse_svecs, sparse_multi
+
+
 def compute_all_sg_permutations(positions,  # scaled positions
                                 rotations,  # scaled
                                 translations,  # scaled
@@ -176,17 +176,13 @@ class Symmetry(object):
                            translations,
                            symprec):
         pos = positions[atom_number]
-        site_symmetries = []
-
-        for r, t in zip(rotations, translations):
-            rot_pos = np.dot(pos, r.T) + t
-            diff = pos - rot_pos
-            diff -= np.rint(diff)
-            diff = np.dot(diff, lattice)
-            if np.linalg.norm(diff) < symprec:
-                site_symmetries.append(r)
+        rot_pos = np.dot(rotations, pos) + translations
+        diff = pos - rot_pos
+        diff -= np.rint(diff)
+        diff = np.dot(diff, lattice)
+        is_site_sym = np.sqrt((diff ** 2).sum(axis=1)) < symprec
 
-        return np.array(site_symmetries, dtype='intc')
+        return np.array(rotations[is_site_sym], dtype='intc')
 
     def _set_symmetry_dataset(self):
         self._dataset = spg.get_symmetry_dataset(self._cell.totuple(),
@@ -2,7 +2,12 @@ import unittest
 import numpy as np
 from phonopy import Phonopy
 from phonopy.interface.vasp import read_vasp
-from phonopy.file_IO import parse_FORCE_SETS
+from phonopy.file_IO import parse_FORCE_SETS, parse_BORN
+from phonopy.harmonic.dynamical_matrix import DynamicalMatrix
+from phonopy.harmonic.derivative_dynmat import DerivativeOfDynamicalMatrix
+from phonopy.harmonic.force_constants import (get_sparse_force_constants,
+                                              get_real_space_force_constants,
+                                              cutoff_force_constants)
 import os
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
@@ -16,17 +21,23 @@ class TestDynamicalMatrix(unittest.TestCase):
     def tearDown(self):
         pass
 
-    def test_properties(self):
+    def _get_phonon(self, is_compact_fc=False, store_dense_svecs=False):
         cell = read_vasp(os.path.join(data_dir, "..", "POSCAR_NaCl"))
         phonon = Phonopy(cell,
                          np.diag([2, 2, 2]),
                          primitive_matrix=[[0, 0.5, 0.5],
                                            [0.5, 0, 0.5],
-                                           [0.5, 0.5, 0]])
+                                           [0.5, 0.5, 0]],
+                         store_dense_svecs=store_dense_svecs)
         filename = os.path.join(data_dir, "..", "FORCE_SETS_NaCl")
         force_sets = parse_FORCE_SETS(filename=filename)
         phonon.set_displacement_dataset(force_sets)
-        phonon.produce_force_constants()
+        phonon.produce_force_constants(
+            calculate_full_force_constants=(not is_compact_fc))
+        return phonon
+
+    def test_properties(self):
+        phonon = self._get_phonon()
         dynmat = phonon.dynamical_matrix
         dynmat.run([0, 0, 0])
         self.assertTrue(id(dynmat.primitive)
@@ -36,6 +47,172 @@ class TestDynamicalMatrix(unittest.TestCase):
         np.testing.assert_allclose(dynmat.dynamical_matrix,
                                    dynmat.get_dynamical_matrix())
 
+    def test_run_batch(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.5, 0, 0.25]]
+        for is_compact_fc in (False, True):
+            dynmat = self._get_phonon(is_compact_fc=is_compact_fc
+                                      ).dynamical_matrix
+            dynmat.run_batch(qpoints)
+            dms = dynmat.dynamical_matrices
+            self.assertEqual(dms.shape, (4, 6, 6))
+            for q, dm in zip(qpoints, dms):
+                dynmat.run(q)
+                np.testing.assert_allclose(dm, dynmat.dynamical_matrix,
+                                           atol=1e-12)
+
+    def test_derivative_run_batch(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.5, 0, 0.25]]
+        for is_compact_fc in (False, True):
+            phonon = self._get_phonon(is_compact_fc=is_compact_fc)
+            ddm = DerivativeOfDynamicalMatrix(phonon.dynamical_matrix)
+            ddm.run_batch(qpoints)
+            ddms = ddm.derivative_of_dynamical_matrices
+            self.assertEqual(ddms.shape, (4, 3, 6, 6))
+            for q, ddm_batch in zip(qpoints, ddms):
+                ddm.run(q)
+                np.testing.assert_allclose(
+                    ddm.get_derivative_of_dynamical_matrix(), ddm_batch,
+                    atol=1e-12)
+
+    def test_cache(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.5, 0, 0.25]]
+        phonon = self._get_phonon()
+        dynmat = phonon.dynamical_matrix
+        dynmat.run_batch(qpoints)
+        dms = dynmat.dynamical_matrices.copy()
+
+        dynmat.enable_cache(with_eigen_solutions=True)
+        cache = dynmat.cache
+        dynmat.run_batch(qpoints[:2])
+        dynmat.run_batch(qpoints)
+        np.testing.assert_allclose(dynmat.dynamical_matrices, dms)
+        self.assertEqual(cache.num_hits, 2)
+        self.assertEqual(cache.num_misses, 4)
+        dynmat.run(qpoints[2])
+        np.testing.assert_allclose(dynmat.dynamical_matrix, dms[2])
+        self.assertEqual(cache.num_hits, 3)
+        self.assertEqual(len(cache), 4)
+        self.assertEqual(cache.size, dms.nbytes)
+
+        phonon.run_qpoints(qpoints, with_eigenvectors=True)
+        phonon.run_qpoints(qpoints, with_eigenvectors=True)
+        self.assertEqual(cache.num_eigen_hits, 4)
+        self.assertEqual(cache.num_eigen_misses, 4)
+
+        dynmat.enable_cache(memory_limit=dms[0].nbytes * 2.5 / 1024 ** 2)
+        dynmat.run_batch(qpoints)
+        self.assertEqual(len(dynmat.cache), 2)
+        dynmat.run(qpoints[3])
+        self.assertEqual(dynmat.cache.num_hits, 1)
+        dynmat.run(qpoints[0])
+        self.assertEqual(dynmat.cache.num_hits, 1)
+        np.testing.assert_allclose(dynmat.dynamical_matrix, dms[0])
+
+    def test_nac_run_batch(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [1, 0, 0]]
+        phonon = self._get_phonon()
+        filename_born = os.path.join(data_dir, "..", "BORN_NaCl")
+        nac_params = parse_BORN(phonon.primitive, filename=filename_born)
+        for method in ('gonze', 'wang'):
+            nac_params['method'] = method
+            phonon.nac_params = nac_params
+            dynmat = phonon.dynamical_matrix
+            self.assertEqual(dynmat.nac_method, method)
+            if method == 'gonze':
+                G_cutoff = dynmat.Gonze_nac_dataset[2]
+                np.testing.assert_allclose(
+                    dynmat.Gonze_nac_dataset[3],
+                    dynmat._get_G_list(G_cutoff, g_rad=100))
+            for q_direction in (None, [1, 0, 0]):
+                dynmat.run_batch(qpoints, q_direction=q_direction)
+                dms = dynmat.dynamical_matrices
+                for q, dm in zip(qpoints, dms):
+                    dynmat.run(q, q_direction=q_direction)
+                    np.testing.assert_allclose(dynmat.dynamical_matrix, dm,
+                                               atol=1e-12)
+
+    def test_real_space_force_constants(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.5, 0, 0.25]]
+        for is_compact_fc in (False, True):
+            phonon = self._get_phonon(is_compact_fc=is_compact_fc)
+            rfc = get_real_space_force_constants(phonon.force_constants,
+                                                 phonon.primitive)
+            self.assertEqual(rfc.force_constants.shape, (len(rfc), 6, 6))
+            dynmat = phonon.dynamical_matrix
+            dynmat.run_batch(qpoints)
+            dms = dynmat.dynamical_matrices.copy()
+            dynmat.enable_real_space_force_constants()
+            dynmat.run_batch(qpoints)
+            np.testing.assert_allclose(dynmat.dynamical_matrices, dms,
+                                       atol=1e-12)
+            dynmat.run(qpoints[1])
+            np.testing.assert_allclose(dynmat.dynamical_matrix, dms[1],
+                                       atol=1e-12)
+
+    def test_dense_svecs(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.5, 0, 0.25]]
+        for is_compact_fc in (False, True):
+            dms = []
+            for store_dense_svecs in (False, True):
+                dynmat = self._get_phonon(
+                    is_compact_fc=is_compact_fc,
+                    store_dense_svecs=store_dense_svecs).dynamical_matrix
+                dynmat.run_batch(qpoints)
+                dms.append(dynmat.dynamical_matrices)
+            np.testing.assert_allclose(dms[0], dms[1], atol=1e-12)
+
+    def test_sparse_svecs_in_c(self):
+        """C functions still accept shortest vectors in the old layout"""
+        import phonopy._phonopy as phonoc
+        phonon = self._get_phonon()
+        primitive = phonon.primitive
+        svecs, multi = primitive.get_smallest_vectors()
+        self.assertEqual(svecs.shape[2:], (27, 3))
+        q = np.array([0.1, 0.2, 0.3], dtype='double')
+        dynmat = phonon.dynamical_matrix
+        dynmat.run(q)
+        dm = np.zeros_like(dynmat.dynamical_matrix)
+        phonoc.dynamical_matrix(dm.view(dtype='double'),
+                                phonon.force_constants,
+                                q,
+                                svecs,
+                                multi,
+                                primitive.masses,
+                                primitive.s2p_map,
+                                primitive.p2s_map)
+        np.testing.assert_allclose(dm, dynmat.dynamical_matrix, atol=1e-12)
+
+    def test_sparse_force_constants(self):
+        qpoints = [[0, 0, 0], [0.1, 0.2, 0.3], [0.5, 0.5, 0], [0.5, 0, 0.25]]
+        for is_compact_fc in (False, True):
+            phonon = self._get_phonon(is_compact_fc=is_compact_fc)
+            fc = phonon.force_constants.copy()
+            cutoff_force_constants(fc,
+                                   phonon.supercell,
+                                   phonon.primitive,
+                                   4.0)
+            sfc = get_sparse_force_constants(phonon.force_constants,
+                                             phonon.primitive,
+                                             4.0)
+            self.assertEqual(len(sfc), 14)
+            dynmat = DynamicalMatrix(phonon.supercell, phonon.primitive, fc)
+            dynmat_sparse = DynamicalMatrix(phonon.supercell,
+                                            phonon.primitive,
+                                            sfc)
+            dynmat.run_batch(qpoints)
+            dynmat_sparse.run_batch(qpoints)
+            np.testing.assert_allclose(dynmat.dynamical_matrices,
+                                       dynmat_sparse.dynamical_matrices,
+                                       atol=1e-12)
+            ddm = DerivativeOfDynamicalMatrix(dynmat)
+            ddm_sparse = DerivativeOfDynamicalMatrix(dynmat_sparse)
+            ddm.run(qpoints[1])
+            ddm_sparse.run(qpoints[1])
+            np.testing.assert_allclose(
+                ddm.get_derivative_of_dynamical_matrix(),
+                ddm_sparse.get_derivative_of_dynamical_matrix(),
+                atol=1e-12)
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestDynamicalMatrix)
@@ -0,0 +1,189 @@
+import unittest
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+import sys
+import shutil
+import tempfile
+import numpy as np
+from phonopy import Phonopy
+from phonopy.interface.vasp import read_vasp
+from phonopy.file_IO import parse_FORCE_SETS, read_force_constants_hdf5
+from phonopy.harmonic.force_constants import (
+    set_tensor_symmetry_PJ, _set_tensor_symmetry_PJ_py,
+    FullForceConstantsView, get_harmonic_potential_energy,
+    symmetrize_force_constants, symmetrize_compact_force_constants,
+    distribute_force_constants_by_translations)
+import os
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestForceConstants(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _get_phonon(self, is_compact_fc=False):
+        cell = read_vasp(os.path.join(data_dir, "..", "POSCAR_NaCl"))
+        phonon = Phonopy(cell,
+                         np.diag([2, 2, 2]),
+                         primitive_matrix=[[0, 0.5, 0.5],
+                                           [0.5, 0, 0.5],
+                                           [0.5, 0.5, 0]])
+        filename = os.path.join(data_dir, "..", "FORCE_SETS_NaCl")
+        force_sets = parse_FORCE_SETS(filename=filename)
+        phonon.set_displacement_dataset(force_sets)
+        phonon.produce_force_constants(
+            calculate_full_force_constants=(not is_compact_fc))
+        return phonon
+
+    def test_set_tensor_symmetry_PJ(self):
+        phonon = self._get_phonon()
+        supercell = phonon.supercell
+        fc = phonon.force_constants + np.random.RandomState(0).normal(
+            scale=1e-2, size=phonon.force_constants.shape)
+        fc_py = fc.copy()
+        _set_tensor_symmetry_PJ_py(fc_py,
+                                   supercell.cell.T,
+                                   supercell.scaled_positions,
+                                   phonon.symmetry)
+        set_tensor_symmetry_PJ(fc,
+                               supercell.cell.T,
+                               supercell.scaled_positions,
+                               phonon.symmetry)
+        np.testing.assert_allclose(fc, fc_py, atol=1e-12)
+
+    def test_symmetrize_compact_force_constants_by_space_group(self):
+        phonon = self._get_phonon()
+        phonon_compact = self._get_phonon(is_compact_fc=True)
+        p2s = phonon.primitive.p2s_map
+        np.testing.assert_allclose(phonon.force_constants[p2s],
+                                   phonon_compact.force_constants,
+                                   atol=1e-12)
+        phonon.symmetrize_force_constants_by_space_group()
+        phonon_compact.symmetrize_force_constants_by_space_group()
+        np.testing.assert_allclose(phonon.force_constants[p2s],
+                                   phonon_compact.force_constants,
+                                   atol=1e-12)
+
+    def test_produce_force_constants_hdf5(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            for is_compact_fc in (False, True):
+                phonon = self._get_phonon(is_compact_fc=is_compact_fc)
+                fc = phonon.force_constants.copy()
+                filename = os.path.join(tmpdir, "force_constants.hdf5")
+                phonon.produce_force_constants(
+                    calculate_full_force_constants=(not is_compact_fc),
+                    hdf5_filename=filename)
+                self.assertTrue(isinstance(phonon.force_constants,
+                                           np.memmap))
+                np.testing.assert_allclose(phonon.force_constants, fc,
+                                           atol=1e-12)
+                phonon.force_constants.flush()
+                fc_file = read_force_constants_hdf5(
+                    filename, p2s_map=phonon.primitive.p2s_map)
+                np.testing.assert_allclose(fc_file, fc, atol=1e-12)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_full_force_constants_view(self):
+        fc = self._get_phonon().force_constants
+        phonon = self._get_phonon(is_compact_fc=True)
+        fc_view = FullForceConstantsView(phonon.force_constants,
+                                         phonon.primitive,
+                                         max_cached_rows=3)
+        self.assertEqual(fc_view.shape, fc.shape)
+        self.assertEqual(len(fc_view), len(fc))
+        for key in (5, -1, (7, 3), (10, 20, 1), slice(2, 9, 3),
+                    (slice(None), 4)):
+            np.testing.assert_allclose(fc_view[key], fc[key], atol=1e-12)
+        np.testing.assert_allclose(np.array(fc_view), fc, atol=1e-12)
+
+        disps = np.random.RandomState(0).normal(scale=0.01,
+                                                size=(3, len(fc), 3))
+        np.testing.assert_allclose(
+            get_harmonic_potential_energy(fc_view, disps),
+            get_harmonic_potential_energy(fc, disps))
+        np.testing.assert_allclose(
+            get_harmonic_potential_energy(fc_view, disps[0]),
+            get_harmonic_potential_energy(fc, disps[0]))
+
+        freqs = phonon.get_frequencies([0.1, 0.2, 0.3])
+        phonon.force_constants = fc_view
+        np.testing.assert_allclose(phonon.get_frequencies([0.1, 0.2, 0.3]),
+                                   freqs)
+
+    def test_symmetrize_force_constants_with_tolerance(self):
+        phonon = self._get_phonon()
+        p2s = phonon.primitive.p2s_map
+        fc = phonon.force_constants + np.random.RandomState(0).normal(
+            scale=1e-2, size=phonon.force_constants.shape)
+        fc_compact = fc[p2s].copy()
+        fc_full = fc.copy()
+        fc_full[:] = 0
+        fc_full[p2s] = fc_compact
+        distribute_force_constants_by_translations(
+            fc_full, phonon.primitive, phonon.supercell)
+
+        drifts = []
+        symmetrize_force_constants(
+            fc_full, tolerance=1e-10,
+            drift_callback=lambda i, drift: drifts.append((i, drift)))
+        self.assertTrue(1 < len(drifts) < 100)
+        self.assertTrue(drifts[-1][1] < 1e-10)
+        np.testing.assert_allclose(fc_full.sum(axis=0), 0, atol=1e-10)
+        np.testing.assert_allclose(fc_full.sum(axis=1), 0, atol=1e-10)
+
+        drifts_compact = []
+        symmetrize_compact_force_constants(
+            fc_compact, phonon.primitive, tolerance=1e-10,
+            drift_callback=lambda i, drift: drifts_compact.append(drift))
+        self.assertEqual(len(drifts_compact), len(drifts))
+        np.testing.assert_allclose(fc_compact, fc_full[p2s], atol=1e-12)
+
+        # Drift never becomes smaller than zero, so max_iterations is
+        # reached.
+        drifts = []
+        symmetrize_force_constants(
+            fc_full, tolerance=0, max_iterations=3,
+            drift_callback=lambda i, drift: drifts.append(i))
+        self.assertEqual(drifts, [1, 2, 3])
+
+        # Without tolerance, steps are repeated level times.
+        drifts = []
+        symmetrize_force_constants(
+            fc_full, level=2,
+            drift_callback=lambda i, drift: drifts.append(i))
+        self.assertEqual(drifts, [1, 2])
+
+    def test_symmetrize_force_constants_api_with_tolerance(self):
+        for is_compact_fc in (False, True):
+            phonon = self._get_phonon(is_compact_fc=is_compact_fc)
+            phonon.force_constants = (
+                phonon.force_constants + np.random.RandomState(0).normal(
+                    scale=1e-2, size=phonon.force_constants.shape))
+            phonon._log_level = 1
+            stdout = sys.stdout
+            sys.stdout = StringIO()
+            try:
+                phonon.symmetrize_force_constants(tolerance=1e-12)
+                lines = sys.stdout.getvalue().splitlines()
+            finally:
+                sys.stdout = stdout
+            drifts = [float(line.split()[-1]) for line in lines
+                      if line.startswith("Max drift after iteration")]
+            # Drift subtracted at the first iteration is that of the
+            # input force constants, so more iterations than level=1.
+            self.assertTrue(len(drifts) > 1)
+            self.assertTrue(drifts[0] > 1e-12)
+            self.assertTrue(drifts[-1] < 1e-12)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestForceConstants)
+    unittest.TextTestRunner(verbosity=2).run(suite)
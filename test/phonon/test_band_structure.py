@@ -4,7 +4,8 @@ import numpy as np
 from phonopy import Phonopy
 from phonopy.interface.vasp import read_vasp
 from phonopy.file_IO import parse_FORCE_SETS, parse_BORN
-from phonopy.phonon.band_structure import get_band_qpoints
+from phonopy.phonon.band_structure import (get_band_qpoints,
+                                           get_band_orders)
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -41,6 +42,52 @@ class TestBandStructure(unittest.TestCase):
     def test_is_band_connection(self):
         self._test_band(is_band_connection=True)
 
+    def test_band_in_blocks(self):
+        band_paths = [[[0, 0, 0], [0.5, 0.5, 0.5]],
+                      [[0.5, 0.5, 0], [0, 0, 0], [0.5, 0.25, 0.75]]]
+        qpoints = get_band_qpoints(band_paths, npoints=51)
+        phonon = self._get_phonon()
+        phonon.run_band_structure(qpoints, is_band_connection=True)
+        freqs_band = np.concatenate(phonon.band_structure.frequencies)
+        qpoints = np.concatenate(qpoints)
+        phonon.run_qpoints(qpoints)
+        freqs = phonon.qpoints.frequencies
+        not_gamma = (np.abs(qpoints) > 1e-5).any(axis=1)
+        np.testing.assert_allclose(np.sort(freqs_band, axis=1)[not_gamma],
+                                   freqs[not_gamma], atol=1e-8)
+
+    def test_band_connection_methods(self):
+        num_band = 6
+        permutations = [np.arange(num_band),
+                        [1, 0, 2, 3, 5, 4],
+                        [5, 4, 3, 2, 1, 0],
+                        [0, 2, 4, 1, 3, 5]]
+        eigvecs = np.array([np.eye(num_band)[:, p] for p in permutations],
+                           dtype='c16')
+        for method in ('greedy', 'assignment'):
+            band_orders = get_band_orders(eigvecs, method=method)
+            for p, band_order in zip(permutations, band_orders):
+                np.testing.assert_array_equal(
+                    np.array(p)[band_order], np.arange(num_band))
+
+        # Along Gamma-L of NaCl, LA branch (band 2) crosses TO branches
+        # (bands 3 and 4) between the 7th and 8th q-points.
+        qpoints = get_band_qpoints([[[0, 0, 0], [0.5, 0.5, 0.5]]],
+                                   npoints=11)
+        phonon = self._get_phonon()
+        freqs = []
+        for method in ('greedy', 'assignment'):
+            phonon.run_band_structure(qpoints,
+                                      is_band_connection=True,
+                                      band_connection_method=method)
+            f = phonon.band_structure.frequencies[0]
+            self.assertTrue((np.diff(f[:, 2]) > 0).all())
+            self.assertTrue((np.diff(f[1:, 3]) < 0).all())
+            np.testing.assert_array_less(f[:7, 2], f[:7, 3])
+            np.testing.assert_array_less(f[7:, 3], f[7:, 2])
+            freqs.append(f)
+        np.testing.assert_allclose(freqs[0], freqs[1])
+
     def _test_band(self,
                    with_group_velocities=False,
                    is_band_connection=False):
@@ -100,6 +100,32 @@ class TestDOS(unittest.TestCase):
         # for f, d in zip(freqs, pdos.T):
         #     print(("%f" + " %f" * len(d)) % ((f, ) + tuple(d)))
 
+    def testTotalDOSFFT(self):
+        phonon = self._phonon
+        phonon.run_mesh([5, 5, 5])
+        phonon.run_total_dos(freq_pitch=1,
+                             use_tetrahedron_method=False,
+                             use_fft=True)
+        dos = phonon.total_dos.dos
+        freqs = phonon.total_dos.frequency_points
+        data_ref = np.reshape([float(x) for x in tdos_str.split()], (-1, 2))
+        np.testing.assert_allclose(data_ref, np.c_[freqs, dos], atol=1e-3)
+
+    def testPartialDOSFFT(self):
+        phonon = self._phonon
+        phonon.run_mesh([5, 5, 5],
+                        is_mesh_symmetry=False,
+                        with_eigenvectors=True)
+        phonon.run_projected_dos(freq_pitch=1,
+                                 use_tetrahedron_method=False,
+                                 use_fft=True)
+        pdos = phonon.projected_dos.projected_dos
+        freqs = phonon.projected_dos.frequency_points
+        data_ref = np.reshape([float(x) for x in pdos_str.split()],
+                              (-1, 3)).T
+        np.testing.assert_allclose(data_ref, np.vstack([freqs, pdos]),
+                                   atol=1e-3)
+
     def testPartialDOSTetrahedron(self):
         phonon = self._phonon
         phonon.run_mesh([5, 5, 5],
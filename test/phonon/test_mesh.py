@@ -1,5 +1,7 @@
 import unittest
 import os
+import shutil
+import tempfile
 import numpy as np
 from phonopy import Phonopy
 from phonopy.interface.vasp import read_vasp
@@ -34,6 +36,155 @@ class TestMesh(unittest.TestCase):
         np.testing.assert_allclose(mesh_freqs, freqs)
         np.testing.assert_allclose(mesh_eigvecs, eigvecs)
 
+    def testChunkedMesh(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([4, 4, 4],
+                        is_mesh_symmetry=False,
+                        with_eigenvectors=True,
+                        with_group_velocities=True)
+        mesh_freqs = phonon.mesh.frequencies
+        mesh_eigvecs = phonon.mesh.eigenvectors
+        mesh_gv = phonon.mesh.group_velocities
+        phonon.run_projected_dos()
+        pdos = phonon.projected_dos.projected_dos
+        phonon.run_projected_dos(use_tetrahedron_method=True)
+        pdos_thm = phonon.projected_dos.projected_dos
+        phonon.run_thermal_properties(t_max=500, is_projection=True)
+        tp = phonon.thermal_properties.projected_thermal_properties
+
+        phonon.run_mesh([4, 4, 4],
+                        is_mesh_symmetry=False,
+                        with_eigenvectors=True,
+                        memory_budget=0.01)
+        self.assertTrue(phonon.mesh.num_qpoints_in_batch < 64)
+        self.assertTrue(phonon.mesh.eigenvectors is None)
+        np.testing.assert_allclose(phonon.mesh.frequencies, mesh_freqs)
+        freqs = []
+        eigvecs = []
+        for f, e in phonon.mesh:
+            freqs.append(f)
+            eigvecs.append(e)
+        np.testing.assert_allclose(freqs, mesh_freqs)
+        np.testing.assert_allclose(eigvecs, mesh_eigvecs)
+        phonon.run_projected_dos()
+        np.testing.assert_allclose(phonon.projected_dos.projected_dos, pdos,
+                                   atol=1e-10)
+        phonon.run_projected_dos(use_tetrahedron_method=True)
+        np.testing.assert_allclose(phonon.projected_dos.projected_dos,
+                                   pdos_thm, atol=1e-10)
+        phonon.run_thermal_properties(t_max=500, is_projection=True)
+        np.testing.assert_allclose(
+            phonon.thermal_properties.projected_thermal_properties[1:],
+            tp[1:], atol=1e-8)
+
+    def testMeshHDF5(self):
+        import h5py
+        phonon = self._get_phonon()
+        phonon.run_mesh([4, 4, 4],
+                        is_mesh_symmetry=False,
+                        with_eigenvectors=True,
+                        with_group_velocities=True)
+        mesh_freqs = phonon.mesh.frequencies
+        mesh_eigvecs = phonon.mesh.eigenvectors
+        mesh_gv = phonon.mesh.group_velocities
+        phonon.run_projected_dos()
+        pdos = phonon.projected_dos.projected_dos
+        phonon.run_thermal_properties(t_max=500, is_projection=True)
+        tp = phonon.thermal_properties.projected_thermal_properties
+        phonon.run_moment(is_projection=True)
+        moment = phonon.moment.moment
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "mesh.hdf5")
+            phonon.run_mesh([4, 4, 4],
+                            is_mesh_symmetry=False,
+                            with_eigenvectors=True,
+                            with_group_velocities=True,
+                            hdf5_filename=filename,
+                            compression='gzip')
+            self.assertFalse(isinstance(phonon.mesh.eigenvectors, np.ndarray))
+            np.testing.assert_allclose(phonon.mesh.frequencies, mesh_freqs)
+            np.testing.assert_allclose(phonon.mesh.eigenvectors[:],
+                                       mesh_eigvecs)
+            np.testing.assert_allclose(phonon.mesh.group_velocities,
+                                       mesh_gv, atol=1e-8)
+            phonon.run_projected_dos()
+            np.testing.assert_allclose(phonon.projected_dos.projected_dos,
+                                       pdos, atol=1e-10)
+            phonon.run_thermal_properties(t_max=500, is_projection=True)
+            np.testing.assert_allclose(
+                phonon.thermal_properties.projected_thermal_properties[1:],
+                tp[1:], atol=1e-8)
+            phonon.run_moment(is_projection=True)
+            np.testing.assert_allclose(phonon.moment.moment, moment)
+
+            # File is closed after computation and reopened read-only
+            # for eigenvectors until Mesh.close().
+            self.assertTrue(phonon.mesh._hdf5_file is not None)
+            phonon.mesh.close()
+            self.assertTrue(phonon.mesh._hdf5_file is None)
+
+            # Restart from an interrupted calculation
+            with h5py.File(filename, 'a') as w:
+                w.attrs['num_finished_qpoints'] = 10
+                w['frequency'][10:] = 0
+                w['eigenvector'][10:] = 0
+                w['group_velocity'][10:] = 0
+            phonon.run_mesh([4, 4, 4],
+                            is_mesh_symmetry=False,
+                            with_eigenvectors=True,
+                            with_group_velocities=True,
+                            hdf5_filename=filename)
+            with phonon.mesh as mesh:
+                np.testing.assert_allclose(mesh.frequencies, mesh_freqs)
+                np.testing.assert_allclose(mesh.eigenvectors[:],
+                                           mesh_eigvecs)
+                np.testing.assert_allclose(mesh.group_velocities, mesh_gv,
+                                           atol=1e-8)
+            with h5py.File(filename, 'r') as w:
+                np.testing.assert_allclose(w['group_velocity'][:], mesh_gv,
+                                           atol=1e-8)
+            self.assertTrue(phonon.mesh._hdf5_file is None)
+
+            with self.assertRaises(RuntimeError):
+                phonon.init_mesh([4, 4, 4],
+                                 memory_budget=1,
+                                 hdf5_filename=filename)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def testSinglePrecision(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([10, 10, 10], with_eigenvectors=True)
+        freqs = phonon.mesh.frequencies
+        phonon.run_total_dos()
+        dos = phonon.total_dos.dos
+        phonon.run_thermal_properties(t_max=1000)
+        tp = phonon.get_thermal_properties_dict()
+
+        phonon.run_mesh([10, 10, 10],
+                        with_eigenvectors=True,
+                        is_single_precision=True)
+        np.testing.assert_allclose(phonon.mesh.frequencies, freqs, atol=1e-4)
+        self.assertEqual(phonon.mesh.eigenvectors.dtype, np.complex128)
+        phonon.run_total_dos()
+        np.testing.assert_allclose(phonon.total_dos.dos, dos,
+                                   atol=1e-4 * dos.max())
+        phonon.run_thermal_properties(t_max=1000)
+        tp_single = phonon.get_thermal_properties_dict()
+        for key in ('free_energy', 'entropy', 'heat_capacity'):
+            np.testing.assert_allclose(tp_single[key], tp[key], atol=1e-4)
+
+        phonon.run_mesh([10, 10, 10], memory_budget=0.01)
+        num_qpoints_in_batch = phonon.mesh.num_qpoints_in_batch
+        phonon.run_mesh([10, 10, 10],
+                        memory_budget=0.01,
+                        is_single_precision=True)
+        np.testing.assert_allclose(phonon.mesh.frequencies, freqs, atol=1e-4)
+        self.assertEqual(phonon.mesh.num_qpoints_in_batch,
+                         num_qpoints_in_batch)
+
     def _get_phonon(self):
         cell = read_vasp(os.path.join(data_dir, "..", "POSCAR_NaCl"))
         phonon = Phonopy(cell,
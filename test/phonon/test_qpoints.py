@@ -4,6 +4,7 @@ import numpy as np
 from phonopy import Phonopy
 from phonopy.interface.vasp import read_vasp
 from phonopy.file_IO import parse_FORCE_SETS, parse_BORN
+from phonopy.phonon.group_velocity import GroupVelocity
 from phonopy.units import VaspToTHz
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
@@ -47,6 +48,51 @@ class TestQpoints(unittest.TestCase):
         freqs = phonon.qpoints.frequencies
         np.testing.assert_allclose(freqs ** 2 * np.sign(freqs), eigs)
 
+    def testQpointsGroupVelocities(self):
+        phonon = self._get_phonon()
+        qpoints = [[0.1, 0, 0], [0.5, 0.5, 0], [0.3, 0.2, 0.1]]
+        phonon.run_qpoints(qpoints,
+                           with_eigenvectors=True,
+                           with_group_velocities=True)
+        gv = phonon.qpoints.group_velocities
+        group_velocity = GroupVelocity(phonon.dynamical_matrix,
+                                       symmetry=phonon.primitive_symmetry)
+        group_velocity.run(qpoints)
+        np.testing.assert_allclose(
+            gv, group_velocity.group_velocities, atol=1e-8)
+        group_velocity.run(qpoints,
+                           frequencies=phonon.qpoints.frequencies,
+                           eigenvectors=phonon.qpoints.eigenvectors)
+        np.testing.assert_allclose(
+            gv, group_velocity.group_velocities, atol=1e-8)
+
+    def testQpointsSymmetry(self):
+        phonon = self._get_phonon()
+        qpoints = [[0.1, 0, 0], [0, 0.1, 0], [0, 0, -0.1], [-0.1, 0, 0],
+                   [0.3, 0.2, 0.1], [0.1, 0.2, 0.3], [-0.3, -0.1, -0.2],
+                   [0.5, 0.5, 0], [0, 0.5, 0.5]]
+        phonon.run_qpoints(qpoints,
+                           with_eigenvectors=True,
+                           with_group_velocities=True)
+        freqs = phonon.qpoints.frequencies
+        gv = phonon.qpoints.group_velocities
+        phonon.run_qpoints(qpoints,
+                           with_eigenvectors=True,
+                           with_group_velocities=True,
+                           is_qpoints_symmetry=True)
+        np.testing.assert_allclose(freqs, phonon.qpoints.frequencies,
+                                   atol=1e-5)
+        eigvecs = phonon.qpoints.eigenvectors
+        dm = phonon.dynamical_matrix
+        for q, eigvec, f in zip(qpoints, eigvecs, freqs):
+            dm.run(q)
+            eigvals = np.abs(f / VaspToTHz) ** 2 * np.sign(f)
+            np.testing.assert_allclose(
+                np.dot(dm.dynamical_matrix, eigvec), eigvec * eigvals,
+                atol=1e-5)
+        np.testing.assert_allclose(gv, phonon.qpoints.group_velocities,
+                                   atol=1e-4)
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestQpoints)
@@ -0,0 +1,76 @@
+import unittest
+import os
+import numpy as np
+from phonopy import Phonopy
+from phonopy.interface.vasp import read_vasp
+from phonopy.file_IO import parse_FORCE_SETS
+from phonopy.phonon.solver import (get_phonons_at_qpoints,
+                                   solve_dynamical_matrices)
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestSolver(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _get_phonon(self):
+        cell = read_vasp(os.path.join(data_dir, "..", "POSCAR_NaCl"))
+        phonon = Phonopy(cell,
+                         np.diag([2, 2, 2]),
+                         primitive_matrix=[[0, 0.5, 0.5],
+                                           [0.5, 0, 0.5],
+                                           [0.5, 0.5, 0]])
+        filename = os.path.join(data_dir, "..", "FORCE_SETS_NaCl")
+        force_sets = parse_FORCE_SETS(filename=filename)
+        phonon.set_displacement_dataset(force_sets)
+        phonon.produce_force_constants()
+        return phonon
+
+    def test_solve_dynamical_matrices(self):
+        phonon = self._get_phonon()
+        dynmat = phonon.dynamical_matrix
+        qpoints = np.random.RandomState(0).rand(7, 3) - 0.5
+        dynmat.run_batch(qpoints)
+        dms = dynmat.dynamical_matrices
+        eigvals_ref, eigvecs_ref = np.linalg.eigh(dms)
+        for num_threads in (1, 2, 3, 10):
+            eigvals, eigvecs = solve_dynamical_matrices(
+                dms, num_threads=num_threads)
+            np.testing.assert_allclose(eigvals, eigvals_ref, atol=1e-10)
+            np.testing.assert_allclose(eigvecs, eigvecs_ref, atol=1e-10)
+            eigvals, eigvecs = solve_dynamical_matrices(
+                dms, with_eigenvectors=False, num_threads=num_threads)
+            np.testing.assert_allclose(eigvals, eigvals_ref, atol=1e-10)
+            self.assertTrue(eigvecs is None)
+
+    def test_get_phonons_at_qpoints(self):
+        phonon = self._get_phonon()
+        dynmat = phonon.dynamical_matrix
+        qpoints = np.random.RandomState(1).rand(5, 3) - 0.5
+        num_band = len(phonon.primitive) * 3
+        freqs = np.zeros((len(qpoints), num_band), dtype='double')
+        dtype = "c%d" % (np.dtype('double').itemsize * 2)
+        eigvecs = np.zeros((len(qpoints), num_band, num_band), dtype=dtype)
+        get_phonons_at_qpoints(freqs, eigvecs, dynmat, qpoints,
+                               phonon.unit_conversion_factor,
+                               num_qpoints_in_batch=2,
+                               num_threads=2)
+        for q, f, v in zip(qpoints, freqs, eigvecs):
+            phonon.run_qpoints([q], with_eigenvectors=True)
+            d = phonon.get_qpoints_dict()
+            np.testing.assert_allclose(f, d['frequencies'][0], atol=1e-8)
+            dynmat.run(q)
+            dm = dynmat.dynamical_matrix
+            np.testing.assert_allclose(
+                np.dot(dm, v),
+                v * np.sign(f) * (f / phonon.unit_conversion_factor) ** 2,
+                atol=1e-8)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSolver)
+    unittest.TextTestRunner(verbosity=2).run(suite)
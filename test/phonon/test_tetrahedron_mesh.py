@@ -63,6 +63,31 @@ class TestTetrahedronMesh(unittest.TestCase):
         dos_comp = np.transpose([freq_points, dos]).reshape(10, 8)
         self.assertTrue(np.abs(dos_comp - data).all() < 1e-5)
 
+    def test_integration_weights_in_blocks(self):
+        phonon = self._get_phonon("Amm2",
+                                  [3, 2, 2],
+                                  [[1, 0, 0],
+                                   [0, 0.5, -0.5],
+                                   [0, 0.5, 0.5]])
+        mesh = [5, 5, 5]
+        phonon.run_mesh(mesh)
+        thm = TetrahedronMesh(phonon.get_primitive(),
+                              phonon.mesh.frequencies,
+                              mesh,
+                              phonon.mesh.grid_address,
+                              phonon.mesh.grid_mapping_table,
+                              phonon.mesh.ir_grid_points)
+        thm.set(value='I', division_number=40)
+        iws_ref = np.array([iw.copy() for iw in thm])
+        iws = thm.get_integration_weights_at_ir_grid_points()
+        np.testing.assert_allclose(iws_ref, iws, atol=1e-10)
+        iws = np.concatenate(
+            [iw for i, j, iw in thm.iter_blocks(memory_budget=0.01)])
+        np.testing.assert_allclose(iws_ref, iws, atol=1e-10)
+        blocks = [(i, j) for i, j, iw in thm.iter_blocks(num_gp_in_block=4)]
+        self.assertEqual(blocks[0], (0, 4))
+        self.assertEqual(blocks[-1][1], len(iws_ref))
+
     def _show(self, freq_points, dos):
         data = []
         for f, d in zip(freq_points, dos):
@@ -2,6 +2,7 @@ import unittest
 import os
 import numpy as np
 import phonopy
+from phonopy.units import EvTokJmol
 
 data_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -42,6 +43,44 @@ class TestThermalProperties(unittest.TestCase):
         tp_ref = np.reshape([float(x) for x in tp_str.split()], (-1, 10))
         np.testing.assert_allclose(tp.thermal_properties, tp_ref, atol=1e-5)
 
+    def testThermalPropertiesPy(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([5, 5, 5])
+        phonon.run_thermal_properties(t_step=100, t_max=900,
+                                      with_mode_thermal_properties=True)
+        tp = phonon.thermal_properties
+        props = np.array(tp.thermal_properties)
+        mode_props = tp.mode_thermal_properties
+        weights = phonon.mesh.weights
+        np.testing.assert_allclose(
+            np.dot(weights, mode_props.sum(axis=2)) / weights.sum(),
+            props[1:].T, atol=1e-8)
+
+        tp._run_py_thermal_properties()
+        np.testing.assert_allclose(tp.thermal_properties, props, atol=1e-8)
+        np.testing.assert_allclose(tp.mode_thermal_properties, mode_props,
+                                   atol=1e-8)
+
+    def testProjectedThermalProperties(self):
+        phonon = self._get_phonon()
+        phonon.run_mesh([5, 5, 5], with_eigenvectors=True)
+        phonon.run_thermal_properties(t_step=100, t_max=900,
+                                      is_projection=True)
+        tp = phonon.thermal_properties
+        _, fe, entropy, cv = tp.projected_thermal_properties
+        np.testing.assert_allclose(
+            np.transpose([fe.sum(axis=1), entropy.sum(axis=1),
+                          cv.sum(axis=1)]),
+            np.transpose(tp.thermal_properties[1:]), atol=1e-5)
+
+        props = np.zeros(fe.shape + (3,), dtype='double')
+        tp._add_py_projected_thermal_properties(
+            props, tp._frequencies, tp._eigenvectors, tp._weights)
+        props *= EvTokJmol / np.sum(tp._weights)
+        np.testing.assert_allclose(props[:, :, 0], fe, atol=1e-5)
+        np.testing.assert_allclose(props[:, :, 1] * 1000, entropy, atol=1e-5)
+        np.testing.assert_allclose(props[:, :, 2] * 1000, cv, atol=1e-5)
+
     def _get_phonon(self):
         phonon = phonopy.load(
             supercell_matrix=[[2, 0, 0], [0, 2, 0], [0, 0, 2]],
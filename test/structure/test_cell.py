@@ -92,6 +92,28 @@ class TestPrimitive(unittest.TestCase):
         self.assertTrue(id(self._pcell.p2p_map)
                         == id(self._pcell.get_primitive_to_primitive_map()))
 
+    def test_dense_svecs(self):
+        cell = read_cell_yaml(os.path.join(data_dir, "..", "NaCl.yaml"))
+        pcell_dense = get_primitive(cell,
+                                    [[0, 0.5, 0.5],
+                                     [0.5, 0, 0.5],
+                                     [0.5, 0.5, 0]],
+                                    store_dense_svecs=True)
+        svecs, multi = self._pcell.get_smallest_vectors()
+        dense_svecs, dense_multi = pcell_dense.get_smallest_vectors()
+        self.assertTrue(pcell_dense.store_dense_svecs)
+        for pcell in (self._pcell, pcell_dense):
+            _svecs, _multi = pcell.get_dense_smallest_vectors()
+            np.testing.assert_array_equal(_multi, dense_multi)
+            np.testing.assert_allclose(_svecs, dense_svecs)
+        self.assertEqual(dense_multi.shape, multi.shape + (2, ))
+        self.assertEqual(len(dense_svecs), multi.sum())
+        np.testing.assert_array_equal(dense_multi[:, :, 0], multi)
+        for i, j in np.ndindex(multi.shape):
+            m, adrs = dense_multi[i, j]
+            np.testing.assert_allclose(dense_svecs[adrs:(adrs + m)],
+                                       svecs[i, j, :m])
+
 
 class TestTrimmedCell(unittest.TestCase):
     def setUp(self):